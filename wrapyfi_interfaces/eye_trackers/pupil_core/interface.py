@@ -3,9 +3,11 @@ import sys
 import time
 import socket
 import argparse
-import io
-import PIL
 import logging
+import threading
+import queue
+from collections import deque
+from concurrent.futures import Future
 
 import cv2
 import numpy as np
@@ -13,6 +15,7 @@ import zmq
 import msgpack as serializer
 
 from wrapyfi.connect.wrapper import MiddlewareCommunicator, DEFAULT_COMMUNICATOR
+from wrapyfi_interfaces.utils.gaze import DispersionFixationDetector, GazeHeatmap
 
 PUPIL_CORE_DEFAULT_COMMUNICATOR = os.environ.get("PUPIL_CORE_DEFAULT_COMMUNICATOR", DEFAULT_COMMUNICATOR)
 PUPIL_CORE_DEFAULT_COMMUNICATOR = os.environ.get("PUPIL_CORE_DEFAULT_MWARE", PUPIL_CORE_DEFAULT_COMMUNICATOR)
@@ -31,6 +34,7 @@ def check_capture_exists(ip_address, port):
 def setup_pupil_remote_connection(ip_address, port, pupil_remote=None, port_type=None, message_type=None):
     """Creates a zmq-REQ socket and connects it to Pupil Capture or Service
     to send and receive notifications.
+    The SUB socket subscribes to the message_type topic, or to each of the topics when a list is given.
     We also set up a PUB socket to send the annotations. This is necessary to write
     messages to the IPC Backbone other than notifications
     See https://docs.pupil-labs.com/developer/core/network-api/ for details.
@@ -52,7 +56,8 @@ def setup_pupil_remote_connection(ip_address, port, pupil_remote=None, port_type
             sub_port = pupil_remote.recv_string()
             sock = ctx.socket(zmq.SUB)
             sock.connect(f'tcp://{ip_address}:{sub_port}')
-            sock.subscribe(message_type)
+            for topic in ([message_type] if isinstance(message_type, str) else message_type):
+                sock.subscribe(topic)
         except zmq.ZMQError:
             raise (Exception("Pupil Tracker not available"))
     elif port_type == "publisher":
@@ -136,6 +141,14 @@ def send_trigger(pub_socket, trigger):
     pub_socket.send(payload)
 
 
+def remote_command(pupil_remote, command):
+    """Sends ``command`` to Pupil Remote and returns its reply"""
+    pupil_remote.send_string(command)
+    reply = pupil_remote.recv_string()
+    logging.info(reply)
+    return reply
+
+
 def new_trigger(label, duration, timestamp):
     """Creates a new trigger/annotation to send to Pupil Capture"""
     return {
@@ -146,11 +159,384 @@ def new_trigger(label, duration, timestamp):
     }
 
 
+class _FrameDecoder(object):
+    """
+    Decodes the frames of a camera stream on a worker thread. Only the newest submitted message is kept, such that
+    messages submitted while a frame is being decoded replace each other (latest-wins) instead of queueing up.
+
+    :param decode: callable: Decodes (and publishes) a message, returning the decoded frame
+    :param name: str: Name of the worker thread
+    """
+    def __init__(self, decode, name="FrameDecoder"):
+        self.decode = decode
+        self.message = None
+        self.frame = None
+        self.decoded = 0
+        self.skipped = 0
+        self.running = True
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, message):
+        """
+        Submits a message for decoding, replacing the message still waiting to be decoded.
+
+        :param message: list: Message parts (topic, payload, and the frame buffer)
+        """
+        with self.condition:
+            if self.message is not None:
+                self.skipped += 1
+            self.message = message
+            self.condition.notify()
+
+    def take(self):
+        """
+        Takes the newest decoded frame.
+
+        :return: np.ndarray: The decoded frame. None when no frame was decoded since the last call
+        """
+        with self.condition:
+            frame, self.frame = self.frame, None
+        return frame
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and self.message is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                message, self.message = self.message, None
+            try:
+                frame = self.decode(message)
+            except Exception as e:
+                logging.error(e)
+                continue
+            with self.condition:
+                self.frame = frame
+                self.decoded += 1
+
+
+class _ControlWorker(object):
+    """
+    Sends commands to Pupil Remote and annotations to the Pupil on a worker thread, such that slow responses of the
+    Pupil do not delay the caller. The worker owns the Pupil Remote and PUB sockets once started. Commands are executed
+    in order of submission and return futures. Annotations are sent in bursts before each command, coalescing the
+    annotations queued with the same label and timestamp into one.
+
+    :param pupil_remote: zmq.Socket: The Pupil Remote REQ socket
+    :param pub_socket: zmq.Socket: The PUB socket for sending annotations
+    :param connect: callable: Creates a new Pupil Remote REQ socket, replacing the current one after a failed request
+    """
+    def __init__(self, pupil_remote, pub_socket=None, connect=None):
+        self.pupil_remote = pupil_remote
+        self.pub_socket = pub_socket
+        self.connect = connect
+        self.commands = queue.Queue()
+        self.annotations = {}
+        self.annotations_lock = threading.Lock()
+        self.sent_annotations = 0
+        self.coalesced_annotations = 0
+        self.bursts = 0
+        self.thread = threading.Thread(target=self._run, name="PupilControlWorker", daemon=True)
+        self.thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Submits a command, which is called with the Pupil Remote socket followed by the given arguments.
+
+        :param function: callable: The command, e.g. notify or remote_command
+        :return: Future: Resolves to the return value of the command
+        """
+        future = Future()
+        self.commands.put((future, function, args, kwargs))
+        return future
+
+    def annotate(self, annotation):
+        """
+        Queues an annotation to send on the PUB socket. An annotation queued with the same label and timestamp as a
+        pending one updates it instead.
+
+        :param annotation: dict: The annotation, including its label and timestamp
+        """
+        key = (annotation["label"], annotation["timestamp"])
+        with self.annotations_lock:
+            if key in self.annotations:
+                self.annotations[key].update(annotation)
+                self.coalesced_annotations += 1
+            else:
+                self.annotations[key] = dict(annotation)
+        # wakes up the worker
+        self.commands.put(None)
+
+    def stop(self, timeout=3.0):
+        """
+        Stops the worker after the pending commands and annotations were sent, and closes its sockets.
+
+        :param timeout: float: Maximum time (in seconds) to wait for the worker. Defaults to longer than the Pupil
+                               Remote receive timeout
+        """
+        self.commands.put(False)
+        self.thread.join(timeout)
+
+    def _send_annotations(self):
+        with self.annotations_lock:
+            annotations, self.annotations = self.annotations, {}
+        if not annotations:
+            return
+        for annotation in annotations.values():
+            send_trigger(self.pub_socket, annotation)
+        self.sent_annotations += len(annotations)
+        self.bursts += 1
+
+    def _run(self):
+        while True:
+            command = self.commands.get()
+            self._send_annotations()
+            if command is None:
+                continue
+            if command is False:
+                break
+            future, function, args, kwargs = command
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(self.pupil_remote, *args, **kwargs))
+            except Exception as e:
+                logging.error(f"Pupil Remote command failed: {e}")
+                future.set_exception(e)
+                # a REQ socket cannot be used again after a request timed out
+                if isinstance(e, zmq.ZMQError) and self.connect is not None:
+                    self.pupil_remote.close(linger=0)
+                    self.pupil_remote = self.connect()
+        if self.pub_socket is not None:
+            self.pub_socket.close()
+        self.pupil_remote.close()
+
+
+class _ClockSynchronizer(object):
+    """
+    Estimates the Pupil time from a local clock on a background thread. Every period, a burst of time requests is sent
+    to Pupil Remote and only the request with the shortest round trip is kept, since the midpoint of the shortest
+    round trip is the least affected by asymmetric network delays. The offset and skew (drift) of the Pupil clock are
+    fitted to the kept samples with an exponentially weighted linear regression, such that the model follows slow
+    changes of the drift over long sessions.
+
+    :param connect: callable: Creates a Pupil Remote REQ socket, which is used by the synchronizer thread only
+    :param clock_function: callable: The local clock
+    :param period: float: Time (in seconds) between bursts
+    :param burst: int: Number of time requests per burst
+    :param forgetting_factor: float: Weight decay per sample of the regression. 1 weighs all samples equally
+    :param max_rtt_ratio: float: Samples with a round trip longer than this multiple of the shortest recent round trip
+                                 are rejected
+    """
+    def __init__(self, connect, clock_function=time.perf_counter, period=1.0, burst=5, forgetting_factor=0.995,
+                 max_rtt_ratio=2.0):
+        self.connect = connect
+        self.clock_function = clock_function
+        self.period = period
+        self.burst = burst
+        self.forgetting_factor = forgetting_factor
+        self.max_rtt_ratio = max_rtt_ratio
+
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        # the local times and offsets are centered on the first sample to keep the regression well conditioned
+        self.t0 = None
+        self.y0 = None
+        self.sums = np.zeros(6)  # weights, x, y, xx, xy, yy
+        self.intercept = 0.0
+        self.skew = 0.0
+        self.recent_rtts = deque(maxlen=30)
+        self.last_rtt = None
+        self.last_sample_time = None
+        self.samples = 0
+        self.rejected = 0
+        self.failures = 0
+
+        self.thread = threading.Thread(target=self._run, name="PupilClockSynchronizer", daemon=True)
+        self.thread.start()
+
+    def pupil_time(self, local_time=None, timeout=2.0):
+        """
+        Estimates the Pupil time at a local time. Waits for the first estimate when none is available yet.
+
+        :param local_time: float: The local time. Defaults to the current local time
+        :param timeout: float: Maximum time (in seconds) to wait for the first estimate
+        :return: float: The estimated Pupil time. None when no estimate is available
+        """
+        if not self.ready.wait(timeout):
+            return None
+        if local_time is None:
+            local_time = self.clock_function()
+        with self.lock:
+            return local_time + self.y0 + self.intercept + self.skew * (local_time - self.t0)
+
+    def stats(self):
+        """
+        Gets the synchronization quality.
+
+        :return: dict: The current offset (Pupil time - local time) in seconds, the skew in parts per million, the
+                       root-mean-square residual of the regression, the last and shortest recent round trips, the age
+                       of the newest sample in seconds, and the number of kept, rejected and failed samples
+        """
+        with self.lock:
+            now = self.clock_function()
+            weights, x, y, xx, xy, yy = self.sums
+            if weights > 0:
+                residual = max(yy - self.intercept * y - self.skew * xy, 0.0) / weights
+                offset = self.y0 + self.intercept + self.skew * (now - self.t0)
+            else:
+                residual = offset = None
+            return {
+                "offset": None if offset is None else float(offset),
+                "skew_ppm": float(self.skew * 1e6),
+                "residual": None if residual is None else float(np.sqrt(residual)),
+                "rtt": self.last_rtt,
+                "min_rtt": min(self.recent_rtts) if self.recent_rtts else None,
+                "age": None if self.last_sample_time is None else now - self.last_sample_time,
+                "samples": self.samples,
+                "rejected": self.rejected,
+                "failures": self.failures,
+            }
+
+    def stop(self, timeout=3.0):
+        self.stopped.set()
+        self.thread.join(timeout)
+
+    def _add_sample(self, local_time, offset, rtt):
+        with self.lock:
+            self.recent_rtts.append(rtt)
+            if rtt > self.max_rtt_ratio * min(self.recent_rtts):
+                self.rejected += 1
+                return
+            if self.t0 is None:
+                self.t0, self.y0 = local_time, offset
+            x, y = local_time - self.t0, offset - self.y0
+            self.sums *= self.forgetting_factor
+            self.sums += (1.0, x, y, x * x, x * y, y * y)
+            weights, sx, sy, sxx, sxy, _ = self.sums
+            denominator = weights * sxx - sx * sx
+            # the skew cannot be estimated before the samples span some time
+            self.skew = (weights * sxy - sx * sy) / denominator if denominator > 1e-12 else 0.0
+            self.intercept = (sy - self.skew * sx) / weights
+            self.last_rtt = rtt
+            self.last_sample_time = local_time
+            self.samples += 1
+        self.ready.set()
+
+    def _run(self):
+        pupil_remote = None
+        while not self.stopped.is_set():
+            try:
+                if pupil_remote is None:
+                    pupil_remote = self.connect()
+                best = None
+                for _ in range(self.burst):
+                    local_time_before = self.clock_function()
+                    pupil_time = request_pupil_time(pupil_remote)
+                    local_time_after = self.clock_function()
+                    rtt = local_time_after - local_time_before
+                    if best is None or rtt < best[2]:
+                        local_time = (local_time_before + local_time_after) / 2.0
+                        best = (local_time, pupil_time - local_time, rtt)
+                self._add_sample(*best)
+            except zmq.ZMQError as e:
+                # a REQ socket cannot be used again after a request timed out
+                logging.warning(f"Pupil clock synchronization failed: {e}")
+                self.failures += 1
+                if pupil_remote is not None:
+                    pupil_remote.close(linger=0)
+                    pupil_remote = None
+            self.stopped.wait(self.period)
+        if pupil_remote is not None:
+            pupil_remote.close(linger=0)
+
+
+class _TimestampRing(object):
+    """
+    Bounded, timestamp-sorted ring of frame timestamps and indices supporting binary search. The entries are kept
+    contiguous in an array of twice the capacity, which is compacted once it fills up, such that appending takes
+    amortized O(1) time and the entries can be searched with np.searchsorted directly.
+
+    :param capacity: int: Maximum number of entries, the oldest entries are dropped beyond it
+    """
+    def __init__(self, capacity=300):
+        self.capacity = capacity
+        self.timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self.indices = np.zeros(2 * capacity, dtype=np.int64)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def append(self, timestamp, index):
+        """
+        Adds an entry, keeping the entries sorted when it arrives out of order.
+
+        :param timestamp: float: The frame timestamp
+        :param index: int: The frame index
+        """
+        if self.end == len(self.timestamps):
+            count = self.end - self.start
+            self.timestamps[:count] = self.timestamps[self.start:self.end]
+            self.indices[:count] = self.indices[self.start:self.end]
+            self.start, self.end = 0, count
+        position = self.end
+        if self.end > self.start and timestamp < self.timestamps[self.end - 1]:
+            position = self.start + int(np.searchsorted(self.timestamps[self.start:self.end], timestamp))
+            self.timestamps[position + 1:self.end + 1] = self.timestamps[position:self.end].copy()
+            self.indices[position + 1:self.end + 1] = self.indices[position:self.end].copy()
+        self.timestamps[position] = timestamp
+        self.indices[position] = index
+        self.end += 1
+        if self.end - self.start > self.capacity:
+            self.start += 1
+
+    def nearest(self, timestamps):
+        """
+        Finds the entries nearest to the given timestamps.
+
+        :param timestamps: np.ndarray: The timestamps to look up (a float for a single timestamp)
+        :return: tuple: The frame indices and timestamps of the nearest entries. The indices are -1 and the timestamps
+                        NaN while the ring is empty
+        """
+        entries = self.timestamps[self.start:self.end]
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if not len(entries):
+            return np.full(timestamps.shape, -1, dtype=np.int64), np.full(timestamps.shape, np.nan)
+        right = np.clip(np.searchsorted(entries, timestamps), 1, len(entries) - 1) if len(entries) > 1 else \
+            np.zeros(timestamps.shape, dtype=np.int64)
+        left = np.maximum(right - 1, 0)
+        nearest = np.where(np.abs(timestamps - entries[left]) <= np.abs(entries[right] - timestamps), left, right)
+        return self.indices[self.start:self.end][nearest], entries[nearest]
+
+
 class PupilCore(MiddlewareCommunicator):
 
     MWARE = PUPIL_CORE_DEFAULT_COMMUNICATOR
     ANNOTATIONS_PORT = "/pupil_core_controller/annotations"
     GAZE_COORDINATES_PORT = "/control_interface/gaze_coordinates"
+    GAZE_BATCH_PORT = "/pupil_core_controller/gaze_batch"
+    GAZE_BATCH_WINDOW = 0.02
+    FIXATIONS_PORT = "/pupil_core_controller/fixations"
+    WORLD_GAZE_PORT = "/pupil_core_controller/world_gaze_feed"
+    WORLD_TIMESTAMPS_SIZE = 300
+    WORLD_GAZE_HISTORY = 2.0
+    GAZE_HEATMAP_PORT = "/pupil_core_controller/gaze_heatmap"
+    GAZE_HEATMAP_WIDTH = 64
+    GAZE_HEATMAP_HEIGHT = 48
+    GAZE_BATCH_DTYPE = np.dtype([("timestamp", np.float64), ("norm_pos", np.float32, (2,)),
+                                 ("confidence", np.float32), ("yaw", np.float32), ("pitch", np.float32),
+                                 ("world_index", np.int64)])
     RECORDING_MESSAGE_PORT = "/pupil_core_controller/recording_message"
     CAM_WORLD_PORT = "/pupil_core_controller/world_video_feed"
     CAM_WORLD_FRAME_WIDTH = 1280
@@ -162,6 +548,9 @@ class PupilCore(MiddlewareCommunicator):
     CAM_RIGHT_FRAME_WIDTH = 192
     CAM_RIGHT_FRAME_HEIGHT = 192
     ANNOTATION_KEYS = ("recording_message",)
+    GAZE_CONSUMPTION_MODES = ("all", "latest", "batch")
+    FRAME_CONSUMPTION_MODES = ("all", "latest")
+    FRAME_FORMATS = ("jpeg", "bgr", "gray")
 
     def __init__(self, tcp_ip="localhost", tcp_port=50020, headless=False,
                  recording_message_port=RECORDING_MESSAGE_PORT,
@@ -172,7 +561,14 @@ class PupilCore(MiddlewareCommunicator):
                  get_cam_left_feed=False, cam_left_port=CAM_LEFT_PORT,
                  cam_left_height=CAM_LEFT_FRAME_HEIGHT, cam_left_width=CAM_LEFT_FRAME_WIDTH,
                  get_gaze_coordinates=True, gaze_coordinates_port=GAZE_COORDINATES_PORT,
+                 gaze_batch_port="", gaze_batch_window=GAZE_BATCH_WINDOW,
+                 detect_fixations=False, fixations_port=FIXATIONS_PORT, fixation_max_dispersion=1.5,
+                 fixation_min_duration=0.08, world_gaze_port="", world_timestamps_size=WORLD_TIMESTAMPS_SIZE,
+                 gaze_heatmap_port="", gaze_heatmap_rate=1.0, gaze_heatmap_width=GAZE_HEATMAP_WIDTH,
+                 gaze_heatmap_height=GAZE_HEATMAP_HEIGHT, gaze_heatmap_half_life=10.0,
                  gaze_message_type="fixation", min_gaze_confidence=0.2,  # gaze_message_type="gaze.3d"
+                 gaze_consumption="all", frame_consumption="latest", frame_decoding_threads=True, frame_format=None,
+                 clock_sync_period=1.0,
                  annotation_keys=ANNOTATION_KEYS, annotations_port=ANNOTATIONS_PORT, mware=MWARE, **kwargs):
 
         super(MiddlewareCommunicator, self).__init__()
@@ -180,6 +576,13 @@ class PupilCore(MiddlewareCommunicator):
         self.MWARE = mware
         self.ANNOTATIONS_PORT = annotations_port
         self.GAZE_COORDINATES_PORT = gaze_coordinates_port
+        self.GAZE_BATCH_PORT = gaze_batch_port
+        self.GAZE_BATCH_WINDOW = gaze_batch_window
+        self.FIXATIONS_PORT = fixations_port
+        self.WORLD_GAZE_PORT = world_gaze_port
+        self.GAZE_HEATMAP_PORT = gaze_heatmap_port
+        self.GAZE_HEATMAP_WIDTH = gaze_heatmap_width
+        self.GAZE_HEATMAP_HEIGHT = gaze_heatmap_height
         self.RECORDING_MESSAGE_PORT = recording_message_port
         self.ANNOTATION_KEYS = annotation_keys
         self.CAM_WORLD_PORT = cam_world_port
@@ -198,11 +601,19 @@ class PupilCore(MiddlewareCommunicator):
         self.get_gaze_coordinates = get_gaze_coordinates
         self.gaze_message_type = gaze_message_type
         self.min_gaze_confidence = min_gaze_confidence
+        if gaze_consumption not in self.GAZE_CONSUMPTION_MODES:
+            raise ValueError(f"gaze consumption must be one of {self.GAZE_CONSUMPTION_MODES}, got {gaze_consumption}")
+        if frame_consumption not in self.FRAME_CONSUMPTION_MODES:
+            raise ValueError(f"frame consumption must be one of {self.FRAME_CONSUMPTION_MODES}, "
+                             f"got {frame_consumption}")
+        if frame_format is not None and frame_format not in self.FRAME_FORMATS:
+            raise ValueError(f"frame format must be one of {self.FRAME_FORMATS}, got {frame_format}")
+        self.frame_format = None
 
         self.pupil_remote = None
 
         self.local_clock = None
-        self.stable_offset_mean = None
+        self.clock_sync = None
 
         self.prev_gaze = None
 
@@ -210,10 +621,15 @@ class PupilCore(MiddlewareCommunicator):
         # self.sub_socket_gaze = None
         check_capture_exists(self.tcp_ip, self.tcp_port)
 
+        # the Pupil Remote commands and annotations are sent by the control worker, such that the main loop is not
+        # blocked by slow responses of the Pupil
         if tcp_ip and tcp_port:
             self.pupil_remote, _ = setup_pupil_remote_connection(self.tcp_ip, self.tcp_port)
+            self.control = _ControlWorker(
+                self.pupil_remote, connect=lambda: setup_pupil_remote_connection(self.tcp_ip, self.tcp_port)[0])
         else:
             self.pupil_remote = None
+            self.control = None
         if recording_message_port:
             self.activate_communication(self.acquire_recording_message, "listen")
         else:
@@ -223,20 +639,17 @@ class PupilCore(MiddlewareCommunicator):
         if annotations_port or annotation_keys:
             _, self.pub_socket = setup_pupil_remote_connection(self.tcp_ip, self.tcp_port,
                                                                port_type="publisher")
+            self.control.pub_socket = self.pub_socket
+            # the clock is synchronized continuously on a separate Pupil Remote connection, such that the
+            # annotation timestamps follow the clock drift without blocking the start up or the main loop
             self.local_clock = time.perf_counter
-            self.stable_offset_mean = measure_clock_offset_stable(
-                self.pupil_remote, clock_function=self.local_clock, n_samples=10
+            self.clock_sync = _ClockSynchronizer(
+                lambda: setup_pupil_remote_connection(self.tcp_ip, self.tcp_port)[0],
+                clock_function=self.local_clock, period=clock_sync_period
             )
-            pupil_time_actual = request_pupil_time(self.pupil_remote)
-            local_time_actual = self.local_clock()
-            pupil_time_calculated_locally = local_time_actual + self.stable_offset_mean
-            logging.info(f"Pupil time actual: {pupil_time_actual}")
-            logging.info(f"Local time actual: {local_time_actual}")
-            logging.info(f"Stable offset: {self.stable_offset_mean}")
-            logging.info(f"Pupil time (calculated locally): {pupil_time_calculated_locally}")
-
-            notify(
-                self.pupil_remote,
+
+            self.control.submit(
+                notify,
                 {"subject": "start_plugin", "name": "Annotation_Capture", "args": {}},
             )
             self.activate_communication(getattr(self, "acquire_annotations"), "listen")
@@ -244,71 +657,313 @@ class PupilCore(MiddlewareCommunicator):
             self.activate_communication(self.acquire_annotations, "disable")
             self.activate_communication(self.write_annotation, "disable")
 
+        # a single SUB socket receives all streams. Messages are dispatched to their streams by topic as soon as they
+        # arrive, such that a quiet stream does not stall the others. Pupil eye camera 0 is the right eye
+        self.stream_topics = {}
         if get_gaze_coordinates and gaze_message_type:
-            _, self.sub_socket_gaze = setup_pupil_remote_connection(self.tcp_ip, self.tcp_port,
-                                                                    port_type="subscriber",
-                                                                    message_type=self.gaze_message_type)
+            self.stream_topics["gaze"] = self.gaze_message_type
             if gaze_coordinates_port:
                 self.activate_communication(self.read_gaze, "publish")
         else:
             self.activate_communication(self.read_gaze, "disable")
 
+        # the batch port publishes every gaze sample received within a window in a single message, independent of the
+        # gaze consumption mode. The received payloads are collected while polling and parsed at the end of the window
+        self.gaze_batch = None
+        self.gaze_batch_start = None
+        if "gaze" in self.stream_topics and gaze_batch_port:
+            self.gaze_batch = []
+            self.activate_communication(self.read_gaze_batch, "publish")
+        else:
+            self.activate_communication(self.read_gaze_batch, "disable")
+
+        # fixations are detected locally from every received gaze.3d sample, independent of the gaze consumption mode.
+        # This replaces Pupil's online fixation detector, which runs on the capture machine and publishes late
+        self.fixation_detector = None
+        self.fixation_payloads = []
+        self.fixation_events = deque()
+        if detect_fixations:
+            if self.stream_topics.get("gaze", None) != "gaze.3d":
+                raise ValueError("detecting fixations requires acquiring the gaze coordinates from gaze.3d messages")
+            self.fixation_detector = DispersionFixationDetector(max_dispersion=fixation_max_dispersion,
+                                                                min_duration=fixation_min_duration)
+            if fixations_port:
+                self.activate_communication(self.read_fixation, "publish")
+        else:
+            self.activate_communication(self.read_fixation, "disable")
+
         if get_cam_world_feed:
-            _, self.sub_socket_world_img = setup_pupil_remote_connection(self.tcp_ip, self.tcp_port,
-                                                                         port_type="subscriber",
-                                                                         message_type="frame.world")
+            self.stream_topics["world"] = "frame.world"
             if cam_world_port:
                 self.activate_communication(self.read_world_image, "publish")
         else:
             self.activate_communication(self.read_world_image, "disable")
 
+        if get_cam_right_feed:
+            self.stream_topics["right"] = "frame.eye.0"
+            if cam_right_port:
+                self.activate_communication(self.read_right_image, "publish")
+        else:
+            self.activate_communication(self.read_right_image, "disable")
+
         if get_cam_left_feed:
-            _, self.sub_socket_right_img = setup_pupil_remote_connection(self.tcp_ip, self.tcp_port,
-                                                                         port_type="subscriber",
-                                                                         message_type="frame.eye.1")
+            self.stream_topics["left"] = "frame.eye.1"
             if cam_left_port:
                 self.activate_communication(self.read_left_image, "publish")
         else:
             self.activate_communication(self.read_left_image, "disable")
 
-        if get_cam_right_feed:
-            _, self.sub_socket_left_img = setup_pupil_remote_connection(self.tcp_ip, self.tcp_port,
-                                                                        port_type="subscriber",
-                                                                        message_type="frame.eye.0")
-            if cam_right_port:
-                self.activate_communication(self.read_right_image, "publish")
+        # the heatmap accumulates every received gaze sample, independent of the gaze consumption mode, and is published
+        # at a low rate to replace the full gaze stream where only the gaze distribution is of interest
+        self.gaze_heatmap = None
+        self.gaze_heatmap_payloads = []
+        self.gaze_heatmap_period = 1.0 / gaze_heatmap_rate if gaze_heatmap_rate > 0 else 0.0
+        self.gaze_heatmap_published = None
+        if "gaze" in self.stream_topics and gaze_heatmap_port:
+            self.gaze_heatmap = GazeHeatmap(width=gaze_heatmap_width, height=gaze_heatmap_height,
+                                            half_life=gaze_heatmap_half_life)
+            self.activate_communication(self.read_gaze_heatmap, "publish")
         else:
-            self.activate_communication(self.read_right_image, "disable")
+            self.activate_communication(self.read_gaze_heatmap, "disable")
+
+        # the timestamps of all received world frames are kept to find the world frame nearest to each gaze sample.
+        # The world gaze port additionally publishes each world frame along with the gaze samples nearest to it, which
+        # are taken from a history of all received gaze samples
+        self.world_timestamps = _TimestampRing(world_timestamps_size) if "world" in self.stream_topics else None
+        self.world_frame_count = 0
+        self.world_gaze_payloads = None
+        self.gaze_history = np.zeros(0, dtype=self.GAZE_BATCH_DTYPE)
+        self.last_world_timestamp = None
+        self.world_frame_interval = 1.0 / 30.0
+        if "world" in self.stream_topics and "gaze" in self.stream_topics and world_gaze_port:
+            self.world_gaze_payloads = []
+            self.activate_communication(self.read_world_gaze, "publish")
+        else:
+            self.activate_communication(self.read_world_gaze, "disable")
+
+        # streams consumed in the "latest" mode keep the newest message only, such that the messages received while
+        # processing are skipped instead of accumulating a backlog. The "batch" mode consumes all pending messages at
+        # once. ZMQ_CONFLATE cannot be used instead, since it does not support multipart messages and the socket is
+        # shared by all streams
+        self.consumption = {stream: gaze_consumption if stream == "gaze" else frame_consumption
+                            for stream in self.stream_topics}
+        self.pending = {stream: deque(maxlen=1 if self.consumption[stream] == "latest" else None)
+                        for stream in self.stream_topics}
+        self.skipped = {stream: 0 for stream in self.stream_topics}
+        self.stream_prefixes = [(topic.encode(), stream) for stream, topic in self.stream_topics.items()]
+        self.sub_socket = None
+        self.poller = zmq.Poller()
+        if self.stream_topics:
+            _, self.sub_socket = setup_pupil_remote_connection(self.tcp_ip, self.tcp_port,
+                                                               port_type="subscriber",
+                                                               message_type=list(self.stream_topics.values()))
+            self.poller.register(self.sub_socket, zmq.POLLIN)
+
+        # decoding a 720p JPEG frame takes about as long as the update period. When decoding threads are enabled, each
+        # camera stream is decoded and published on its own worker thread, keeping the main loop free for the gaze
+        # and annotations. The decoded frames are written to reused buffers, rotated to not overwrite a frame which is
+        # still being displayed
+        self.frame_buffers = {stream: [None] * 3 for stream in ("world", "right", "left")}
+        self.frame_buffer_index = {stream: 0 for stream in ("world", "right", "left")}
+        self.frame_decoders = {}
+        self.frame_size_warnings = set()
+        if frame_decoding_threads:
+            if "world" in self.stream_topics:
+                self.frame_decoders["world"] = _FrameDecoder(self._process_world_frame, name="PupilWorldCamDecoder")
+            if "right" in self.stream_topics:
+                self.frame_decoders["right"] = _FrameDecoder(
+                    lambda message: self.read_right_image(cam_right_port=self.CAM_RIGHT_PORT,
+                                                          img_width=self.CAM_RIGHT_FRAME_WIDTH,
+                                                          img_height=self.CAM_RIGHT_FRAME_HEIGHT,
+                                                          _message=message, _mware=self.MWARE)[0],
+                    name="PupilRightCamDecoder")
+            if "left" in self.stream_topics:
+                self.frame_decoders["left"] = _FrameDecoder(
+                    lambda message: self.read_left_image(cam_left_port=self.CAM_LEFT_PORT,
+                                                         img_width=self.CAM_LEFT_FRAME_WIDTH,
+                                                         img_height=self.CAM_LEFT_FRAME_HEIGHT,
+                                                         _message=message, _mware=self.MWARE)[0],
+                    name="PupilLeftCamDecoder")
+
+        # the Frame Publisher applies a single format to all cameras. The frames are decoded according to the format
+        # given in their header, such that frames published before the switch are still decoded correctly
+        if frame_format is not None and any(stream in self.stream_topics for stream in ("world", "right", "left")):
+            self.set_frame_format(frame_format)
 
         self.build()
 
     def build(self):
         return
 
+    def poll(self, timeout=0.0, max_messages=1000):
+        """
+        Waits for messages from the Pupil and dispatches all received messages to their streams by topic.
+        :param timeout: float: Maximum time (in seconds) to wait for the first message
+        :param max_messages: int: Maximum number of messages received per call
+        :return: int: Number of messages received
+        """
+        if self.sub_socket is None:
+            time.sleep(timeout)
+            return 0
+        if not self.poller.poll(timeout * 1000):
+            return 0
+        received = 0
+        while received < max_messages:
+            try:
+                # the message parts are kept as zmq frames, such that the frame buffers are not copied into bytes
+                message = self.sub_socket.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                break
+            received += 1
+            topic = message[0].bytes
+            for prefix, stream in self.stream_prefixes:
+                if topic.startswith(prefix):
+                    if stream == "gaze" and self.gaze_batch is not None:
+                        if not self.gaze_batch:
+                            self.gaze_batch_start = time.time()
+                        self.gaze_batch.append(message[1])
+                    if stream == "gaze" and self.fixation_detector is not None:
+                        self.fixation_payloads.append(message[1])
+                    if stream == "gaze" and self.gaze_heatmap is not None:
+                        self.gaze_heatmap_payloads.append(message[1])
+                    if stream == "gaze" and self.world_gaze_payloads is not None:
+                        self.world_gaze_payloads.append(message[1])
+                    if stream == "world" and self.world_timestamps is not None:
+                        self._index_world_frame(message[1])
+                    pending = self.pending[stream]
+                    if pending.maxlen is not None and len(pending) == pending.maxlen:
+                        self.skipped[stream] += 1
+                    pending.append(message)
+                    break
+        return received
+
+    def _next_message(self, stream):
+        """
+        Gets the next message of a stream, receiving pending messages from the Pupil when none are left.
+        :param stream: str: The stream name (gaze, world, right, left)
+        :return: list: Message parts as zmq frames (topic, payload, and the frame buffer for camera streams). None
+                       when no message of the stream was received
+        """
+        pending = self.pending.get(stream, None)
+        if pending is None:
+            return None
+        if not pending:
+            self.poll()
+        return pending.popleft() if pending else None
+
+    def _next_messages(self, stream):
+        """
+        Gets all pending messages of a stream, receiving pending messages from the Pupil first.
+        :param stream: str: The stream name (gaze, world, right, left)
+        :return: list: Messages in order of arrival
+        """
+        pending = self.pending.get(stream, None)
+        if pending is None:
+            return []
+        self.poll()
+        messages = list(pending)
+        pending.clear()
+        return messages
+
+    def set_frame_format(self, frame_format):
+        """
+        Selects the format of the frames published by the Pupil by (re)starting its Frame Publisher plugin. JPEG
+        frames need to be decoded but take the least bandwidth, raw bgr frames skip decoding (e.g. when the Pupil runs
+        locally), and raw gray frames halve the bandwidth of the raw world frames at the cost of their color.
+
+        :param frame_format: str: The frame format (jpeg, bgr, gray)
+        :return: Future: The reply of the Pupil to the notification
+        """
+        if frame_format not in self.FRAME_FORMATS:
+            raise ValueError(f"frame format must be one of {self.FRAME_FORMATS}, got {frame_format}")
+        self.frame_format = frame_format
+        return self.control.submit(
+            notify,
+            {"subject": "start_plugin", "name": "Frame_Publisher", "args": {"format": frame_format}},
+        )
+
+    def _decode_jpeg(self, stream, payload, rgb=False):
+        """
+        Decodes a JPEG frame. RGB frames are converted into the next of the reused buffers of their stream.
+
+        :param stream: str: The stream name (world, right, left)
+        :param payload: bytes: The JPEG encoded frame
+        :param rgb: bool: Whether to decode the frame as RGB or grayscale
+        :return: np.ndarray: The decoded frame
+        """
+        img = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR if rgb else cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError(f"could not decode the {stream} camera frame")
+        return self._convert_rgb(stream, img, cv2.COLOR_BGR2RGB) if rgb else img
+
+    def _convert_rgb(self, stream, img, code):
+        """
+        Converts a frame to RGB into the next of the reused buffers of its stream.
+
+        :param stream: str: The stream name (world, right, left)
+        :param img: np.ndarray: The BGR or grayscale frame
+        :param code: int: The cv2 color conversion code (COLOR_BGR2RGB or COLOR_GRAY2RGB)
+        :return: np.ndarray: The RGB frame
+        """
+        buffers = self.frame_buffers[stream]
+        index = self.frame_buffer_index[stream] = (self.frame_buffer_index[stream] + 1) % len(buffers)
+        shape = img.shape[:2] + (3,)
+        if buffers[index] is None or buffers[index].shape != shape:
+            buffers[index] = np.empty(shape, dtype=np.uint8)
+        return cv2.cvtColor(img, code, dst=buffers[index])
+
+    def _decode_frame(self, stream, message, img_width, img_height, jpg=True, rgb=False):
+        """
+        Decodes a frame message of the Pupil frame publisher. The frame format and size are taken from the message
+        header, falling back to the selected (or else the given) format and size when the header does not specify
+        them. Raw frames (bgr or gray) are viewed without copying their buffer unless they need to be converted to the
+        requested channels. RGB frames are returned in RGB order independent of the frame format.
+
+        :param stream: str: The stream name (world, right, left)
+        :param message: list: Message parts as zmq frames (topic, header, and the frame buffer)
+        :param img_width: int: Width of the image when not given by the header
+        :param img_height: int: Height of the image when not given by the header
+        :param jpg: bool: Whether the frame is JPEG encoded when not given by the header
+        :param rgb: bool: Whether to return the frame as RGB or grayscale
+        :return: np.ndarray: The decoded frame
+        """
+        _, header, payload = message
+        header = serializer.loads(header)
+        frame_format = header.get("format", self.frame_format or ("jpeg" if jpg else ("bgr" if rgb else "gray")))
+        if frame_format == "jpeg":
+            return self._decode_jpeg(stream, payload, rgb=rgb)
+        width, height = header.get("width", img_width), header.get("height", img_height)
+        if (width, height) != (img_width, img_height) and stream not in self.frame_size_warnings:
+            self.frame_size_warnings.add(stream)
+            logging.warning(f"The {stream} camera frames are {width}x{height} instead of {img_width}x{img_height}, "
+                            f"set the {stream} camera width and height to publish them")
+        img = np.frombuffer(payload, dtype=np.uint8)
+        if frame_format == "bgr":
+            img = img.reshape(height, width, 3)
+            return self._convert_rgb(stream, img, cv2.COLOR_BGR2RGB) if rgb else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        elif frame_format == "gray":
+            img = img.reshape(height, width)
+            return self._convert_rgb(stream, img, cv2.COLOR_GRAY2RGB) if rgb else img
+        else:
+            raise ValueError(f"unsupported {stream} camera frame format {frame_format}")
+
     @MiddlewareCommunicator.register("Image", "$_mware", "PupilCore", "$cam_world_port",
                                      width="$img_width", height="$img_height", rgb="$_rgb")
     def read_world_image(self, cam_world_port, img_width=CAM_WORLD_FRAME_WIDTH, img_height=CAM_WORLD_FRAME_HEIGHT,
-                         jpg=True, _rgb=True, _mware=MWARE):
+                         jpg=True, _rgb=True, _mware=MWARE, **kwargs):
         """
         Read images from the world camera of the Pupil Core.
 
         :param cam_world_port: str: Port to receive images from the world camera
         :param img_width: int: Width of the image
         :param img_height: int: Height of the image
+        :param jpg: bool: Whether the frames are JPEG encoded when the message header does not specify their format
         :param _rgb: bool: Whether the image is RGB or not
         :return: Images from the Pupil
         """
         try:
-            _, _, payload = self.sub_socket_world_img.recv_multipart()
-            if jpg:
-                img_stream = io.BytesIO(payload)
-                img = np.array(PIL.Image.open(img_stream))
-
-            elif _rgb:
-                img = np.fromstring(payload, dtype=np.uint8).reshape(img_height, img_width, 3)
-            else:
-                img = np.fromstring(payload, dtype=np.uint8).reshape(img_height, img_width)
-            return img,
+            message = kwargs.get("_message", None) or self._next_message("world")
+            return self._decode_frame("world", message, img_width, img_height, jpg=jpg, rgb=_rgb),
         except:
             if _rgb:
                 return np.zeros((img_height, img_width, 3), dtype="uint8"),
@@ -317,56 +972,278 @@ class PupilCore(MiddlewareCommunicator):
 
     @MiddlewareCommunicator.register("Image", "$_mware", "PupilCore", "$cam_right_port",
                                      width="$img_width", height="$img_height", rgb=False)
-    def read_right_image(self, cam_right_port, img_width=CAM_RIGHT_FRAME_WIDTH, img_height=CAM_WORLD_FRAME_HEIGHT,
-                         jpg=True, _mware=MWARE):
+    def read_right_image(self, cam_right_port, img_width=CAM_RIGHT_FRAME_WIDTH, img_height=CAM_RIGHT_FRAME_HEIGHT,
+                         jpg=True, _mware=MWARE, **kwargs):
         """
         Read images from the right eye camera of the Pupil Core.
 
         :param cam_right_port: str: Port to receive images from the right eye camera
         :param img_width: int: Width of the image
         :param img_height: int: Height of the image
+        :param jpg: bool: Whether the frames are JPEG encoded when the message header does not specify their format
         :return: Images from the Pupil
         """
         try:
-            _, _, payload = self.sub_socket_right_img.recv_multipart()
-            if jpg:
-                img_stream = io.BytesIO(payload)
-                img = np.array(PIL.Image.open(img_stream))
-            else:
-                img = np.fromstring(payload, dtype=np.uint8).reshape(img_height, img_width)
-            return img,
+            message = kwargs.get("_message", None) or self._next_message("right")
+            return self._decode_frame("right", message, img_width, img_height, jpg=jpg, rgb=False),
         except:
             return np.zeros((img_height, img_width), dtype="uint8"),
 
     @MiddlewareCommunicator.register("Image", "$_mware", "PupilCore", "$cam_left_port",
                                      width="$img_width", height="$img_height", rgb=False)
     def read_left_image(self, cam_left_port, img_width=CAM_LEFT_FRAME_WIDTH, img_height=CAM_LEFT_FRAME_HEIGHT,
-                        jpg=True, _mware=MWARE):
+                        jpg=True, _mware=MWARE, **kwargs):
         """
         Read images from the left eye camera of the Pupil Core.
 
         :param cam_left_port: str: Port to receive images from the left eye camera
         :param img_width: int: Width of the image
         :param img_height: int: Height of the image
+        :param jpg: bool: Whether the frames are JPEG encoded when the message header does not specify their format
         :return: Images from the Pupil
         """
         try:
-            _, _, payload = self.sub_socket_left_img.recv_multipart()
-            if jpg:
-                img_stream = io.BytesIO(payload)
-                img = np.array(PIL.Image.open(img_stream))
-            else:
-                img = np.fromstring(payload, dtype=np.uint8).reshape(img_height, img_width)
-            return img,
+            message = kwargs.get("_message", None) or self._next_message("left")
+            return self._decode_frame("left", message, img_width, img_height, jpg=jpg, rgb=False),
         except:
             return np.zeros((img_height, img_width), dtype="uint8"),
 
     @MiddlewareCommunicator.register("NativeObject", "$_mware", "PupilCore", "$gaze_coordinates_port",
                                      carrier="", should_wait=False)
-    def read_gaze(self, gaze_coordinates_port=GAZE_COORDINATES_PORT, _mware=MWARE):
+    def read_gaze(self, gaze_coordinates_port=GAZE_COORDINATES_PORT, _mware=MWARE, **kwargs):
+        """
+        Read the gaze coordinates from the Pupil Core. In the "batch" gaze consumption mode, all pending gaze samples
+        are read at once and the message of the newest sample lists all of them (samples).
+
+        :param gaze_coordinates_port: str: Port to publish the gaze coordinates to
+        :return: dict: Gaze message with the yaw and pitch angles in degrees. None when no sample with sufficient
+                       confidence was received
+        """
+        if self.consumption.get("gaze", None) == "batch":
+            samples = [gaze_message for gaze_message in map(self._parse_gaze, self._next_messages("gaze"))
+                       if gaze_message is not None]
+            return (dict(samples[-1], samples=samples),) if samples else (None,)
+        return self._parse_gaze(self._next_message("gaze")),
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "PupilCore", "$gaze_batch_port",
+                                     carrier="", should_wait=False)
+    def read_gaze_batch(self, gaze_batch_port=GAZE_BATCH_PORT, _mware=MWARE, **kwargs):
+        """
+        Read all gaze samples collected since the last batch from the Pupil Core. The yaw and pitch angles and the
+        confidence filter are computed over the whole batch at once.
+
+        :param gaze_batch_port: str: Port to publish the gaze sample batches to
+        :return: dict: Gaze batch message with the accepted samples as a structured array (samples) of GAZE_BATCH_DTYPE,
+                       with the yaw and pitch angles in degrees. None when no sample was collected
+        """
+        if not self.gaze_batch:
+            return None,
+        payloads, self.gaze_batch = self.gaze_batch, []
+        samples = self._parse_gaze_samples(payloads)
+        return {
+            "topic": "gaze_batch",
+            "gaze_message_type": self.gaze_message_type,
+            "samples": samples,
+            "received": len(payloads),
+            "timestamp": time.time(),
+            "order": "xyz",
+            "quaternion": False,
+        },
+
+    def _parse_gaze_samples(self, payloads):
+        """
+        Parses gaze messages into a structured array, computing the yaw and pitch angles, the confidence filter and the
+        nearest world frames over all samples at once. The nearest world frame is found among the frames received so
+        far, i.e. samples received ahead of the next world frame refer to the latest one.
+
+        :param payloads: list: The msgpack encoded gaze messages
+        :return: np.ndarray: The samples with sufficient confidence as a structured array of GAZE_BATCH_DTYPE
+        """
+        columns = np.zeros((len(payloads), 6), dtype=np.float64)
+        for idx, payload in enumerate(payloads):
+            try:
+                message = serializer.loads(payload)
+                if self.gaze_message_type == "fixation":
+                    columns[idx] = (message["timestamp"], *message["norm_pos"], message["confidence"], 0.0, 0.0)
+                else:
+                    columns[idx] = (message["timestamp"], *message["norm_pos"], message["confidence"],
+                                    message["base_data"][0]["theta"], message["base_data"][0]["phi"])
+            except:
+                # samples which cannot be parsed keep a confidence of 0 and are filtered out below
+                columns[idx] = 0.0
+        samples = np.zeros(len(payloads), dtype=self.GAZE_BATCH_DTYPE)
+        samples["timestamp"] = columns[:, 0]
+        samples["norm_pos"] = columns[:, 1:3]
+        samples["confidence"] = columns[:, 3]
+        if self.gaze_message_type == "fixation":
+            angles = np.arctan2((columns[:, 1:3] - 0.5) * 2, 1)
+        else:
+            angles = columns[:, 4:6]
+        angles = np.rad2deg(angles)
+        samples["yaw"] = angles[:, 0]
+        samples["pitch"] = angles[:, 1]
+        samples = samples[samples["confidence"] > self.min_gaze_confidence]
+        if self.world_timestamps is not None:
+            samples["world_index"] = self.world_timestamps.nearest(samples["timestamp"])[0]
+        else:
+            samples["world_index"] = -1
+        return samples
+
+    @MiddlewareCommunicator.register("Image", "$_mware", "PupilCore", "$gaze_heatmap_port",
+                                     width="$img_width", height="$img_height", rgb=False, should_wait=False)
+    def read_gaze_heatmap(self, gaze_heatmap_port=GAZE_HEATMAP_PORT, img_width=GAZE_HEATMAP_WIDTH,
+                          img_height=GAZE_HEATMAP_HEIGHT, _mware=MWARE, **kwargs):
+        """
+        Read the heatmap of the gaze samples received from the Pupil Core, decaying exponentially over time. The
+        heatmap covers the world camera frame and is normalized to its maximum.
+
+        :param gaze_heatmap_port: str: Port to publish the gaze heatmap to
+        :param img_width: int: Width of the heatmap
+        :param img_height: int: Height of the heatmap
+        :return: np.ndarray: The gaze heatmap as a grayscale image
+        """
+        return self.gaze_heatmap.image(),
+
+    def update_gaze_heatmap(self):
+        """
+        Adds the gaze samples received since the last call to the gaze heatmap, weighted by their confidence.
+        """
+        payloads, self.gaze_heatmap_payloads = self.gaze_heatmap_payloads, []
+        if payloads:
+            samples = self._parse_gaze_samples(payloads)
+            self.gaze_heatmap.update(samples["timestamp"], samples["norm_pos"][:, 0], samples["norm_pos"][:, 1],
+                                     weights=samples["confidence"])
+
+    def _index_world_frame(self, header):
+        """
+        Adds a received world frame to the world frame timestamps.
+
+        :param header: zmq.Frame: The msgpack encoded frame header
+        """
+        try:
+            header = serializer.loads(header)
+            timestamp = header["timestamp"]
+            self.world_timestamps.append(timestamp, header.get("index", self.world_frame_count))
+            if self.last_world_timestamp is not None and timestamp > self.last_world_timestamp:
+                self.world_frame_interval = timestamp - self.last_world_timestamp
+            self.last_world_timestamp = timestamp
+        except:
+            pass
+        self.world_frame_count += 1
+
+    def update_gaze_history(self):
+        """
+        Adds the gaze samples received since the last call to the gaze history, dropping the samples older than
+        WORLD_GAZE_HISTORY seconds.
+        """
+        payloads, self.world_gaze_payloads = self.world_gaze_payloads, []
+        if not payloads:
+            return
+        history = np.concatenate((self.gaze_history, self._parse_gaze_samples(payloads)))
+        # the history is replaced rather than modified, since the world frames may be processed on a decoding thread
+        self.gaze_history = history[history["timestamp"] >= history["timestamp"][-1] - self.WORLD_GAZE_HISTORY]
+
+    def _process_world_frame(self, message):
+        """
+        Decodes and publishes a world frame and, when enabled, publishes it along with its gaze samples.
+
+        :param message: list: Message parts as zmq frames (topic, header, and the frame buffer)
+        :return: np.ndarray: The decoded world frame
+        """
+        world_cam, = self.read_world_image(cam_world_port=self.CAM_WORLD_PORT,
+                                           img_width=self.CAM_WORLD_FRAME_WIDTH,
+                                           img_height=self.CAM_WORLD_FRAME_HEIGHT,
+                                           _message=message, _mware=self.MWARE)
+        if self.world_gaze_payloads is not None and world_cam is not None:
+            self.read_world_gaze(world_cam, message[1], world_gaze_port=self.WORLD_GAZE_PORT, _mware=self.MWARE)
+        return world_cam
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "PupilCore", "$world_gaze_port",
+                                     carrier="", should_wait=False)
+    def read_world_gaze(self, img, header, world_gaze_port=WORLD_GAZE_PORT, _mware=MWARE, **kwargs):
+        """
+        Read a world frame along with the gaze samples nearest to it, i.e. the samples within half the interval between
+        the latest received world frames of the frame timestamp. Only the samples received by the time the frame is
+        decoded are attached.
+
+        :param img: np.ndarray: The decoded world frame
+        :param header: zmq.Frame: The msgpack encoded frame header
+        :param world_gaze_port: str: Port to publish the world frames with their gaze samples to
+        :return: dict: World frame message with the frame (img), its index and Pupil timestamp, and its gaze samples
+                       as a structured array (gaze) of GAZE_BATCH_DTYPE
+        """
+        header = serializer.loads(header)
+        world_timestamp = header["timestamp"]
+        half_interval = self.world_frame_interval / 2.0
+        history = self.gaze_history
+        gaze = history[(history["timestamp"] >= world_timestamp - half_interval) &
+                       (history["timestamp"] < world_timestamp + half_interval)]
+        return {
+            "topic": "world_gaze",
+            "world_index": header.get("index", -1),
+            "world_timestamp": world_timestamp,
+            "img": img,
+            "gaze": gaze,
+            "timestamp": time.time(),
+        },
+
+    def detect_fixations(self):
+        """
+        Passes the gaze samples received since the last call to the fixation detector, queueing the fixation events
+        to be read with read_fixation.
+
+        :return: int: Number of fixation events detected
+        """
+        payloads, self.fixation_payloads = self.fixation_payloads, []
+        detected = 0
+        for payload in payloads:
+            try:
+                message = serializer.loads(payload)
+                if message["confidence"] <= self.min_gaze_confidence:
+                    continue
+                events = self.fixation_detector.update(message["timestamp"],
+                                                       float(np.rad2deg(message["base_data"][0]["theta"])),
+                                                       float(np.rad2deg(message["base_data"][0]["phi"])))
+            except:
+                continue
+            self.fixation_events.extend(events)
+            detected += len(events)
+        return detected
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "PupilCore", "$fixations_port",
+                                     carrier="", should_wait=False)
+    def read_fixation(self, fixations_port=FIXATIONS_PORT, _mware=MWARE, **kwargs):
+        """
+        Read the next fixation event detected locally from the gaze.3d samples. Onsets are detected once a fixation
+        lasted the minimum fixation duration, and offsets with the first sample outside the fixation.
+
+        :param fixations_port: str: Port to publish the fixation events to
+        :return: dict: Fixation event (onset or offset) with the Pupil timestamps, the yaw and pitch angles of the
+                       fixation centroid in degrees, and the dispersion in degrees. None when no event is pending
+        """
+        if not self.fixation_events:
+            return None,
+        event = self.fixation_events.popleft()
+        return {
+            "topic": "fixation_event",
+            "event": event["event"],
+            "id": event["id"],
+            "start_timestamp": event["start_timestamp"],
+            "end_timestamp": event.get("end_timestamp", None),
+            "duration": event["duration"],
+            "yaw": event["x"],
+            "pitch": event["y"],
+            "dispersion": event["dispersion"],
+            "samples": event["samples"],
+            "timestamp": time.time(),
+            "order": "xyz",
+            "quaternion": False,
+        },
+
+    def _parse_gaze(self, message):
         confidence = None
         try:
-            _, payload = self.sub_socket_gaze.recv_multipart()
+            _, payload = message
             message = serializer.loads(payload)
 
             if self.gaze_message_type == "fixation":
@@ -392,9 +1269,12 @@ class PupilCore(MiddlewareCommunicator):
                 "order": "xyz",
                 "quaternion": False,
             }
+            if self.world_timestamps is not None:
+                world_index, world_timestamp = self.world_timestamps.nearest(message["timestamp"])
+                gaze_message.update(world_index=int(world_index), world_timestamp=float(world_timestamp))
         except:
             gaze_message = None
-        return (gaze_message, ) if confidence and confidence > self.min_gaze_confidence else (None,)
+        return gaze_message if confidence and confidence > self.min_gaze_confidence else None
 
     @MiddlewareCommunicator.register("NativeObject", "$_mware", "PupilCore",
                                      "$annotations_port", should_wait=False)
@@ -403,16 +1283,43 @@ class PupilCore(MiddlewareCommunicator):
 
     @MiddlewareCommunicator.register("NativeObject", "$_mware", "PupilCore", "/pupil_core_controller/logs/annotation",
                                      carrier="", should_wait=False)
-    def write_annotation(self, annotation_key, _mware=MWARE, **kwargs):
+    def write_annotation(self, annotation_key, _local_time=None, _mware=MWARE, **kwargs):
         # Ensure start_recording() was triggered before calling this function
-        local_time = self.local_clock()
-        duration = 0.0
-        annotation_message = new_trigger(annotation_key, duration, local_time + self.stable_offset_mean)
+        local_time = self.local_clock() if _local_time is None else _local_time
         if "topic" in kwargs:
             del kwargs["topic"]
+        pupil_time = self.clock_sync.pupil_time(local_time, timeout=0)
+        if pupil_time is None:
+            # the main loop does not wait for the first synchronization. The control worker timestamps the annotation
+            # once the clock is synchronized instead
+            logging.info("Pupil clock not synchronized yet, annotation deferred")
+            self.control.submit(self._annotate_when_synchronized, annotation_key, local_time, kwargs)
+            return None,
+        annotation_message = new_trigger(annotation_key, 0.0, pupil_time)
         annotation_message.update(**kwargs)
-        send_trigger(self.pub_socket, annotation_message)
-        return annotation_message,
+        self.control.annotate(annotation_message)
+        # the synchronization quality is only published with the logged annotation, not sent to the Pupil
+        return dict(annotation_message, clock_sync=self.clock_sync.stats()),
+
+    def _annotate_when_synchronized(self, pupil_remote, annotation_key, local_time, annotation_kwargs, timeout=2.0):
+        """
+        Waits for the first clock synchronization on the control worker and queues the annotation made before it.
+
+        :param pupil_remote: zmq.Socket: The Pupil Remote socket of the control worker (unused)
+        :param annotation_key: str: The annotation label
+        :param local_time: float: The local time of the annotation
+        :param annotation_kwargs: dict: Additional annotation fields
+        :param timeout: float: Maximum time (in seconds) to wait for the synchronization
+        :return: dict: The annotation. None when the clock was not synchronized in time and the annotation is dropped
+        """
+        pupil_time = self.clock_sync.pupil_time(local_time, timeout=timeout)
+        if pupil_time is None:
+            logging.warning("Pupil clock not synchronized, annotation dropped")
+            return None
+        annotation_message = new_trigger(annotation_key, 0.0, pupil_time)
+        annotation_message.update(**annotation_kwargs)
+        self.control.annotate(annotation_message)
+        return annotation_message
 
     @MiddlewareCommunicator.register("NativeObject", "$_mware", "PupilCore",
                                      "$recording_message_port", should_wait=False)
@@ -438,59 +1345,89 @@ class PupilCore(MiddlewareCommunicator):
 
     def start_calibration(self):
         logging.info("Start calibration")
-        self.pupil_remote.send_string("C")
-        logging.info(self.pupil_remote.recv_string())
+        return self.control.submit(remote_command, "C")
 
     def end_calibration(self):
         logging.info("End calibration")
-        self.pupil_remote.send_string("c")
-        logging.info(self.pupil_remote.recv_string())
+        return self.control.submit(remote_command, "c")
 
     def start_recording(self, session_name=""):
         logging.info("Start recording")
         cmd = f"R {session_name}" if session_name else "R"
-        self.pupil_remote.send_string(cmd)
-        logging.info(self.pupil_remote.recv_string())
+        return self.control.submit(remote_command, cmd)
 
     def end_recording(self):
         logging.info("End recording")
-        self.pupil_remote.send_string("r")
-        logging.info(self.pupil_remote.recv_string())
+        return self.control.submit(remote_command, "r")
 
     def getPeriod(self):
         return 0.01
 
     def updateModule(self):
         annotations = {}
-        if hasattr(self, "sub_socket_world_img"):
-            world_cam, = self.read_world_image(cam_world_port=self.CAM_WORLD_PORT,
-                                               img_width=self.CAM_WORLD_FRAME_WIDTH,
-                                               img_height=self.CAM_WORLD_FRAME_HEIGHT, _mware=self.MWARE)
+        # waiting for the next messages replaces sleeping between updates. The gaze stream is processed first since
+        # decoding frames takes considerably longer
+        self.poll(timeout=self.getPeriod())
+        if self.gaze_batch and time.time() - self.gaze_batch_start >= self.GAZE_BATCH_WINDOW:
+            self.read_gaze_batch(gaze_batch_port=self.GAZE_BATCH_PORT, _mware=self.MWARE)
+        if self.fixation_detector is not None:
+            self.detect_fixations()
+            while self.fixation_events:
+                fixation, = self.read_fixation(fixations_port=self.FIXATIONS_PORT, _mware=self.MWARE)
+                logging.info(fixation)
+        if self.world_gaze_payloads is not None:
+            self.update_gaze_history()
+        if self.gaze_heatmap is not None:
+            self.update_gaze_heatmap()
+            if self.gaze_heatmap_published is None or \
+                    time.time() - self.gaze_heatmap_published >= self.gaze_heatmap_period:
+                self.gaze_heatmap_published = time.time()
+                self.read_gaze_heatmap(gaze_heatmap_port=self.GAZE_HEATMAP_PORT, img_width=self.GAZE_HEATMAP_WIDTH,
+                                       img_height=self.GAZE_HEATMAP_HEIGHT, _mware=self.MWARE)
+        if self.gaze_batch is not None and not self.GAZE_COORDINATES_PORT:
+            # the gaze samples are only published in batches
+            self.pending["gaze"].clear()
+        while self.pending.get("gaze", None):
+            gaze, = self.read_gaze(gaze_coordinates_port=self.GAZE_COORDINATES_PORT, _mware=self.MWARE)
+            if gaze is not None:
+                self.prev_gaze = gaze
+                logging.info(gaze)
+            else:
+                logging.info(self.prev_gaze)
+        for stream, window_name in (("world", "PupilWorldCam"), ("left", "PupilLeftCam"), ("right", "PupilRightCam")):
+            decoder = self.frame_decoders.get(stream, None)
+            if decoder is None:
+                continue
+            # only the newest frame is handed to the decoder, any older pending frame would be replaced right away
+            pending = self.pending[stream]
+            if pending:
+                self.skipped[stream] += len(pending) - 1
+                decoder.submit(pending.pop())
+                pending.clear()
+            cam = decoder.take()
+            if not self.headless and cam is not None:
+                cv2.imshow(window_name, cam)
+                cv2.waitKey(1)
+        while self.pending.get("world", None) and "world" not in self.frame_decoders:
+            world_cam = self._process_world_frame(self._next_message("world"))
             if not self.headless and world_cam is not None:
                 cv2.imshow("PupilWorldCam", world_cam)
                 cv2.waitKey(1)
-        if hasattr(self, "sub_socket_left_img"):
+        while self.pending.get("left", None) and "left" not in self.frame_decoders:
             left_cam, = self.read_left_image(cam_left_port=self.CAM_LEFT_PORT,
-                                               img_width=self.CAM_LEFT_FRAME_WIDTH,
-                                               img_height=self.CAM_LEFT_FRAME_HEIGHT, _mware=self.MWARE)
+                                             img_width=self.CAM_LEFT_FRAME_WIDTH,
+                                             img_height=self.CAM_LEFT_FRAME_HEIGHT, _mware=self.MWARE)
             if not self.headless and left_cam is not None:
                 cv2.imshow("PupilLeftCam", left_cam)
                 cv2.waitKey(1)
-        if hasattr(self, "sub_socket_left_img"):
-            right_cam, = self.read_left_image(cam_left_port=self.CAM_LEFT_PORT,
-                                               img_width=self.CAM_LEFT_FRAME_WIDTH,
-                                               img_height=self.CAM_LEFT_FRAME_HEIGHT, _mware=self.MWARE)
+        while self.pending.get("right", None) and "right" not in self.frame_decoders:
+            right_cam, = self.read_right_image(cam_right_port=self.CAM_RIGHT_PORT,
+                                               img_width=self.CAM_RIGHT_FRAME_WIDTH,
+                                               img_height=self.CAM_RIGHT_FRAME_HEIGHT, _mware=self.MWARE)
             if not self.headless and right_cam is not None:
                 cv2.imshow("PupilRightCam", right_cam)
                 cv2.waitKey(1)
 
-        if hasattr(self, "sub_socket_gaze"):
-            gaze, = self.read_gaze(gaze_coordinates_port=self.GAZE_COORDINATES_PORT, _mware=self.MWARE)
-            if gaze is not None:
-                self.prev_gaze = gaze
-                logging.info(gaze)
-            else:
-                logging.info(self.prev_gaze)
         # writing and publishing
         session, = self.acquire_recording_message(recording_message_port=self.RECORDING_MESSAGE_PORT, _mware=self.MWARE)
 
@@ -503,10 +1440,12 @@ class PupilCore(MiddlewareCommunicator):
         anno_return = anno_return or {}
         anno_return.update(transmitted_annotation)
 
+        # the annotations of an update share their timestamp, such that repeated annotations are coalesced
+        local_time = self.local_clock() if self.local_clock is not None else None
         for annotation_key in self.ANNOTATION_KEYS:
             anno_return.get(annotation_key, None)
             if anno_return is not None:
-                self.write_annotation(annotation_key, _mware=self.MWARE, **anno_return)
+                self.write_annotation(annotation_key, _local_time=local_time, _mware=self.MWARE, **anno_return)
                 annotations.clear()
         return True
 
@@ -515,7 +1454,6 @@ class PupilCore(MiddlewareCommunicator):
         while True:
             try:
                 self.updateModule()
-                time.sleep(self.getPeriod())
             except Exception as e:
                 logging.error(e)
                 # break
@@ -523,13 +1461,18 @@ class PupilCore(MiddlewareCommunicator):
             self.end_recording()
 
     def __del__(self):
+        for decoder in getattr(self, "frame_decoders", {}).values():
+            decoder.stop()
+        if getattr(self, "clock_sync", None) is not None:
+            self.clock_sync.stop()
+        # the sockets share the context, which cannot be terminated while any of them is open. The control worker
+        # closes the Pupil Remote and PUB sockets after sending the pending commands
+        if getattr(self, "control", None) is not None:
+            self.control.stop()
+        if getattr(self, "sub_socket", None) is not None:
+            self.sub_socket.close()
         if self.pupil_remote is not None:
-            self.pupil_remote.close()
             self.pupil_remote.context.term()
-        if hasattr(self, "sub_socket_gaze"):
-            self.sub_socket_gaze.close()
-        if hasattr(self, "pub_socket"):
-            self.pub_socket.close()
 
 
 class PupilCoreCommandLine(MiddlewareCommunicator):
@@ -592,10 +1535,57 @@ def parse_args():
     parser.add_argument("--get_gaze_coordinates", action="store_true", help="Get the gaze coordinates from the Pupil")
     parser.add_argument("--gaze_coordinates_port", type=str, default="",
                         help="The port (topic) name used for transmitting the acquired gaze coordinates")
+    parser.add_argument("--gaze_batch_port", type=str, default="",
+                        help="The port (topic) name used for transmitting all gaze coordinates acquired within a "
+                             "window as a single structured array")
+    parser.add_argument("--gaze_batch_window", type=float, default=PupilCore.GAZE_BATCH_WINDOW,
+                        help="The duration (in seconds) of the window over which the gaze coordinates are batched")
+    parser.add_argument("--detect_fixations", action="store_true",
+                        help="Detect fixations locally from the gaze.3d messages instead of relying on Pupil's online "
+                             "fixation detector. Requires --get_gaze_coordinates and --gaze_message_type gaze.3d")
+    parser.add_argument("--fixations_port", type=str, default="",
+                        help="The port (topic) name used for transmitting the fixation onset and offset events")
+    parser.add_argument("--fixation_max_dispersion", type=float, default=1.5,
+                        help="Maximum dispersion (in degrees) of the gaze within a fixation")
+    parser.add_argument("--fixation_min_duration", type=float, default=0.08,
+                        help="Minimum duration (in seconds) of a fixation")
+    parser.add_argument("--world_gaze_port", type=str, default="",
+                        help="The port (topic) name used for transmitting the world camera frames along with the gaze "
+                             "samples nearest to each frame. Requires the world camera feed")
+    parser.add_argument("--world_timestamps_size", type=int, default=PupilCore.WORLD_TIMESTAMPS_SIZE,
+                        help="The number of recent world frame timestamps kept to find the world frame nearest to "
+                             "each gaze sample")
+    parser.add_argument("--gaze_heatmap_port", type=str, default="",
+                        help="The port (topic) name used for transmitting the heatmap of the gaze samples over the world "
+                             "camera frame, replacing the full gaze stream for consumers of the gaze distribution")
+    parser.add_argument("--gaze_heatmap_rate", type=float, default=1.0,
+                        help="The rate (in Hz) at which the gaze heatmap is transmitted")
+    parser.add_argument("--gaze_heatmap_width", type=int, default=PupilCore.GAZE_HEATMAP_WIDTH,
+                        help="The number of horizontal bins of the gaze heatmap")
+    parser.add_argument("--gaze_heatmap_height", type=int, default=PupilCore.GAZE_HEATMAP_HEIGHT,
+                        help="The number of vertical bins of the gaze heatmap")
+    parser.add_argument("--gaze_heatmap_half_life", type=float, default=10.0,
+                        help="The time (in seconds) after which the weight of a gaze sample in the heatmap is halved")
     parser.add_argument("--gaze_message_type", type=str, default="fixation", choices=("fixation", "gaze.3d"),
                         help="The gaze message name to acquire directly from the Pupil")
     parser.add_argument("--min_gaze_confidence", type=float, default=0.2,
                         help="Minimum gaze confidence to accept before publishing coordinates. Max is 1, min is 0")
+    parser.add_argument("--gaze_consumption", type=str, default="all", choices=PupilCore.GAZE_CONSUMPTION_MODES,
+                        help="How pending gaze samples are consumed: one sample per read (all), the newest sample "
+                             "only, skipping older samples (latest), or all pending samples in one message (batch)")
+    parser.add_argument("--frame_consumption", type=str, default="latest", choices=PupilCore.FRAME_CONSUMPTION_MODES,
+                        help="How pending camera frames are consumed: one frame per read (all) or the newest frame "
+                             "only, skipping older frames (latest)")
+    parser.add_argument("--frame_format", type=str, default=None, choices=PupilCore.FRAME_FORMATS,
+                        help="The format of the camera frames selected on the Pupil Frame Publisher at startup. JPEG "
+                             "frames take the least bandwidth, raw bgr frames need no decoding (e.g. on localhost), "
+                             "and raw gray frames lack color. Defaults to the format already set on the Pupil")
+    parser.add_argument("--disable_frame_decoding_threads", dest="frame_decoding_threads", action="store_false",
+                        help="Decode (and publish) the camera frames on the main loop instead of a worker thread per "
+                             "camera. Worker threads only decode the newest frame of each camera")
+    parser.add_argument("--clock_sync_period", type=float, default=1.0,
+                        help="The time (in seconds) between the Pupil clock synchronization measurements, which are "
+                             "used to timestamp the annotations")
     parser.add_argument("--annotations_port", type=str, default="",
                         help="The port (topic) name used for receiving the annotations which are then transmitted to the Pupil")
     parser.add_argument('--annotation_keys', nargs='*', default=('recording_message'),
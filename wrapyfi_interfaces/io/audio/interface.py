@@ -0,0 +1,1330 @@
+import logging
+import argparse
+import time
+import wave
+import struct
+from threading import Thread, Condition, Lock
+import os
+
+import numpy as np
+
+from wrapyfi.connect.wrapper import MiddlewareCommunicator, DEFAULT_COMMUNICATOR
+from wrapyfi_interfaces.utils.helpers import str_or_int
+from wrapyfi_interfaces.utils.audio import VoiceActivityDetector, PolyphaseResampler, LogMelExtractor, JitterBuffer, \
+    DelayAndSumBeamformer
+
+try:
+    import sounddevice as sd
+    HAVE_SOUNDDEVICE = True
+except (ImportError, OSError):
+    HAVE_SOUNDDEVICE = False
+
+AUDIO_DEFAULT_COMMUNICATOR = os.environ.get("AUDIO_DEFAULT_COMMUNICATOR", DEFAULT_COMMUNICATOR)
+AUDIO_DEFAULT_COMMUNICATOR = os.environ.get("AUDIO_DEFAULT_MWARE", AUDIO_DEFAULT_COMMUNICATOR)
+
+"""
+Audio and Microphone listener + publisher. This is the audio equivalent of the video interface
+(wrapyfi_interfaces/io/video/interface.py) streaming fixed-size PCM blocks from devices, WAV files, or a
+synthetic generator.
+Here we demonstrate
+1. Using the NativeObject messages to transmit numpy audio blocks along with their sample-accurate timestamps
+2. Capturing blocks on a separate thread into a preallocated ring buffer
+3. The spawning of multiple processes specifying different functionality for listeners and publishers
+Run:
+    # On machine 1 (or process 1): The audio stream publishing from the default microphone (requires sounddevice)
+    python3 interface.py --aud_source 0 --aud_rate 16000 --aud_channels 1 --aud_chunk 512
+    # On machine 1 (or process 1): The audio stream publishing from a WAV file or a 440 Hz sine wave
+    python3 interface.py --aud_source recording.wav
+    python3 interface.py --aud_source sine:440
+    # Replaying a long multi-channel WAV recording as fast as possible. WAV files are memory-mapped rather than loaded,
+    # and the native int16 samples are published without conversion
+    python3 interface.py --aud_source recording.wav --disable_realtime --raw_pcm --should_wait
+    # Publishing speech segments only, with a keep-alive message (without audio) every second of silence
+    python3 interface.py --aud_source 0 --aud_rate 16000 --vad --vad_keepalive_secs 1
+    # Publishing a 48 kHz stereo device along with 16 kHz mono and 8 kHz mono versions resampled once at the publisher.
+    # Ports must not start with the name of another port, since some middleware (e.g., zeromq) match topic prefixes
+    python3 interface.py --aud_source 0 --aud_rate 48000 --aud_channels 2 \
+        --aud_outputs /audio_reader_16k/audio_feed:16000:1 /audio_reader_8k/audio_feed:8000:1
+    # Listening to the 16 kHz mono version
+    python3 interface.py --aud_feed_port /audio_reader_16k/audio_feed
+    # Publishing 64-band log-mel frames (25 ms windows every 10 ms) computed at the publisher on a derived port
+    # (/audio_reader_mel/audio_feed) along with the audio
+    python3 interface.py --aud_source 0 --aud_rate 16000 --mel
+    # Listening to the log-mel frames
+    python3 interface.py --mel
+    # Publishing a single channel beamformed towards the direction (yaw and pitch in degrees) received on a port
+    # (e.g., from gaze or face tracking) for a 4-microphone linear array. Microphone positions are in metres
+    # (x forward, y left, z up) and ordered as the captured channels
+    python3 interface.py --aud_source 0 --aud_rate 16000 --aud_channels 4 --beam \
+        --beam_mic_positions 0,0.06,0 0,0.02,0 0,-0.02,0 0,-0.06,0 --beam_direction_port /audio_reader_beam/direction
+    # Listening to the beamformed channel
+    python3 interface.py --aud_feed_port /audio_reader_beam/audio_feed
+    # Listening through an adaptive jitter buffer concealing lost blocks (e.g., over Wi-Fi or UDP carriers)
+    python3 interface.py --jitter_buffer --jitter_min_delay 0.03 --jitter_max_delay 0.3
+    # On machine 2 ... N (or process 2 ... N): The audio stream listening and playback (requires sounddevice)
+    python3 interface.py
+"""
+
+
+WAV_FORMAT_PCM = 0x0001
+WAV_FORMAT_IEEE_FLOAT = 0x0003
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+WAV_DTYPES = {(WAV_FORMAT_PCM, 8): np.dtype("u1"),
+              (WAV_FORMAT_PCM, 16): np.dtype("<i2"),
+              (WAV_FORMAT_PCM, 32): np.dtype("<i4"),
+              (WAV_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+              (WAV_FORMAT_IEEE_FLOAT, 64): np.dtype("<f8")}
+
+
+def pcm_to_float(aud):
+    """
+    Converts native PCM samples (e.g., int16 blocks published with raw_pcm) to float32 samples in [-1, 1].
+    :param aud: np.ndarray: PCM block
+    :return: np.ndarray: float32 block. float32 blocks are returned as is
+    """
+    if aud.dtype.kind == "u":
+        half_range = 2 ** (aud.dtype.itemsize * 8 - 1)
+        return (aud.astype(np.float32) - half_range) / half_range
+    elif aud.dtype.kind == "i":
+        return aud.astype(np.float32) / 2 ** (aud.dtype.itemsize * 8 - 1)
+    return aud.astype(np.float32, copy=False)
+
+
+def parse_wav_header(path):
+    """
+    Parses the RIFF chunks of a WAV file to locate the format description and the PCM data section.
+    :param path: str: Path to the WAV file
+    :return: dict: Format tag, channels, rate, bits per sample, the numpy dtype of the samples (None if the format is
+                   not supported for memory-mapping), and the data section offset and size in bytes
+    """
+    file_size = os.path.getsize(path)
+    header = {}
+    with open(path, "rb") as wav_file:
+        riff, _, wave_id = struct.unpack("<4sI4s", wav_file.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{path} is not a RIFF WAVE file")
+        while True:
+            chunk_header = wav_file.read(8)
+            if len(chunk_header) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = wav_file.read(chunk_size)
+                format_tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+                if format_tag == WAV_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    # the sub-format GUID starts with the actual format tag
+                    format_tag, = struct.unpack("<H", fmt[24:26])
+                header.update(format_tag=format_tag, channels=channels, rate=rate, bits=bits,
+                              dtype=WAV_DTYPES.get((format_tag, bits), None))
+                wav_file.seek(chunk_size % 2, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                data_offset = wav_file.tell()
+                # streamed recordings may leave the data size unset
+                header.update(data_offset=data_offset, data_size=min(chunk_size, file_size - data_offset))
+                break
+            else:
+                wav_file.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+    if "format_tag" not in header or "data_offset" not in header:
+        raise ValueError(f"{path} is missing the fmt or data chunks")
+    return header
+
+
+class _AudioSource(object):
+    """
+    Base audio source filling fixed-size float32 blocks of shape (chunk, channels) with samples in [-1, 1].
+    File and synthetic sources are paced to deliver each block once its last sample is due in real-time.
+    """
+
+    LIVE = False
+
+    def __init__(self, rate, channels, chunk, realtime=True):
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.realtime = realtime
+        self.sample_index = 0
+        self.start_time = None
+
+    def start(self):
+        self.start_time = time.time()
+
+    def seek(self, sample_index):
+        """
+        Moves the source to the given sample index.
+        :param sample_index: int: Index of the frame to read next
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support seeking")
+
+    def read_into(self, out):
+        """
+        Reads the next block into the output buffer.
+        :param out: np.ndarray: Output buffer of shape (chunk, channels)
+        :return: int: Number of frames read. The remaining frames are zero-filled. 0 when the source is exhausted
+        """
+        raise NotImplementedError
+
+    def pace(self):
+        if self.realtime:
+            delay = self.start_time + (self.sample_index + self.chunk) / self.rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+    def close(self):
+        pass
+
+
+class _SineSource(_AudioSource):
+    def __init__(self, rate, channels, chunk, freq=440.0, amplitude=0.5, realtime=True):
+        _AudioSource.__init__(self, rate, channels, chunk, realtime=realtime)
+        self.freq = freq
+        self.amplitude = amplitude
+        self.phase_step = 2 * np.pi * freq / rate
+        self.phases = np.arange(chunk, dtype=np.float64) * self.phase_step
+        self.block = np.empty(chunk, dtype=np.float64)
+
+    def read_into(self, out):
+        self.pace()
+        np.add(self.phases, (self.sample_index * self.phase_step) % (2 * np.pi), out=self.block)
+        np.sin(self.block, out=self.block)
+        self.block *= self.amplitude
+        out[:] = self.block[:, None]
+        return self.chunk
+
+
+class _WavSource(_AudioSource):
+    SCALES = {1: 1.0 / 128, 2: 1.0 / 2 ** 15, 3: 1.0 / 2 ** 23, 4: 1.0 / 2 ** 31}
+
+    def __init__(self, path, chunk, realtime=True, loop=False):
+        self.wav = wave.open(path, "rb")
+        _AudioSource.__init__(self, self.wav.getframerate(), self.wav.getnchannels(), chunk, realtime=realtime)
+        self.sample_width = self.wav.getsampwidth()
+        self.loop = loop
+
+    def seek(self, sample_index):
+        sample_index = min(max(0, sample_index), self.wav.getnframes())
+        self.wav.setpos(sample_index)
+        self.sample_index = sample_index
+        self.start_time = time.time() - self.sample_index / self.rate
+
+    def _decode(self, buffer):
+        if self.sample_width == 1:
+            data = np.frombuffer(buffer, dtype=np.uint8).astype(np.float32) - 128
+        elif self.sample_width == 3:
+            raw = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, 3)
+            data = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) |
+                    (raw[:, 2].astype(np.int8).astype(np.int32) << 16))
+        else:
+            data = np.frombuffer(buffer, dtype="<i2" if self.sample_width == 2 else "<i4")
+        return data.reshape(-1, self.channels)
+
+    def read_into(self, out):
+        self.pace()
+        buffer = self.wav.readframes(self.chunk)
+        if not buffer and self.loop and self.wav.getnframes():
+            self.wav.rewind()
+            buffer = self.wav.readframes(self.chunk)
+        data = self._decode(buffer)
+        frames = len(data)
+        np.multiply(data, self.SCALES[self.sample_width], out=out[:frames], casting="unsafe")
+        out[frames:] = 0
+        return frames
+
+    def close(self):
+        self.wav.close()
+
+
+class _MemmapWavSource(_AudioSource):
+    """
+    WAV file source memory-mapping the PCM data section instead of reading it into memory. Blocks are views into the
+    memory-mapped file, allowing seeking by sample index in O(1) and publishing the native PCM samples without copies.
+    """
+
+    def __init__(self, path, chunk, realtime=True, loop=False):
+        header = parse_wav_header(path)
+        if header["dtype"] is None:
+            raise ValueError(f"unsupported WAV format for memory-mapping: {header}")
+        _AudioSource.__init__(self, header["rate"], header["channels"], chunk, realtime=realtime)
+        self.dtype = header["dtype"]
+        self.loop = loop
+        num_frames = header["data_size"] // (self.dtype.itemsize * self.channels)
+        self.data = np.memmap(path, dtype=self.dtype, mode="r", offset=header["data_offset"],
+                              shape=(num_frames, self.channels)) if num_frames else \
+            np.zeros((0, self.channels), dtype=self.dtype)
+        if self.dtype.kind == "u":
+            self.offset, self.scale = 2 ** (self.dtype.itemsize * 8 - 1), 1.0 / 2 ** (self.dtype.itemsize * 8 - 1)
+        elif self.dtype.kind == "i":
+            self.offset, self.scale = 0, 1.0 / 2 ** (self.dtype.itemsize * 8 - 1)
+        else:
+            self.offset, self.scale = 0, 1.0
+
+    def seek(self, sample_index):
+        self.sample_index = min(max(0, sample_index), len(self.data))
+        self.start_time = time.time() - self.sample_index / self.rate
+
+    def read_view(self):
+        """
+        Reads the next block as a view into the memory-mapped file.
+        :return: np.ndarray: Native PCM block of shape (frames, channels) with up to chunk frames. Empty when exhausted
+        """
+        self.pace()
+        position = self.sample_index % len(self.data) if self.loop and len(self.data) else self.sample_index
+        return self.data[position:position + self.chunk]
+
+    def read_into(self, out):
+        view = self.read_view()
+        frames = len(view)
+        if self.offset:
+            # subtract in the output precision, since unsigned PCM would wrap around in its native dtype
+            np.subtract(view, self.offset, out=out[:frames], dtype=out.dtype, casting="unsafe")
+            out[:frames] *= self.scale
+        else:
+            np.multiply(view, self.scale, out=out[:frames], casting="unsafe")
+        out[frames:] = 0
+        return frames
+
+
+class _DeviceSource(_AudioSource):
+    LIVE = True
+
+    def __init__(self, device, rate, channels, chunk):
+        _AudioSource.__init__(self, rate, channels, chunk, realtime=False)
+        self.stream = sd.InputStream(device=device, samplerate=rate, channels=channels, blocksize=chunk,
+                                     dtype="float32")
+
+    def start(self):
+        self.stream.start()
+        _AudioSource.start(self)
+
+    def read_into(self, out):
+        data, overflowed = self.stream.read(self.chunk)
+        if overflowed:
+            logging.warning("audio input overflow")
+        out[:] = data
+        return self.chunk
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+def parse_output_spec(spec):
+    """
+    Parses an audio output specification.
+    :param spec: str: Output specification formatted as "<port>:<rate>:<channels>"
+    :return: tuple: Port, sampling rate, and number of channels of the output
+    """
+    aud_feed_port, aud_rate, aud_channels = spec.rsplit(":", 2)
+    return aud_feed_port, int(aud_rate), int(aud_channels)
+
+
+class AudioOutput(MiddlewareCommunicator):
+    """
+    Publishes the audio stream of an AudioCapture in a different format (sampling rate and channels) on a separate
+    port. The blocks are converted by a streaming polyphase resampler which keeps its filter state across blocks.
+    The output blocks retain the sequence numbers of the captured blocks, but their number of frames varies when the
+    rates are not divisible. The timestamps account for the resampling filter delay.
+    """
+
+    MWARE = AUDIO_DEFAULT_COMMUNICATOR
+    AUD_FEED_PORT = "/audio_reader_resampled/audio_feed"
+    AUD_FEED_CARRIER = ""
+    SHOULD_WAIT = False
+
+    def __init__(self, aud_feed_port, aud_rate, aud_channels, in_rate, in_channels, max_chunk,
+                 aud_feed_carrier=AUD_FEED_CARRIER, should_wait=SHOULD_WAIT, taps_per_phase=32, mware=MWARE):
+        """
+        :param aud_feed_port: str: The port to publish the converted audio stream to
+        :param aud_rate: int: Sampling rate of the converted audio stream
+        :param aud_channels: int: Number of channels of the converted audio stream
+        :param in_rate: int: Sampling rate of the captured audio stream
+        :param in_channels: int: Number of channels of the captured audio stream
+        :param max_chunk: int: Maximum number of frames per captured block
+        :param aud_feed_carrier: str: The mware-specific carrier to publish the audio stream to (tcp, udp, mcast, ...)
+        :param should_wait: bool: Whether to wait for a subscriber before publishing the audio stream
+        :param taps_per_phase: int: Number of resampling filter taps per polyphase branch
+        :param mware: str: Middleware to use for publishing the audio stream
+        """
+        MiddlewareCommunicator.__init__(self)
+        self.MWARE = mware
+        self.AUD_FEED_PORT = aud_feed_port
+        self.AUD_FEED_CARRIER = aud_feed_carrier
+        self.SHOULD_WAIT = should_wait
+
+        self.aud_rate = aud_rate
+        self.aud_channels = aud_channels
+        self.in_rate = in_rate
+        self.resampler = PolyphaseResampler(in_rate, aud_rate, in_channels, aud_channels, max_chunk=max_chunk,
+                                            taps_per_phase=taps_per_phase)
+        self.activate_communication(self.acquire_audio, "publish")
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "AudioOutput", "$aud_feed_port",
+                                     carrier="$aud_feed_carrier", should_wait="$_should_wait")
+    def acquire_audio(self, aud_feed_port=AUD_FEED_PORT, aud_feed_carrier=AUD_FEED_CARRIER,
+                      _should_wait=SHOULD_WAIT, _mware=MWARE, **kwargs):
+        """
+        Publishes a converted audio block to the specified port.
+        :param aud_feed_port: str: The port to publish the converted audio stream to
+        :param aud_feed_carrier: str: The mware-specific carrier to publish the audio stream to (tcp, udp, mcast, ...)
+        :param _should_wait: bool: Whether to wait for a subscriber before publishing the audio stream
+        :param _mware: str: Middleware to use for publishing the audio stream
+        :return: dict: Audio message with the converted block (aud), following the captured audio message format
+        """
+        aud, info = kwargs.get("_aud", None), kwargs.get("_info", None)
+        return dict(info, topic=aud_feed_port.split("/")[-1], aud=aud if info["speech"] is not False else None),
+
+    def transmit_audio(self, aud, info, publish=True):
+        """
+        Converts a captured audio block and publishes it. Blocks must be converted even when they are not published
+        (e.g., silent blocks) to retain the resampling filter state.
+        :param aud: np.ndarray: The captured float32 block of shape (chunk, channels)
+        :param info: dict: The captured audio message without the block
+        :param publish: bool: Whether to publish the converted block
+        """
+        sample_index = self.resampler.output_index
+        aud = self.resampler.process(aud)
+        if publish:
+            self.acquire_audio(aud_feed_port=self.AUD_FEED_PORT, aud_feed_carrier=self.AUD_FEED_CARRIER,
+                               _should_wait=self.SHOULD_WAIT, _mware=self.MWARE, _aud=aud,
+                               _info=dict(info, timestamp=info["timestamp"] + self.resampler.last_offset / self.in_rate,
+                                          sample_index=sample_index, rate=self.aud_rate, channels=self.aud_channels,
+                                          chunk=len(aud)))
+
+
+def parse_mic_positions(specs):
+    """
+    Parses microphone positions.
+    :param specs: list: Microphone positions formatted as "<x>,<y>,<z>" strings (in metres) or sequences
+    :return: np.ndarray: Microphone positions of shape (microphones, 3)
+    """
+    return np.array([[float(coord) for coord in spec.split(",")] if isinstance(spec, str) else spec
+                     for spec in specs], dtype=np.float64)
+
+
+class BeamformerOutput(MiddlewareCommunicator):
+    """
+    Publishes a single channel of the multi-channel audio stream of an AudioCapture (microphone array) enhanced towards
+    a steering direction by delay-and-sum beamforming on a separate port. The steering direction is received as
+    yaw and pitch angles (in degrees) e.g., from gaze or face tracking, following the orientation message format.
+    The output blocks retain the sequence numbers of the captured blocks, but their number of frames varies. The
+    timestamps account for the beamformer frame delay.
+    """
+
+    MWARE = AUDIO_DEFAULT_COMMUNICATOR
+    AUD_FEED_PORT = "/audio_reader_beam/audio_feed"
+    AUD_FEED_CARRIER = ""
+    DIRECTION_PORT = "/audio_reader_beam/direction"
+    SHOULD_WAIT = False
+
+    def __init__(self, aud_feed_port, aud_rate, mic_positions, max_chunk, aud_feed_carrier=AUD_FEED_CARRIER,
+                 direction_port=DIRECTION_PORT, should_wait=SHOULD_WAIT, n_fft=512, yaw=0.0, pitch=0.0,
+                 mware=MWARE):
+        """
+        :param aud_feed_port: str: The port to publish the beamformed audio stream to
+        :param aud_rate: int: Sampling rate of the captured audio stream
+        :param mic_positions: np.ndarray: Microphone positions (in metres) of shape (channels, 3) ordered as the
+                                          captured channels (x forward, y left, z up)
+        :param max_chunk: int: Maximum number of frames per captured block
+        :param aud_feed_carrier: str: The mware-specific carrier to publish the audio stream to (tcp, udp, mcast, ...)
+        :param direction_port: str: The port to receive the steering direction from
+        :param should_wait: bool: Whether to wait for a subscriber before publishing the audio stream
+        :param n_fft: int: Number of samples per beamformer analysis frame
+        :param yaw: float: Initial steering yaw angle in degrees (positive to the left)
+        :param pitch: float: Initial steering pitch angle in degrees (positive upwards)
+        :param mware: str: Middleware to use for publishing the audio stream and receiving the steering direction
+        """
+        MiddlewareCommunicator.__init__(self)
+        self.MWARE = mware
+        self.AUD_FEED_PORT = aud_feed_port
+        self.AUD_FEED_CARRIER = aud_feed_carrier
+        self.DIRECTION_PORT = direction_port
+        self.SHOULD_WAIT = should_wait
+
+        self.aud_rate = aud_rate
+        self.beamformer = DelayAndSumBeamformer(aud_rate, mic_positions, max_chunk=max_chunk, n_fft=n_fft)
+        self.beamformer.steer(yaw, pitch)
+        self.activate_communication(self.acquire_audio, "publish")
+        if direction_port:
+            self.activate_communication(self.receive_direction, "listen")
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "BeamformerOutput", "$aud_feed_port",
+                                     carrier="$aud_feed_carrier", should_wait="$_should_wait")
+    def acquire_audio(self, aud_feed_port=AUD_FEED_PORT, aud_feed_carrier=AUD_FEED_CARRIER,
+                      _should_wait=SHOULD_WAIT, _mware=MWARE, **kwargs):
+        """
+        Publishes a beamformed audio block to the specified port.
+        :param aud_feed_port: str: The port to publish the beamformed audio stream to
+        :param aud_feed_carrier: str: The mware-specific carrier to publish the audio stream to (tcp, udp, mcast, ...)
+        :param _should_wait: bool: Whether to wait for a subscriber before publishing the audio stream
+        :param _mware: str: Middleware to use for publishing the audio stream
+        :return: dict: Audio message with the beamformed block (aud) and the steering direction (yaw, pitch),
+                       following the captured audio message format
+        """
+        aud, info = kwargs.get("_aud", None), kwargs.get("_info", None)
+        return dict(info, topic=aud_feed_port.split("/")[-1], aud=aud if info["speech"] is not False else None),
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "BeamformerOutput", "$direction_port",
+                                     carrier="", should_wait=False)
+    def receive_direction(self, direction_port=DIRECTION_PORT, _mware=MWARE, **kwargs):
+        """
+        Receives the steering direction.
+        :param direction_port: str: The port to receive the steering direction from
+        :param _mware: str: Middleware to use for receiving the steering direction
+        :return: dict: Direction message with the yaw and pitch angles in degrees
+        """
+        return None,
+
+    def update_direction(self):
+        """
+        Steers the beamformer towards the most recently received direction.
+        """
+        if not self.DIRECTION_PORT:
+            return
+        direction = None
+        while True:
+            direction_msg, = self.receive_direction(direction_port=self.DIRECTION_PORT, _mware=self.MWARE)
+            if direction_msg is None:
+                break
+            if direction_msg.get("yaw", None) is not None:
+                direction = direction_msg
+        if direction is not None:
+            yaw, pitch = float(direction["yaw"]), float(direction.get("pitch", None) or 0.0)
+            if (yaw, pitch) != (self.beamformer.yaw, self.beamformer.pitch):
+                self.beamformer.steer(yaw, pitch)
+
+    def transmit_audio(self, aud, info, publish=True):
+        """
+        Beamforms a captured audio block and publishes it. Blocks must be processed even when they are not published
+        (e.g., silent blocks) to retain the overlapping samples.
+        :param aud: np.ndarray: The captured float32 block of shape (chunk, channels)
+        :param info: dict: The captured audio message without the block
+        :param publish: bool: Whether to publish the beamformed block
+        """
+        self.update_direction()
+        sample_index = self.beamformer.output_index
+        aud = self.beamformer.process(aud)
+        if publish and (len(aud) or info["speech"] is False):
+            self.acquire_audio(aud_feed_port=self.AUD_FEED_PORT, aud_feed_carrier=self.AUD_FEED_CARRIER,
+                               _should_wait=self.SHOULD_WAIT, _mware=self.MWARE, _aud=aud,
+                               _info=dict(info, timestamp=info["timestamp"] + self.beamformer.last_offset / self.aud_rate,
+                                          sample_index=sample_index, channels=1, chunk=len(aud),
+                                          yaw=self.beamformer.yaw, pitch=self.beamformer.pitch))
+
+
+def derive_port(port, suffix):
+    """
+    Derives a port name by appending a suffix to the first segment of the port, such that the derived port does not
+    start with the original port name (some middleware e.g., zeromq match topic prefixes).
+    :param port: str: The original port e.g., /audio_reader/audio_feed
+    :param suffix: str: The suffix e.g., mel
+    :return: str: The derived port e.g., /audio_reader_mel/audio_feed
+    """
+    segments = port.strip("/").split("/")
+    segments[0] = f"{segments[0]}_{suffix}"
+    return "/" + "/".join(segments)
+
+
+class LogMelOutput(MiddlewareCommunicator):
+    """
+    Publishes log-mel spectrogram frames of the audio stream of an AudioCapture on a separate port. The frames are
+    extracted incrementally as blocks arrive and published as float16 arrays of shape (frames, n_mels), which are
+    considerably smaller than the PCM blocks they are computed from.
+    """
+
+    MWARE = AUDIO_DEFAULT_COMMUNICATOR
+    MEL_FEED_PORT = "/audio_reader_mel/audio_feed"
+    MEL_FEED_CARRIER = ""
+    SHOULD_WAIT = False
+
+    def __init__(self, mel_feed_port, aud_rate, max_chunk, mel_feed_carrier=MEL_FEED_CARRIER, should_wait=SHOULD_WAIT,
+                 window_secs=0.025, hop_secs=0.01, n_mels=64, fmin=0.0, fmax=None, mware=MWARE):
+        """
+        :param mel_feed_port: str: The port to publish the log-mel frames to
+        :param aud_rate: int: Sampling rate of the captured audio stream
+        :param max_chunk: int: Maximum number of frames per captured block
+        :param mel_feed_carrier: str: The mware-specific carrier to publish the log-mel frames to (tcp, udp, mcast, ...)
+        :param should_wait: bool: Whether to wait for a subscriber before publishing the log-mel frames
+        :param window_secs: float: Duration (in seconds) of the analysis window
+        :param hop_secs: float: Duration (in seconds) between consecutive frames
+        :param n_mels: int: Number of mel bands
+        :param fmin: float: Lowest frequency (in Hz) of the mel filters
+        :param fmax: float: Highest frequency (in Hz) of the mel filters. Defaults to the Nyquist frequency
+        :param mware: str: Middleware to use for publishing the log-mel frames
+        """
+        MiddlewareCommunicator.__init__(self)
+        self.MWARE = mware
+        self.MEL_FEED_PORT = mel_feed_port
+        self.MEL_FEED_CARRIER = mel_feed_carrier
+        self.SHOULD_WAIT = should_wait
+
+        self.aud_rate = aud_rate
+        self.extractor = LogMelExtractor(aud_rate, max_chunk=max_chunk, window_secs=window_secs, hop_secs=hop_secs,
+                                         n_mels=n_mels, fmin=fmin, fmax=fmax)
+        self.activate_communication(self.acquire_mel, "publish")
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "LogMelOutput", "$mel_feed_port",
+                                     carrier="$mel_feed_carrier", should_wait="$_should_wait")
+    def acquire_mel(self, mel_feed_port=MEL_FEED_PORT, mel_feed_carrier=MEL_FEED_CARRIER,
+                    _should_wait=SHOULD_WAIT, _mware=MWARE, **kwargs):
+        """
+        Publishes log-mel frames to the specified port.
+        :param mel_feed_port: str: The port to publish the log-mel frames to
+        :param mel_feed_carrier: str: The mware-specific carrier to publish the log-mel frames to (tcp, udp, mcast, ...)
+        :param _should_wait: bool: Whether to wait for a subscriber before publishing the log-mel frames
+        :param _mware: str: Middleware to use for publishing the log-mel frames
+        :return: dict: Log-mel message with the float16 frames (mel) of shape (frames, n_mels), the capture timestamp
+                       of the first frame start, the index of the first frame (frame_index), and the sequence number of
+                       the audio block completing the frames (seq)
+        """
+        mel, info = kwargs.get("_mel", None), kwargs.get("_info", None)
+        return dict(info, topic=mel_feed_port.split("/")[-1], mel=mel if info["speech"] is not False else None),
+
+    def transmit_mel(self, aud, info, publish=True):
+        """
+        Extracts the log-mel frames completed by a captured audio block and publishes them. Blocks must be processed
+        even when they are not published (e.g., silent blocks) to retain the overlapping samples.
+        :param aud: np.ndarray: The captured float32 block of shape (chunk, channels)
+        :param info: dict: The captured audio message without the block
+        :param publish: bool: Whether to publish the log-mel frames
+        """
+        frame_index = self.extractor.frame_index
+        mel = self.extractor.process(aud)
+        if publish and (len(mel) or info["speech"] is False):
+            self.acquire_mel(mel_feed_port=self.MEL_FEED_PORT, mel_feed_carrier=self.MEL_FEED_CARRIER,
+                             _should_wait=self.SHOULD_WAIT, _mware=self.MWARE, _mel=mel,
+                             _info={"timestamp": info["timestamp"] + self.extractor.last_offset / self.aud_rate,
+                                    "seq": info["seq"],
+                                    "frame_index": frame_index,
+                                    "frame_rate": self.aud_rate / self.extractor.hop,
+                                    "window_secs": self.extractor.n_fft / self.aud_rate,
+                                    "n_mels": self.extractor.n_mels,
+                                    "speech": info["speech"]})
+
+
+class LogMelReceiver(LogMelOutput):
+    MWARE = AUDIO_DEFAULT_COMMUNICATOR
+    MEL_FEED_PORT = "/audio_reader_mel/audio_feed"
+    MEL_FEED_CARRIER = ""
+    SHOULD_WAIT = False
+
+    def __init__(self, mel_feed_port=MEL_FEED_PORT, mel_feed_carrier=MEL_FEED_CARRIER, should_wait=SHOULD_WAIT,
+                 mware=MWARE, **kwargs):
+        """
+        Receives log-mel frames from the specified port.
+        :param mel_feed_port: str: The port to receive the log-mel frames from
+        :param mel_feed_carrier: str: The mware-specific carrier to receive the log-mel frames from (tcp, udp, mcast, ...)
+        :param should_wait: bool: Whether to wait for a publisher before receiving the log-mel frames
+        :param mware: str: Middleware to use for receiving the log-mel frames
+        """
+        MiddlewareCommunicator.__init__(self)
+        self.MWARE = mware
+        self.MEL_FEED_PORT = mel_feed_port
+        self.MEL_FEED_CARRIER = mel_feed_carrier
+        self.SHOULD_WAIT = should_wait
+        self.last_info = None
+
+        if mel_feed_port:
+            self.activate_communication(self.acquire_mel, "listen")
+
+    def read(self):
+        """
+        Receives the next log-mel frames.
+        :return: tuple: Whether frames were received and the float16 frames of shape (frames, n_mels)
+        """
+        mel_msg, = self.acquire_mel(mel_feed_port=self.MEL_FEED_PORT, mel_feed_carrier=self.MEL_FEED_CARRIER,
+                                    _should_wait=self.SHOULD_WAIT, _mware=self.MWARE)
+        if mel_msg is None or mel_msg["topic"] != self.MEL_FEED_PORT.split("/")[-1]:
+            return False, None
+        self.last_info = {key: value for key, value in mel_msg.items() if key != "mel"}
+        if mel_msg["mel"] is None:
+            # keep-alive message published during silence
+            return False, None
+        return True, np.asarray(mel_msg["mel"])
+
+    def getPeriod(self):
+        return 0.01
+
+    def updateModule(self):
+        received, mel = self.read()
+        if received:
+            logging.info(f"received {len(mel)} log-mel frames starting at frame {self.last_info['frame_index']}")
+        else:
+            time.sleep(self.getPeriod())
+        return True
+
+    def runModule(self):
+        while True:
+            self.updateModule()
+
+
+class AudioCapture(MiddlewareCommunicator):
+    """
+    Audio capturer reading fixed-size PCM blocks from a device, a WAV file, or a synthetic sine generator.
+    To invoke Wrapyfi functionality (publishing to a port), set the aud_feed_port and trigger the runModule()
+    (automatically invoked in standalone mode), or call the acquire_audio() method with all necessary arguments.
+    With multithreading, blocks are captured on a separate thread into a preallocated ring buffer. The block returned
+    by read() is a view into the ring buffer which remains valid until the following read() call.
+    Each block is timestamped with the capture time of its first sample, derived from the sample index and rate.
+    """
+
+    MWARE = AUDIO_DEFAULT_COMMUNICATOR
+    AUD_RATE = 44100
+    AUD_CHANNELS = 1
+    AUD_CHUNK = 1024
+    AUD_FEED_PORT = "/audio_reader/audio_feed"
+    AUD_FEED_CARRIER = ""
+    SHOULD_WAIT = False
+
+    def __init__(self, aud_source=False, aud_feed_port=AUD_FEED_PORT, aud_feed_carrier=AUD_FEED_CARRIER,
+                 headless=False, should_wait=False, multithreading=True, ring_size=16,
+                 aud_rate=AUD_RATE, aud_channels=AUD_CHANNELS, aud_chunk=AUD_CHUNK,
+                 realtime=True, loop=False, raw_pcm=False, vad=False, vad_start_threshold_db=9.0,
+                 vad_stop_threshold_db=4.0, vad_hangover_secs=0.3, vad_keepalive_secs=1.0, aud_outputs=(),
+                 mel=False, mel_feed_port="", mel_window_secs=0.025, mel_hop_secs=0.01, mel_bands=64,
+                 beam=False, beam_feed_port="", beam_mic_positions=None, beam_direction_port="", beam_n_fft=512,
+                 beam_yaw=0.0, beam_pitch=0.0, mware=MWARE, **kwargs):
+        """
+        :param aud_source: str: The source of the audio stream. Can be a device index, a WAV file path, or a synthetic
+                                sine wave ("sine" or "sine:<frequency>")
+        :param aud_feed_port: str: The port to publish the audio stream to
+        :param aud_feed_carrier: str: The mware-specific carrier to publish the audio stream to (tcp, udp, mcast, ...)
+        :param headless: bool: Whether to NOT play the audio stream
+        :param should_wait: bool: Whether to wait for a subscriber before publishing the audio stream
+        :param multithreading: bool: Whether to capture the audio stream on a separate thread
+        :param ring_size: int: Number of blocks in the ring buffer used for multithreading
+        :param aud_rate: int: Sampling rate of the audio stream (overridden by the WAV file rate)
+        :param aud_channels: int: Number of channels of the audio stream (overridden by the WAV file channels)
+        :param aud_chunk: int: Number of frames (samples per channel) per published block
+        :param realtime: bool: Whether to pace WAV file and synthetic sources to real-time
+        :param loop: bool: Whether to loop WAV files
+        :param raw_pcm: bool: Whether to publish the native PCM samples (e.g., int16) of WAV files as views into the
+                              memory-mapped file instead of float32 copies. Disables multithreading
+        :param vad: bool: Whether to publish speech blocks only, detected by voice activity detection. Silent blocks
+                          are replaced by sparse keep-alive messages without audio
+        :param vad_start_threshold_db: float: Energy (in dB) above the noise floor needed to start speech
+        :param vad_stop_threshold_db: float: Energy (in dB) above the noise floor needed to sustain speech
+        :param vad_hangover_secs: float: Duration (in seconds) speech remains active after the last speech frame
+        :param vad_keepalive_secs: float: Interval (in seconds) between keep-alive messages during silence
+        :param aud_outputs: list: Additional output formats, each published to its own port after resampling and
+                                  mixing the channels. Formatted as "<port>:<rate>:<channels>" strings or tuples
+        :param mel: bool: Whether to publish log-mel spectrogram frames of the audio stream
+        :param mel_feed_port: str: The port to publish the log-mel frames to. Derived from the aud_feed_port by default
+                                   e.g., /audio_reader_mel/audio_feed
+        :param mel_window_secs: float: Duration (in seconds) of the log-mel analysis window
+        :param mel_hop_secs: float: Duration (in seconds) between consecutive log-mel frames
+        :param mel_bands: int: Number of mel bands
+        :param beam: bool: Whether to publish a single channel beamformed (delay-and-sum) from the microphone array
+        :param beam_feed_port: str: The port to publish the beamformed channel to. Derived from the aud_feed_port by
+                                    default e.g., /audio_reader_beam/audio_feed
+        :param beam_mic_positions: list: Microphone positions (in metres) ordered as the captured channels, formatted
+                                         as "<x>,<y>,<z>" strings or sequences (x forward, y left, z up)
+        :param beam_direction_port: str: The port to receive the steering direction (yaw and pitch in degrees) from
+        :param beam_n_fft: int: Number of samples per beamformer analysis frame
+        :param beam_yaw: float: Initial steering yaw angle in degrees (positive to the left)
+        :param beam_pitch: float: Initial steering pitch angle in degrees (positive upwards)
+        :param mware: str: Middleware to use for publishing the audio stream
+        """
+        MiddlewareCommunicator.__init__(self)
+
+        self.MWARE = mware
+        self.AUD_FEED_PORT = aud_feed_port
+        self.AUD_FEED_CARRIER = aud_feed_carrier
+        self.SHOULD_WAIT = should_wait
+
+        if raw_pcm and multithreading:
+            logging.info("publishing raw PCM views of the memory-mapped file. Disabling multithreading")
+            multithreading = False
+
+        self.headless = headless
+        self.multithreading = multithreading
+        self.raw_pcm = raw_pcm
+        self.aud_source = aud_source
+        self.aud_rate = aud_rate
+        self.aud_channels = aud_channels
+        self.aud_chunk = aud_chunk
+
+        self.last_timestamp = None
+        self.last_seq = -1
+        self.last_sample_index = 0
+        self.last_info = None
+        self.player = None
+        self.overruns = 0
+        self.seek_request = None
+        self.vad = None
+        self.outputs = []
+        self.vad_keepalive_secs = vad_keepalive_secs
+        self.last_publish_timestamp = None
+
+        self.source = None
+        self.opened = False
+        if aud_source:
+            self.source = self._open_source(str_or_int(aud_source), realtime=realtime, loop=loop)
+            if raw_pcm and not isinstance(self.source, _MemmapWavSource):
+                raise ValueError(f"raw PCM publishing requires a memory-mapped WAV file source, got {aud_source}")
+            self.aud_rate = self.source.rate
+            self.aud_channels = self.source.channels
+            self.opened = True
+            if vad:
+                self.vad = VoiceActivityDetector(self.aud_rate, start_threshold_db=vad_start_threshold_db,
+                                                 stop_threshold_db=vad_stop_threshold_db,
+                                                 hangover_secs=vad_hangover_secs)
+            if mel:
+                self.outputs.append(LogMelOutput(mel_feed_port or derive_port(aud_feed_port or self.AUD_FEED_PORT, "mel"),
+                                                 self.aud_rate, self.aud_chunk, mel_feed_carrier=aud_feed_carrier,
+                                                 should_wait=should_wait, window_secs=mel_window_secs,
+                                                 hop_secs=mel_hop_secs, n_mels=mel_bands, mware=mware))
+            if beam:
+                mic_positions = parse_mic_positions(beam_mic_positions or ())
+                if len(mic_positions) != self.aud_channels:
+                    raise ValueError(f"{len(mic_positions)} microphone positions given for {self.aud_channels} "
+                                     f"captured channels")
+                self.outputs.append(BeamformerOutput(beam_feed_port or derive_port(aud_feed_port or self.AUD_FEED_PORT,
+                                                                                   "beam"),
+                                                     self.aud_rate, mic_positions, self.aud_chunk,
+                                                     aud_feed_carrier=aud_feed_carrier,
+                                                     direction_port=beam_direction_port, should_wait=should_wait,
+                                                     n_fft=beam_n_fft, yaw=beam_yaw, pitch=beam_pitch, mware=mware))
+            for aud_output in aud_outputs or ():
+                out_port, out_rate, out_channels = parse_output_spec(aud_output) if isinstance(aud_output, str) \
+                    else aud_output
+                self.outputs.append(AudioOutput(out_port, out_rate, out_channels, self.aud_rate, self.aud_channels,
+                                                self.aud_chunk, aud_feed_carrier=aud_feed_carrier,
+                                                should_wait=should_wait, mware=mware))
+
+        if aud_feed_port:
+            self.activate_communication(self.acquire_audio, "publish")
+
+        if self.source is not None:
+            if multithreading:
+                ring_size = max(ring_size, 3)
+                self.ring = np.zeros((ring_size, self.aud_chunk, self.aud_channels), dtype=np.float32)
+                self.ring_timestamps = np.zeros(ring_size, dtype=np.float64)
+                self.ring_sample_indices = np.zeros(ring_size, dtype=np.int64)
+                self.ring_frames = np.zeros(ring_size, dtype=np.int64)
+                self.overrun_block = np.zeros((self.aud_chunk, self.aud_channels), dtype=np.float32)
+                self.write_seq = 0
+                self.read_seq = 0
+                self.ring_condition = Condition()
+                self.thread = Thread(target=self.update, args=())
+                self.thread.daemon = True
+                self.source.start()
+                self.thread.start()
+            else:
+                self.block = np.zeros((self.aud_chunk, self.aud_channels), dtype=np.float32)
+                self.source.start()
+            self.build()
+
+    def _open_source(self, aud_source, realtime=True, loop=False):
+        if isinstance(aud_source, int):
+            if not HAVE_SOUNDDEVICE:
+                raise ImportError("sounddevice is required for capturing audio from devices: pip install sounddevice")
+            return _DeviceSource(aud_source, self.aud_rate, self.aud_channels, self.aud_chunk)
+        elif aud_source == "sine" or aud_source.startswith("sine:"):
+            freq = float(aud_source.split(":")[1]) if ":" in aud_source else 440.0
+            return _SineSource(self.aud_rate, self.aud_channels, self.aud_chunk, freq=freq, realtime=realtime)
+        else:
+            try:
+                return _MemmapWavSource(aud_source, self.aud_chunk, realtime=realtime, loop=loop)
+            except ValueError as err:
+                if self.raw_pcm:
+                    raise
+                logging.warning(f"cannot memory-map {aud_source} ({err}). Reading the WAV file in blocks instead")
+                return _WavSource(aud_source, self.aud_chunk, realtime=realtime, loop=loop)
+
+    def build(self):
+        """
+        Updates the default method arguments according to constructor arguments. This method is called by the module constructor.
+        It is not necessary to call it manually.
+        """
+        AudioCapture.acquire_audio.__defaults__ = (self.AUD_FEED_PORT, self.AUD_FEED_CARRIER,
+                                                   self.aud_rate, self.aud_channels, self.aud_chunk,
+                                                   self.SHOULD_WAIT, self.MWARE)
+
+    def update(self):
+        ring_size = len(self.ring)
+        # sources which are not paced (files published as fast as possible) wait for the reader instead of dropping
+        blocking = not (self.source.LIVE or self.source.realtime)
+        while self.opened:
+            # the slot holding the most recently read block is never overwritten. The oldest unread block is dropped
+            # instead when the reader falls behind, and the new block when the writer would reach the held slot, which
+            # happens once the reader falls behind by a full ring
+            with self.ring_condition:
+                if blocking:
+                    self.ring_condition.wait_for(lambda: self.write_seq - self.read_seq <= ring_size - 2 or
+                                                 self.seek_request is not None or not self.opened)
+                if self.seek_request is not None:
+                    # blocks captured before seeking are discarded
+                    self.source.seek(self.seek_request)
+                    self.seek_request = None
+                    self.read_seq = self.write_seq
+                held = self.last_seq >= 0 and self.write_seq - self.last_seq >= ring_size
+                if not held and self.write_seq - self.read_seq > ring_size - 2:
+                    self.read_seq += 1
+                    self.overruns += 1
+                    logging.warning("audio ring buffer overrun. Dropping the oldest block")
+            if held:
+                frames = self.source.read_into(self.overrun_block)
+                self.source.sample_index += frames
+                with self.ring_condition:
+                    self.overruns += 1
+                    if not frames:
+                        self.opened = False
+                        self.ring_condition.notify_all()
+                logging.warning("audio ring buffer overrun. Dropping the newest block")
+                continue
+            slot = self.write_seq % ring_size
+            self.ring_sample_indices[slot] = self.source.sample_index
+            self.ring_timestamps[slot] = self.source.start_time + self.source.sample_index / self.aud_rate
+            frames = self.source.read_into(self.ring[slot])
+            self.source.sample_index += frames
+            with self.ring_condition:
+                if self.seek_request is not None:
+                    continue
+                elif frames:
+                    self.ring_frames[slot] = frames
+                    self.write_seq += 1
+                else:
+                    self.opened = False
+                self.ring_condition.notify_all()
+
+    def _read(self, timeout=1.0):
+        if self.multithreading:
+            with self.ring_condition:
+                if not self.ring_condition.wait_for(lambda: self.write_seq > self.read_seq or not self.opened,
+                                                    timeout=timeout) or self.write_seq <= self.read_seq:
+                    return False, None
+                seq = self.read_seq
+                self.read_seq += 1
+                # the writer keeps off the slot of the returned block until the next read
+                self.last_seq = seq
+                self.ring_condition.notify_all()
+            slot = seq % len(self.ring)
+            self.last_timestamp = float(self.ring_timestamps[slot])
+            self.last_sample_index = int(self.ring_sample_indices[slot])
+            return True, self.ring[slot]
+        else:
+            if not self.opened:
+                return False, None
+            sample_index = self.source.sample_index
+            if self.raw_pcm:
+                aud = self.source.read_view()
+                frames = len(aud)
+            else:
+                aud = self.block
+                frames = self.source.read_into(aud)
+            if not frames:
+                self.opened = False
+                return False, None
+            self.source.sample_index += frames
+            self.last_seq += 1
+            self.last_timestamp = self.source.start_time + sample_index / self.aud_rate
+            self.last_sample_index = sample_index
+            return True, aud
+
+    def seek(self, sample_index):
+        """
+        Moves the audio source (WAV files) to the given sample index. Blocks captured before seeking are discarded.
+        Memory-mapped WAV files are seeked in O(1) without reading the preceding samples.
+        :param sample_index: int: Index of the frame to read next
+        """
+        if self.source is None:
+            logging.error("audio capturer not opened")
+            return
+        if self.multithreading:
+            with self.ring_condition:
+                self.seek_request = int(sample_index)
+                self.ring_condition.notify_all()
+        else:
+            self.source.seek(int(sample_index))
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "AudioCapture", "$aud_feed_port",
+                                     carrier="$aud_feed_carrier", should_wait="$_should_wait")
+    def acquire_audio(self, aud_feed_port=AUD_FEED_PORT, aud_feed_carrier=AUD_FEED_CARRIER,
+                      aud_rate=AUD_RATE, aud_channels=AUD_CHANNELS, aud_chunk=AUD_CHUNK,
+                      _should_wait=SHOULD_WAIT, _mware=MWARE, **kwargs):
+        """
+        Acquires an audio block from the audio stream and publishes it to the specified port.
+        :param aud_feed_port: str: The port to publish the audio stream to
+        :param aud_feed_carrier: str: The mware-specific carrier to publish the audio stream to (tcp, udp, mcast, ...)
+        :param aud_rate: int: Sampling rate of the audio stream
+        :param aud_channels: int: Number of channels of the audio stream
+        :param aud_chunk: int: Number of frames per block
+        :param _should_wait: bool: Whether to wait for a subscriber before publishing the audio stream
+        :param _mware: str: Middleware to use for publishing the audio stream
+        :return: dict: Audio message with the block (aud) of shape (chunk, channels), the capture timestamp of its
+                       first sample, its sequence number (seq), the index of its first sample (sample_index), and
+                       whether it contains speech (None without voice activity detection). Silent blocks are replaced
+                       by keep-alive messages without audio (aud is None) when voice activity detection is enabled
+        """
+        if kwargs.get("_internal_call", False):
+            grabbed, aud, speech = kwargs.get("_grabbed", None), kwargs.get("_aud", None), kwargs.get("_speech", None)
+        else:
+            grabbed, aud = self._read()
+            speech = self.detect_speech(aud) if grabbed else None
+        if not grabbed:
+            logging.warning("audio not grabbed")
+            return None,
+        return self._message(aud_feed_port, aud_rate, aud_channels, aud_chunk, aud, speech),
+
+    def _message(self, aud_feed_port, aud_rate, aud_channels, aud_chunk, aud, speech):
+        return {"topic": aud_feed_port.split("/")[-1],
+                "timestamp": self.last_timestamp,
+                "seq": self.last_seq,
+                "sample_index": self.last_sample_index,
+                "rate": aud_rate,
+                "channels": aud_channels,
+                "chunk": aud_chunk,
+                "speech": speech,
+                "aud": aud if speech is not False else None}
+
+    def detect_speech(self, aud):
+        """
+        Detects speech in an audio block when voice activity detection is enabled.
+        :param aud: np.ndarray: Audio block of shape (chunk, channels)
+        :return: bool: Whether the block contains speech. None when voice activity detection is disabled
+        """
+        if self.vad is None:
+            return None
+        return self.vad.process(pcm_to_float(aud) if self.raw_pcm else aud)
+
+    def read(self):
+        """
+        Reads the next audio block and publishes it.
+        :return: tuple: Whether the block was grabbed and the block of shape (chunk, channels)
+        """
+        grabbed, aud = self._read()
+        if grabbed:
+            speech = self.detect_speech(aud)
+            publish = speech is not False or self.last_publish_timestamp is None or \
+                self.last_timestamp - self.last_publish_timestamp >= self.vad_keepalive_secs
+            if publish:
+                aud_msg = self._publish(grabbed, aud, speech)
+                self.last_publish_timestamp = self.last_timestamp
+            else:
+                # silent blocks between keep-alive messages are not published
+                aud_msg = self._message(self.AUD_FEED_PORT, self.aud_rate, self.aud_channels, self.aud_chunk,
+                                        None, speech)
+            self.last_info = {key: value for key, value in aud_msg.items() if key != "aud"}
+            if self.outputs:
+                out_aud = pcm_to_float(aud) if self.raw_pcm else aud
+                for output in self.outputs:
+                    if isinstance(output, LogMelOutput):
+                        output.transmit_mel(out_aud, self.last_info, publish=publish)
+                    else:
+                        output.transmit_audio(out_aud, self.last_info, publish=publish)
+        return grabbed, aud
+
+    def _publish(self, grabbed, aud, speech=None):
+        aud_msg, = self.acquire_audio(aud_feed_port=self.AUD_FEED_PORT, aud_feed_carrier=self.AUD_FEED_CARRIER,
+                                      aud_rate=self.aud_rate, aud_channels=self.aud_channels,
+                                      aud_chunk=self.aud_chunk, _internal_call=True, _grabbed=grabbed, _aud=aud,
+                                      _speech=speech, _should_wait=self.SHOULD_WAIT, _mware=self.MWARE)
+        return aud_msg
+
+    def play(self, aud, aud_rate, aud_channels):
+        """
+        Plays an audio block on the default output device.
+        :param aud: np.ndarray: Audio block of shape (chunk, channels)
+        :param aud_rate: int: Sampling rate of the audio block
+        :param aud_channels: int: Number of channels of the audio block
+        """
+        if not HAVE_SOUNDDEVICE:
+            logging.warning("sounddevice is required for playing audio: pip install sounddevice. Disabling playback")
+            self.headless = True
+            return
+        if self.player is None or self.player.samplerate != aud_rate or self.player.channels != aud_channels:
+            if self.player is not None:
+                self.player.close()
+            self.player = sd.OutputStream(samplerate=aud_rate, channels=aud_channels, dtype="float32")
+            self.player.start()
+        self.player.write(np.ascontiguousarray(pcm_to_float(aud)))
+
+    def getPeriod(self):
+        """
+        Get the period of the module.
+        :return: float: Period of the module (chunk/rate)
+        """
+        return self.aud_chunk / self.aud_rate
+
+    def updateModule(self):
+        grabbed, aud = self.read()
+        if grabbed and not self.headless:
+            self.play(aud, self.last_info["rate"], self.last_info["channels"])
+        return True
+
+    def runModule(self):
+        while self.isOpened():
+            self.updateModule()
+
+    def isOpened(self):
+        return self.opened
+
+    def __del__(self):
+        self.release()
+
+    def release(self):
+        self.opened = False
+        if self.source is not None:
+            if self.multithreading:
+                with self.ring_condition:
+                    self.ring_condition.notify_all()
+                self.thread.join(timeout=1.0)
+            self.source.close()
+            self.source = None
+        if self.player is not None:
+            self.player.close()
+            self.player = None
+
+
+class AudioCaptureReceiver(AudioCapture):
+    MWARE = AUDIO_DEFAULT_COMMUNICATOR
+    AUD_RATE = 44100
+    AUD_CHANNELS = 1
+    AUD_CHUNK = 1024
+    AUD_FEED_PORT = "/audio_reader/audio_feed"
+    AUD_FEED_CARRIER = ""
+    SHOULD_WAIT = False
+
+    def __init__(self, aud_feed_port=AUD_FEED_PORT, aud_feed_carrier=AUD_FEED_CARRIER,
+                 headless=False, should_wait=SHOULD_WAIT, aud_rate=AUD_RATE, aud_channels=AUD_CHANNELS,
+                 aud_chunk=AUD_CHUNK, jitter_buffer=False, jitter_min_delay=0.02, jitter_max_delay=0.5,
+                 jitter_report_interval=10.0, vad_keepalive_secs=1.0, mware=MWARE, **kwargs):
+        """
+        Receives an audio stream from the specified port and plays it. With the jitter buffer, blocks are received on a
+        separate thread, reordered by their sequence numbers, and read at their playout time. Lost blocks are
+        concealed by repeating the last block with decaying amplitude.
+        :param aud_feed_port: str: The port to receive the audio stream from
+        :param aud_feed_carrier: str: The mware-specific carrier to receive the audio stream from (tcp, udp, mcast, ...)
+        :param headless: bool: Whether to NOT play the audio stream
+        :param should_wait: bool: Whether to wait for a publisher before receiving the audio stream
+        :param aud_rate: int: Expected sampling rate of the audio stream (updated from the received messages)
+        :param aud_channels: int: Expected number of channels of the audio stream (updated from the received messages)
+        :param aud_chunk: int: Expected number of frames per block (updated from the received messages)
+        :param jitter_buffer: bool: Whether to read the received blocks through an adaptive jitter buffer
+        :param jitter_min_delay: float: Minimum delay (in seconds) of the jitter buffer beyond the minimum transit time
+        :param jitter_max_delay: float: Maximum delay (in seconds) of the jitter buffer beyond the minimum transit time
+        :param jitter_report_interval: float: Interval (in seconds) between jitter buffer statistics reports (0 disables
+                                              logging the reports)
+        :param vad_keepalive_secs: float: Interval (in seconds) between the keep-alive messages of a publisher with
+                                          voice activity detection. Silent blocks between keep-alive messages are not
+                                          counted as lost by the jitter buffer
+        :param mware: str: Middleware to use for receiving the audio stream
+        """
+        AudioCapture.__init__(self, aud_feed_port="", aud_feed_carrier=aud_feed_carrier, headless=headless,
+                              should_wait=should_wait, multithreading=False, aud_rate=aud_rate,
+                              aud_channels=aud_channels, aud_chunk=aud_chunk, mware=mware)
+
+        self.AUD_FEED_PORT = aud_feed_port
+        self.opened = True
+
+        self.jitter_buffering = bool(aud_feed_port and jitter_buffer)
+        self.jitter_buffer = None
+        self.jitter_min_delay = jitter_min_delay
+        self.jitter_max_delay = jitter_max_delay
+        self.jitter_report_interval = jitter_report_interval
+        self.vad_keepalive_secs = vad_keepalive_secs
+        self.last_report_time = time.time()
+        self.received_info = None
+
+        # control the listening properties from within the app
+        if aud_feed_port:
+            self.activate_communication(self.acquire_audio, "listen")
+
+        self.build()
+
+        if self.jitter_buffering:
+            self.jitter_lock = Lock()
+            self.thread = Thread(target=self.update, args=())
+            self.thread.daemon = True
+            self.thread.start()
+
+    def build(self):
+        AudioCaptureReceiver.acquire_audio.__defaults__ = (self.AUD_FEED_PORT, self.AUD_FEED_CARRIER,
+                                                           self.aud_rate, self.aud_channels, self.aud_chunk,
+                                                           self.SHOULD_WAIT, self.MWARE)
+
+    def _receive(self):
+        aud_msg, = self.acquire_audio(aud_feed_port=self.AUD_FEED_PORT, aud_feed_carrier=self.AUD_FEED_CARRIER,
+                                      aud_rate=self.aud_rate, aud_channels=self.aud_channels,
+                                      aud_chunk=self.aud_chunk, _should_wait=self.SHOULD_WAIT, _mware=self.MWARE)
+        if aud_msg is None or aud_msg["topic"] != self.AUD_FEED_PORT.split("/")[-1]:
+            # messages of other ports sharing the port prefix are ignored
+            return None, None
+        info = {key: value for key, value in aud_msg.items() if key != "aud"}
+        self.aud_rate, self.aud_channels, self.aud_chunk = aud_msg["rate"], aud_msg["channels"], aud_msg["chunk"]
+        # keep-alive messages published during silence carry no audio
+        aud = None if aud_msg["aud"] is None else pcm_to_float(np.asarray(aud_msg["aud"]))
+        return info, aud
+
+    def update(self):
+        while self.opened:
+            info, aud = self._receive()
+            if info is None:
+                time.sleep(0.001)
+                continue
+            with self.jitter_lock:
+                if self.jitter_buffer is None:
+                    # gated silence between keep-alive messages is intentional and must not stall the buffer
+                    keepalive_blocks = int(np.ceil(self.vad_keepalive_secs * info["rate"] / info["chunk"]))
+                    self.jitter_buffer = JitterBuffer(info["chunk"] / info["rate"], min_delay=self.jitter_min_delay,
+                                                      max_delay=self.jitter_max_delay,
+                                                      max_outage=50 + keepalive_blocks)
+                self.received_info = info
+                self.jitter_buffer.push(info["seq"], info["timestamp"], aud, info=info)
+
+    def read(self, timeout=1.0):
+        """
+        Receives the next audio block. With the jitter buffer, waits until the next block is due.
+        :param timeout: float: Maximum time (in seconds) to wait for the next block with the jitter buffer
+        :return: tuple: Whether the block was received and the float32 block of shape (chunk, channels)
+        """
+        if not self.jitter_buffering:
+            info, aud = self._receive()
+            if info is None:
+                return False, None
+            self.last_info = info
+            self.last_timestamp, self.last_seq, self.last_sample_index = \
+                info["timestamp"], info["seq"], info["sample_index"]
+            return aud is not None, aud
+
+        deadline = time.time() + timeout
+        while True:
+            with self.jitter_lock:
+                if self.jitter_buffer is not None:
+                    status, seq, aud = self.jitter_buffer.pop()
+                    due = self.jitter_buffer.playout_time()
+                else:
+                    status, due = None, None
+                if status is not None:
+                    self.last_seq = seq
+                    self.last_timestamp = self.jitter_buffer.last_timestamp
+                    # concealed blocks inherit the information of the most recently received block
+                    self.last_info = dict(self.jitter_buffer.last_info or dict(self.received_info, sample_index=None),
+                                          seq=seq, timestamp=self.last_timestamp, status=status)
+                    self.last_sample_index = self.last_info["sample_index"]
+                    return aud is not None, aud
+            now = time.time()
+            if now > deadline:
+                return False, None
+            time.sleep(min(max(due - now, 0.0005), 0.01) if due is not None else 0.005)
+
+    def jitter_stats(self):
+        """
+        Gets the jitter buffer statistics.
+        :return: dict: Block counts (received, played, concealed, silence, late, duplicate), jitter and target delay
+                       (in seconds), number of buffered blocks, mean playout latency (in seconds) from capture, and the
+                       underrun (concealment) ratio. None without the jitter buffer
+        """
+        if self.jitter_buffer is None:
+            return None
+        with self.jitter_lock:
+            return self.jitter_buffer.stats()
+
+    def updateModule(self):
+        grabbed, aud = self.read()
+        if grabbed and not self.headless:
+            self.play(aud, self.aud_rate, self.aud_channels)
+        elif not grabbed and self.jitter_buffer is None:
+            time.sleep(self.getPeriod() / 4)
+        if self.jitter_report_interval and self.jitter_buffer is not None and \
+                time.time() - self.last_report_time >= self.jitter_report_interval:
+            self.last_report_time = time.time()
+            stats = self.jitter_stats()
+            logging.info(f"jitter buffer: jitter {stats['jitter'] * 1000:.1f} ms, "
+                         f"target delay {stats['target_delay'] * 1000:.1f} ms, "
+                         f"latency {(stats['latency'] or 0.0) * 1000:.1f} ms, "
+                         f"underrun ratio {stats['underrun_ratio']:.3f}, late {stats['late']}")
+        return True
+
+
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headless", action="store_true", help="Disable audio playback")
+    parser.add_argument("--mware", type=str, default=AUDIO_DEFAULT_COMMUNICATOR,
+                        help="Middleware to listen to or publish audio",
+                        choices=MiddlewareCommunicator.get_communicators())
+    parser.add_argument("--should_wait", action="store_true", help="Wait for at least one listener before publishing")
+    parser.add_argument("--disable_multithreading", dest="multithreading", action="store_false",
+                        help="Capture audio blocks on the publishing thread instead of a separate capturing thread")
+    parser.add_argument("--ring_size", type=int, default=16, help="Number of blocks in the capturing ring buffer")
+    parser.add_argument("--aud_feed_port", type=str, default="/audio_reader/audio_feed",
+                        help="The middleware port for publishing/receiving the audio")
+    parser.add_argument("--aud_feed_carrier", type=str, default="",
+                        help="The carrier e.g., TCP or UDP for transmitting audio. This is middleware dependent:"
+                             "yarp - udp, tcp, mcast; ros - tcp; zeromq - tcp")
+    parser.add_argument("--aud_source", type=str, default="",
+                        help="The audio capture source (int device id | str WAV path | 'sine[:<frequency>]')")
+    parser.add_argument("--aud_rate", type=int, default=44100, help="The audio sampling rate")
+    parser.add_argument("--aud_channels", type=int, default=1, help="The number of audio channels")
+    parser.add_argument("--aud_chunk", type=int, default=1024,
+                        help="The number of frames per block. Smaller blocks reduce latency at the cost of "
+                             "more messages")
+    parser.add_argument("--disable_realtime", dest="realtime", action="store_false",
+                        help="Publish WAV file and synthetic sources as fast as possible instead of in real-time")
+    parser.add_argument("--loop", action="store_true", help="Loop WAV file sources")
+    parser.add_argument("--raw_pcm", action="store_true",
+                        help="Publish the native PCM samples of memory-mapped WAV files without converting them to "
+                             "float32 (received blocks are converted to float32)")
+    parser.add_argument("--vad", action="store_true",
+                        help="Publish speech blocks only using voice activity detection, with sparse keep-alive "
+                             "messages during silence")
+    parser.add_argument("--vad_start_threshold_db", type=float, default=9.0,
+                        help="Energy (in dB) above the noise floor needed to start speech")
+    parser.add_argument("--vad_stop_threshold_db", type=float, default=4.0,
+                        help="Energy (in dB) above the noise floor needed to sustain speech")
+    parser.add_argument("--vad_hangover_secs", type=float, default=0.3,
+                        help="Duration (in seconds) speech remains active after the last speech frame")
+    parser.add_argument("--vad_keepalive_secs", type=float, default=1.0,
+                        help="Interval (in seconds) between keep-alive messages during silence")
+    parser.add_argument("--jitter_buffer", action="store_true",
+                        help="Read the received audio through an adaptive jitter buffer concealing lost blocks")
+    parser.add_argument("--jitter_min_delay", type=float, default=0.02,
+                        help="Minimum delay (in seconds) of the jitter buffer beyond the minimum transit time")
+    parser.add_argument("--jitter_max_delay", type=float, default=0.5,
+                        help="Maximum delay (in seconds) of the jitter buffer beyond the minimum transit time")
+    parser.add_argument("--aud_outputs", type=str, default=[], nargs="+",
+                        help="Additional output formats resampled and mixed at the publisher, each published to its "
+                             "own port. Formatted as <port>:<rate>:<channels> e.g., /audio_reader_16k/audio_feed:16000:1")
+    parser.add_argument("--mel", action="store_true",
+                        help="Publish float16 log-mel spectrogram frames computed at the publisher")
+    parser.add_argument("--mel_feed_port", type=str, default="",
+                        help="The middleware port for publishing the log-mel frames. Derived from --aud_feed_port "
+                             "by default e.g., /audio_reader_mel/audio_feed")
+    parser.add_argument("--mel_window_secs", type=float, default=0.025,
+                        help="Duration (in seconds) of the log-mel analysis window")
+    parser.add_argument("--mel_hop_secs", type=float, default=0.01,
+                        help="Duration (in seconds) between consecutive log-mel frames")
+    parser.add_argument("--mel_bands", type=int, default=64, help="Number of mel bands")
+    parser.add_argument("--beam", action="store_true",
+                        help="Publish a single channel beamformed (delay-and-sum) from the microphone array channels")
+    parser.add_argument("--beam_feed_port", type=str, default="",
+                        help="The middleware port for publishing the beamformed channel. Derived from the "
+                             "--aud_feed_port by default e.g., /audio_reader_beam/audio_feed")
+    parser.add_argument("--beam_mic_positions", type=str, nargs="+", default=None,
+                        help="Microphone positions (in metres) formatted as <x>,<y>,<z> (x forward, y left, z up), "
+                             "ordered as the captured channels")
+    parser.add_argument("--beam_direction_port", type=str, default="",
+                        help="The middleware port for receiving the steering direction (yaw and pitch in degrees) "
+                             "e.g., from gaze or face tracking")
+    parser.add_argument("--beam_n_fft", type=int, default=512, help="Number of samples per beamformer analysis frame")
+    parser.add_argument("--beam_yaw", type=float, default=0.0,
+                        help="Initial steering yaw angle in degrees (positive to the left)")
+    parser.add_argument("--beam_pitch", type=float, default=0.0,
+                        help="Initial steering pitch angle in degrees (positive upwards)")
+    return parser
+
+
+def parse_args():
+    return get_parser().parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.aud_source:
+        aud_cap = AudioCapture(**vars(args))
+    elif args.mel:
+        aud_cap = LogMelReceiver(mel_feed_port=args.mel_feed_port or derive_port(args.aud_feed_port, "mel"),
+                                 mel_feed_carrier=args.aud_feed_carrier, should_wait=args.should_wait,
+                                 mware=args.mware)
+    else:
+        aud_cap = AudioCaptureReceiver(**vars(args))
+    aud_cap.runModule()
@@ -0,0 +1,492 @@
+import logging
+import argparse
+import time
+import bisect
+import os
+
+import cv2
+import numpy as np
+
+from wrapyfi.connect.wrapper import MiddlewareCommunicator, DEFAULT_COMMUNICATOR
+from wrapyfi_interfaces.io.audio.interface import pcm_to_float
+from wrapyfi_interfaces.io.video.interface import VideoCapture
+
+AV_DEFAULT_COMMUNICATOR = os.environ.get("AV_DEFAULT_COMMUNICATOR", DEFAULT_COMMUNICATOR)
+AV_DEFAULT_COMMUNICATOR = os.environ.get("AV_DEFAULT_MWARE", AV_DEFAULT_COMMUNICATOR)
+
+"""
+Audio/Video synchronizer listening to a timestamped video stream (wrapyfi_interfaces/io/video/interface.py published
+with --timestamped) and an audio stream (wrapyfi_interfaces/io/audio/interface.py), and publishing bundles of one
+frame along with the audio samples captured within the interval of that frame (from its capture timestamp up to the
+capture timestamp of the following frame).
+Here we demonstrate
+1. Aligning streams captured on different machines by their capture timestamps, with clock offset correction
+2. Listening to multiple ports and publishing to another within the same module
+Run:
+    # On machine 1 (or process 1): The video stream publishing with capture timestamps
+    python3 ../video/interface.py --cap_source 0 --timestamped --headless
+    # On machine 1 (or process 1): The audio stream publishing
+    python3 ../audio/interface.py --aud_source 0 --aud_rate 16000 --headless
+    # On machine 2 (or process 2): The synchronizer estimating the clock offset between the audio and video publishers
+    python3 interface.py
+    # On machine 2 (or process 2): The synchronizer with audio timestamps lagging 40 ms behind the video timestamps
+    python3 interface.py --clock_offset 0.04
+"""
+
+
+class _AVSyncBuffer(object):
+    """
+    Buffers of frames and audio blocks kept sorted by their capture timestamps. Each frame is bundled with the audio
+    samples covering its interval once the audio stream has advanced beyond the interval, or once the frame has waited
+    for max_wait seconds (the missing samples are zero-filled and reflected in the coverage).
+    Audio timestamps are mapped to the video clock by adding the clock offset. When the offset is not given, it is
+    estimated as the difference between the minimum transit times (arrival - capture timestamp) of both streams,
+    assuming the minimum network delays of both streams are similar.
+    Gaps in the audio stream (or frame intervals much longer than the frame period) are assumed to be caused by
+    reordered messages for reorder_wait seconds, after which the missing samples (or frames) are considered lost.
+    """
+    def __init__(self, clock_offset=None, max_wait=0.5, reorder_wait=0.05, max_frames=30, max_audio_secs=5.0):
+        """
+        :param clock_offset: float: Seconds added to the audio timestamps to map them to the video clock. None
+                                    estimates the offset from the arrival times
+        :param max_wait: float: Maximum time (in seconds) a frame waits for the following frame and the audio
+                                covering its interval
+        :param reorder_wait: float: Time (in seconds) to wait for reordered audio blocks and frames filling a gap
+        :param max_frames: int: Maximum number of buffered frames. The oldest frames are dropped beyond this limit
+        :param max_audio_secs: float: Maximum duration (in seconds) of buffered audio
+        """
+        self.fixed_clock_offset = clock_offset
+        self.max_wait = max_wait
+        self.reorder_wait = reorder_wait
+        self.max_frames = max_frames
+        self.max_audio_secs = max_audio_secs
+
+        self.frame_timestamps = []
+        self.frames = []
+        self.audio_timestamps = []
+        self.audio_blocks = []
+        # the audio timestamp up to which all samples have been received (in the audio clock), the end of the latest
+        # block, and the arrival time of the first block received beyond a gap
+        self.audio_horizon = None
+        self.audio_end = None
+        self.audio_gap_arrival = None
+        self.rate = None
+        self.channels = None
+
+        self.min_video_transit = None
+        self.min_audio_transit = None
+        self.frame_period = None
+        self.last_end = None
+        self.frame_index = 0
+        self.counts = {"frames": 0, "bundles": 0, "dropped_frames": 0, "late_frames": 0, "partial": 0}
+
+    @property
+    def clock_offset(self):
+        if self.fixed_clock_offset is not None:
+            return self.fixed_clock_offset
+        if self.min_video_transit is None or self.min_audio_transit is None:
+            return 0.0
+        return self.min_audio_transit - self.min_video_transit
+
+    def push_frame(self, timestamp, frame, arrival=None):
+        """
+        Buffers a frame.
+        :param timestamp: float: Capture timestamp of the frame (in the video clock)
+        :param frame: dict: Image message of the frame
+        :param arrival: float: Arrival time of the frame. Defaults to the current time
+        """
+        arrival = time.time() if arrival is None else arrival
+        transit = arrival - timestamp
+        self.min_video_transit = transit if self.min_video_transit is None else min(self.min_video_transit, transit)
+        self.counts["frames"] += 1
+        if self.last_end is not None and timestamp < self.last_end:
+            # the interval preceding this frame has already been bundled
+            self.counts["late_frames"] += 1
+            return
+        idx = bisect.bisect(self.frame_timestamps, timestamp)
+        if idx > 0 and self.frame_timestamps[idx - 1] == timestamp:
+            return
+        if idx > 0:
+            period = timestamp - self.frame_timestamps[idx - 1]
+            self.frame_period = period if self.frame_period is None else 0.9 * self.frame_period + 0.1 * period
+        self.frame_timestamps.insert(idx, timestamp)
+        self.frames.insert(idx, (frame, arrival))
+        if len(self.frames) > self.max_frames:
+            del self.frame_timestamps[0], self.frames[0]
+            self.counts["dropped_frames"] += 1
+
+    def push_audio(self, timestamp, aud, rate, frames, arrival=None):
+        """
+        Buffers an audio block.
+        :param timestamp: float: Capture timestamp of the first sample of the block (in the audio clock)
+        :param aud: np.ndarray: float32 block of shape (frames, channels). None for keep-alive messages published
+                                during silence, which advance the audio stream without samples
+        :param rate: int: Sampling rate of the block
+        :param frames: int: Number of frames covered by the block
+        :param arrival: float: Arrival time of the block. Defaults to the current time
+        """
+        arrival = time.time() if arrival is None else arrival
+        # a block is sent once its last sample is captured, so the transit is measured from the end of the block
+        transit = arrival - (timestamp + frames / rate)
+        self.min_audio_transit = transit if self.min_audio_transit is None else min(self.min_audio_transit, transit)
+        if rate != self.rate or (aud is not None and aud.shape[1] != self.channels):
+            # the buffered blocks cannot be concatenated with blocks of a different format
+            del self.audio_timestamps[:], self.audio_blocks[:]
+            self.rate = rate
+            if aud is not None:
+                self.channels = aud.shape[1]
+        end = timestamp + frames / rate
+        self.audio_end = end if self.audio_end is None else max(self.audio_end, end)
+        if aud is None:
+            # keep-alive messages account for all samples preceding them (blocks gated during silence)
+            self.audio_horizon = end if self.audio_horizon is None else max(self.audio_horizon, end)
+        else:
+            idx = bisect.bisect(self.audio_timestamps, timestamp)
+            self.audio_timestamps.insert(idx, timestamp)
+            self.audio_blocks.insert(idx, aud)
+            if self.audio_horizon is None:
+                self.audio_horizon = timestamp
+            # the horizon advances over the blocks contiguous with it (tolerating half a sample of rounding)
+            tolerance = 0.5 / rate
+            while idx < len(self.audio_timestamps) and self.audio_timestamps[idx] <= self.audio_horizon + tolerance:
+                self.audio_horizon = max(self.audio_horizon,
+                                         self.audio_timestamps[idx] + len(self.audio_blocks[idx]) / rate)
+                idx += 1
+            # blocks older than the buffered duration are discarded
+            cut = bisect.bisect(self.audio_timestamps, self.audio_end - self.max_audio_secs)
+            if cut > 0:
+                del self.audio_timestamps[:cut], self.audio_blocks[:cut]
+        if self.audio_horizon >= self.audio_end:
+            self.audio_gap_arrival = None
+        elif self.audio_gap_arrival is None:
+            self.audio_gap_arrival = arrival
+
+    def extract_audio(self, start, end):
+        """
+        Extracts the audio samples captured within an interval. Samples which were not received are zero-filled.
+        :param start: float: Start of the interval (in the audio clock)
+        :param end: float: End of the interval (in the audio clock)
+        :return: tuple: float32 samples of shape (frames, channels) and the fraction of samples received
+        """
+        if self.rate is None or self.channels is None:
+            return None, 0.0
+        num_samples = int(round((end - start) * self.rate))
+        aud = np.zeros((num_samples, self.channels), dtype=np.float32)
+        covered = 0
+        idx = max(bisect.bisect(self.audio_timestamps, start) - 1, 0)
+        while idx < len(self.audio_timestamps) and self.audio_timestamps[idx] < end:
+            block = self.audio_blocks[idx]
+            offset = int(round((self.audio_timestamps[idx] - start) * self.rate))
+            src_start, dst_start = max(0, -offset), max(0, offset)
+            length = min(len(block) - src_start, num_samples - dst_start)
+            if length > 0:
+                aud[dst_start:dst_start + length] = block[src_start:src_start + length]
+                covered += length
+            idx += 1
+        return aud, min(covered / num_samples, 1.0) if num_samples else 1.0
+
+    def pop(self, now=None):
+        """
+        Bundles the earliest frame with its audio once the interval of the frame is covered or max_wait elapsed.
+        :param now: float: Current time. Defaults to the current time
+        :return: dict: Bundle with the frame (frame), its interval in the video clock (start, end), the audio samples
+                       (aud) with the start of the interval in the audio clock (aud_timestamp), the fraction of samples
+                       received (coverage), and the clock offset. None when no frame is ready
+        """
+        if not self.frames:
+            return None
+        now = time.time() if now is None else now
+        start = self.frame_timestamps[0]
+        frame, arrival = self.frames[0]
+        expired = now - arrival >= self.max_wait
+        if len(self.frames) > 1:
+            end = self.frame_timestamps[1]
+            if not expired and self.frame_period is not None and end - start > 1.5 * self.frame_period and \
+                    now - self.frames[1][1] < self.reorder_wait:
+                # the frame in between may still arrive
+                return None
+        elif expired and self.frame_period is not None:
+            end = start + self.frame_period
+        else:
+            return None
+
+        if self.audio_gap_arrival is not None and now - self.audio_gap_arrival >= self.reorder_wait:
+            # the samples missing from the gap are considered lost
+            self.audio_horizon = self.audio_end
+            self.audio_gap_arrival = None
+
+        clock_offset = self.clock_offset
+        aud_start, aud_end = start - clock_offset, end - clock_offset
+        if not expired and (self.audio_horizon is None or self.audio_horizon < aud_end):
+            return None
+
+        aud, coverage = self.extract_audio(aud_start, aud_end)
+        del self.frame_timestamps[0], self.frames[0]
+        self.last_end = end
+        self.counts["bundles"] += 1
+        if coverage < 1.0:
+            self.counts["partial"] += 1
+        bundle = {"frame": frame,
+                  "frame_index": self.frame_index,
+                  "start": start,
+                  "end": end,
+                  "aud": aud,
+                  "aud_timestamp": aud_start,
+                  "rate": self.rate,
+                  "coverage": coverage,
+                  "clock_offset": clock_offset}
+        self.frame_index += 1
+        return bundle
+
+    def stats(self):
+        """
+        Gets the synchronization statistics.
+        :return: dict: Counts (frames, bundles, dropped_frames, late_frames, partial), clock offset and frame period
+                       (in seconds), and the number of buffered frames and audio blocks
+        """
+        return dict(self.counts, clock_offset=self.clock_offset, frame_period=self.frame_period,
+                    buffered_frames=len(self.frames), buffered_audio=len(self.audio_blocks))
+
+
+class AudioVideoSynchronizer(MiddlewareCommunicator):
+    """
+    Listens to a timestamped video stream and an audio stream, and publishes bundles of one frame along with the audio
+    samples captured within the interval of that frame. The frames and blocks are buffered sorted by their capture
+    timestamps, and the samples of each interval are located by bisection, tolerating reordered messages.
+    """
+
+    MWARE = AV_DEFAULT_COMMUNICATOR
+    CAP_FEED_PORT = "/video_reader/video_feed"
+    AUD_FEED_PORT = "/audio_reader/audio_feed"
+    AV_FEED_PORT = "/av_synchronizer/av_feed"
+    AV_FEED_CARRIER = ""
+    SHOULD_WAIT = False
+
+    def __init__(self, cap_feed_port=CAP_FEED_PORT, aud_feed_port=AUD_FEED_PORT, av_feed_port=AV_FEED_PORT,
+                 av_feed_carrier=AV_FEED_CARRIER, headless=False, should_wait=SHOULD_WAIT, clock_offset=None,
+                 max_wait=0.5, reorder_wait=0.05, max_frames=30, max_audio_secs=5.0, report_interval=10.0,
+                 mware=MWARE, **kwargs):
+        """
+        :param cap_feed_port: str: The port to receive the timestamped video stream from
+        :param aud_feed_port: str: The port to receive the audio stream from
+        :param av_feed_port: str: The port to publish the synchronized bundles to
+        :param av_feed_carrier: str: The mware-specific carrier to publish the bundles to (tcp, udp, mcast, ...)
+        :param headless: bool: Whether to NOT display the synchronized frames
+        :param should_wait: bool: Whether to wait for a subscriber before publishing the bundles
+        :param clock_offset: float: Seconds added to the audio timestamps to map them to the video clock (e.g., the
+                                    clock difference between the video and audio publishing machines). None estimates
+                                    the offset from the minimum transit times of both streams
+        :param max_wait: float: Maximum time (in seconds) a frame waits for the following frame and its audio
+        :param reorder_wait: float: Time (in seconds) to wait for reordered audio blocks and frames filling a gap
+        :param max_frames: int: Maximum number of buffered frames
+        :param max_audio_secs: float: Maximum duration (in seconds) of buffered audio
+        :param report_interval: float: Interval (in seconds) between synchronization statistics reports (0 disables
+                                       logging the reports)
+        :param mware: str: Middleware to use for receiving the streams and publishing the bundles
+        """
+        MiddlewareCommunicator.__init__(self)
+
+        self.MWARE = mware
+        self.CAP_FEED_PORT = cap_feed_port
+        self.AUD_FEED_PORT = aud_feed_port
+        self.AV_FEED_PORT = av_feed_port
+        self.AV_FEED_CARRIER = av_feed_carrier
+        self.SHOULD_WAIT = should_wait
+
+        self.headless = headless
+        self.report_interval = report_interval
+        self.last_report_time = time.time()
+        self.sync_buffer = _AVSyncBuffer(clock_offset=clock_offset, max_wait=max_wait, reorder_wait=reorder_wait,
+                                         max_frames=max_frames, max_audio_secs=max_audio_secs)
+
+        if cap_feed_port:
+            self.activate_communication(self.receive_images, "listen")
+        if aud_feed_port:
+            self.activate_communication(self.receive_audio, "listen")
+        if av_feed_port:
+            self.activate_communication(self.acquire_bundle, "publish")
+
+        self.build()
+
+    def build(self):
+        """
+        Updates the default method arguments according to constructor arguments. This method is called by the module
+        constructor. It is not necessary to call it manually.
+        """
+        AudioVideoSynchronizer.receive_images.__defaults__ = (self.CAP_FEED_PORT, self.MWARE)
+        AudioVideoSynchronizer.receive_audio.__defaults__ = (self.AUD_FEED_PORT, self.MWARE)
+        AudioVideoSynchronizer.acquire_bundle.__defaults__ = (self.AV_FEED_PORT, self.AV_FEED_CARRIER,
+                                                              self.SHOULD_WAIT, self.MWARE)
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "AudioVideoSynchronizer", "$cap_feed_port",
+                                     carrier="", should_wait=False)
+    def receive_images(self, cap_feed_port=CAP_FEED_PORT, _mware=MWARE, **kwargs):
+        """
+        Receives a timestamped image message.
+        :param cap_feed_port: str: The port to receive the timestamped video stream from
+        :param _mware: str: Middleware to use for receiving the video stream
+        :return: dict: Image message with the JPEG compressed buffer or image (img) and the capture timestamp
+        """
+        return None,
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "AudioVideoSynchronizer", "$aud_feed_port",
+                                     carrier="", should_wait=False)
+    def receive_audio(self, aud_feed_port=AUD_FEED_PORT, _mware=MWARE, **kwargs):
+        """
+        Receives an audio message.
+        :param aud_feed_port: str: The port to receive the audio stream from
+        :param _mware: str: Middleware to use for receiving the audio stream
+        :return: dict: Audio message with the block (aud) and the capture timestamp of its first sample
+        """
+        return None,
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "AudioVideoSynchronizer", "$av_feed_port",
+                                     carrier="$av_feed_carrier", should_wait="$_should_wait")
+    def acquire_bundle(self, av_feed_port=AV_FEED_PORT, av_feed_carrier=AV_FEED_CARRIER,
+                       _should_wait=SHOULD_WAIT, _mware=MWARE, **kwargs):
+        """
+        Publishes a synchronized bundle to the specified port.
+        :param av_feed_port: str: The port to publish the synchronized bundles to
+        :param av_feed_carrier: str: The mware-specific carrier to publish the bundles to (tcp, udp, mcast, ...)
+        :param _should_wait: bool: Whether to wait for a subscriber before publishing the bundles
+        :param _mware: str: Middleware to use for publishing the bundles
+        :return: dict: Bundle message with the frame (img) and its capture timestamp, the end of the frame interval
+                       (end_timestamp), the audio samples within the interval (aud) with the capture timestamp of the
+                       first sample (aud_timestamp), and the fraction of samples received (coverage)
+        """
+        bundle = kwargs.get("_bundle", None)
+        if bundle is None:
+            return None,
+        frame = bundle["frame"]
+        return {"topic": av_feed_port.split("/")[-1],
+                "timestamp": bundle["start"],
+                "end_timestamp": bundle["end"],
+                "frame_index": bundle["frame_index"],
+                "img_width": frame.get("img_width", None),
+                "img_height": frame.get("img_height", None),
+                "jpg": frame.get("jpg", False),
+                "img": frame["img"],
+                "aud_timestamp": bundle["aud_timestamp"],
+                "rate": bundle["rate"],
+                "channels": None if bundle["aud"] is None else bundle["aud"].shape[1],
+                "coverage": bundle["coverage"],
+                "clock_offset": bundle["clock_offset"],
+                "aud": bundle["aud"]},
+
+    def _receive(self, max_messages=100):
+        """
+        Drains the pending video and audio messages into the synchronization buffer.
+        :param max_messages: int: Maximum number of messages received per stream
+        :return: int: Number of messages received
+        """
+        received = 0
+        if self.AUD_FEED_PORT:
+            aud_topic = self.AUD_FEED_PORT.split("/")[-1]
+            for _ in range(max_messages):
+                aud_msg, = self.receive_audio(aud_feed_port=self.AUD_FEED_PORT, _mware=self.MWARE)
+                if aud_msg is None:
+                    break
+                received += 1
+                # messages of other ports sharing the port prefix are ignored
+                if aud_msg.get("topic", None) != aud_topic:
+                    continue
+                aud = None if aud_msg["aud"] is None else pcm_to_float(np.asarray(aud_msg["aud"]))
+                self.sync_buffer.push_audio(aud_msg["timestamp"], aud, aud_msg["rate"],
+                                            aud_msg["chunk"] if aud is None else len(aud))
+        if self.CAP_FEED_PORT:
+            cap_topic = self.CAP_FEED_PORT.split("/")[-1]
+            for _ in range(max_messages):
+                img_msg, = self.receive_images(cap_feed_port=self.CAP_FEED_PORT, _mware=self.MWARE)
+                if img_msg is None:
+                    break
+                received += 1
+                if img_msg.get("topic", None) != cap_topic:
+                    continue
+                self.sync_buffer.push_frame(img_msg["timestamp"], img_msg)
+        return received
+
+    def read(self):
+        """
+        Receives the pending frames and audio blocks, and publishes the next synchronized bundle when it is ready.
+        :return: dict: Bundle message. None when no bundle is ready
+        """
+        self._receive()
+        bundle = self.sync_buffer.pop()
+        if bundle is None:
+            return None
+        bundle_msg, = self.acquire_bundle(av_feed_port=self.AV_FEED_PORT, av_feed_carrier=self.AV_FEED_CARRIER,
+                                          _should_wait=self.SHOULD_WAIT, _mware=self.MWARE, _bundle=bundle)
+        return bundle_msg
+
+    def stats(self):
+        """
+        Gets the synchronization statistics.
+        :return: dict: Counts (frames, bundles, dropped_frames, late_frames, partial), clock offset and frame period
+                       (in seconds), and the number of buffered frames and audio blocks
+        """
+        return self.sync_buffer.stats()
+
+    def getPeriod(self):
+        return 0.005
+
+    def updateModule(self):
+        bundle_msg = self.read()
+        if bundle_msg is None:
+            time.sleep(self.getPeriod())
+        elif not self.headless:
+            cv2.imshow("AudioVideoSynchronizer", VideoCapture.decode(np.asarray(bundle_msg["img"])))
+            k = cv2.waitKey(1)
+            if k == 27:  # Esc key to exit
+                exit(0)
+        if self.report_interval and time.time() - self.last_report_time >= self.report_interval:
+            self.last_report_time = time.time()
+            stats = self.stats()
+            logging.info(f"audio/video synchronization: {stats['bundles']} bundles ({stats['partial']} partial), "
+                         f"{stats['dropped_frames']} dropped and {stats['late_frames']} late frames, "
+                         f"clock offset {stats['clock_offset'] * 1000:.1f} ms")
+        return True
+
+    def runModule(self):
+        while True:
+            self.updateModule()
+
+
+def clock_offset(value):
+    return None if value == "auto" else float(value)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headless", action="store_true", help="Disable CV2 GUI")
+    parser.add_argument("--mware", type=str, default=AV_DEFAULT_COMMUNICATOR,
+                        help="Middleware to listen to the streams and publish the bundles",
+                        choices=MiddlewareCommunicator.get_communicators())
+    parser.add_argument("--should_wait", action="store_true", help="Wait for at least one listener before publishing")
+    parser.add_argument("--cap_feed_port", type=str, default="/video_reader/video_feed",
+                        help="The middleware port for receiving the timestamped video stream")
+    parser.add_argument("--aud_feed_port", type=str, default="/audio_reader/audio_feed",
+                        help="The middleware port for receiving the audio stream")
+    parser.add_argument("--av_feed_port", type=str, default="/av_synchronizer/av_feed",
+                        help="The middleware port for publishing the synchronized bundles")
+    parser.add_argument("--av_feed_carrier", type=str, default="",
+                        help="The carrier e.g., TCP or UDP for transmitting bundles. This is middleware dependent:"
+                             "yarp - udp, tcp, mcast; ros - tcp; zeromq - tcp")
+    parser.add_argument("--clock_offset", type=clock_offset, default=None,
+                        help="Seconds added to the audio timestamps to map them to the video clock, or 'auto' to "
+                             "estimate the offset from the arrival times of both streams")
+    parser.add_argument("--max_wait", type=float, default=0.5,
+                        help="Maximum time (in seconds) a frame waits for the following frame and its audio")
+    parser.add_argument("--reorder_wait", type=float, default=0.05,
+                        help="Time (in seconds) to wait for reordered audio blocks and frames filling a gap")
+    parser.add_argument("--max_frames", type=int, default=30, help="Maximum number of buffered frames")
+    parser.add_argument("--max_audio_secs", type=float, default=5.0,
+                        help="Maximum duration (in seconds) of buffered audio")
+    parser.add_argument("--report_interval", type=float, default=10.0,
+                        help="Interval (in seconds) between synchronization statistics reports")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    av_sync = AudioVideoSynchronizer(**vars(args))
+    av_sync.runModule()
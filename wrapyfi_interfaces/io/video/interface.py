@@ -2,8 +2,9 @@
 import logging
 import argparse
 import time
+from collections import deque
 from queue import Queue
-from threading import Thread
+from threading import Thread, Lock
 import os
 
 import cv2
@@ -27,9 +28,116 @@ Run:
     python3 interface.py --cap_source 0
     # On machine 2 ... N (or process 2 ... N): The video stream listening
     python3 interface.py
+    # Keeping the last 5 seconds of frames in memory and flushing them along with the 5 seconds following an event 
+    # (any message published to the event trigger port) to disk 
+    python3 interface.py --cap_source 0 --pre_event_secs 5 --post_event_secs 5 --event_trigger_port /video_reader/event_trigger
+    # Forwarding the MJPEG frames of a camera (or an MJPEG video file) without decoding and re-encoding them
+    python3 interface.py --cap_source 0 --mjpeg_passthrough
+    # Listening to the forwarded MJPEG frames
+    python3 interface.py --mjpeg_passthrough
+    # Publishing frames as native objects carrying their capture timestamps (e.g., for synchronizing them with audio)
+    python3 interface.py --cap_source 0 --timestamped
+    python3 interface.py --timestamped
 """
 
 
+def _is_jpg(img):
+    """Checks whether the frame is a JPEG compressed buffer (starting with the SOI marker) rather than an image"""
+    # cv2.imencode returns a column (N, 1) buffer, while received buffers may be flattened or rows
+    return img is not None and img.dtype == np.uint8 and img.size > 2 and \
+        (img.ndim == 1 or (img.ndim == 2 and 1 in img.shape)) and img.flat[0] == 0xFF and img.flat[1] == 0xD8
+
+
+class _EventRecorder(object):
+    """
+    Bounded in-memory ring of the most recent frames. Once triggered, the frames preceding the event and those 
+    captured within the post-event interval are flushed to disk by a writer thread, without stalling the capturer.
+    """
+    def __init__(self, pre_event_secs, post_event_secs, fps, jpg=False, recording_dir="video_events"):
+        """
+        :param pre_event_secs: float: Duration of the frames kept in memory preceding an event
+        :param post_event_secs: float: Duration of the frames recorded following an event
+        :param fps: int: Frames per second of the video stream used for sizing the ring
+        :param jpg: bool: Whether to JPEG compress the frames kept in memory
+        :param recording_dir: str: Directory in which the event recordings are stored
+        """
+        self.ring = deque(maxlen=max(1, int(round(pre_event_secs * fps))))
+        self.post_event_secs = post_event_secs
+        self.jpg = jpg
+        self.recording_dir = recording_dir
+
+        self.lock = Lock()
+        self.events = []
+        self.closed = False
+        self.write_queue = Queue()
+        self.thread = Thread(target=self.write_events, args=())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def append(self, timestamp, img):
+        if img is None:
+            return
+        if self.jpg and not _is_jpg(img):
+            encoded, img_jpg = cv2.imencode(".jpg", img)
+            if not encoded:
+                return
+            img = img_jpg
+        with self.lock:
+            self.ring.append((timestamp, img))
+            if self.events:
+                for event in self.events:
+                    event["frames"].append((timestamp, img))
+                    if timestamp >= event["until"]:
+                        self.write_queue.put(event)
+                self.events = [event for event in self.events if timestamp < event["until"]]
+
+    def trigger(self, label="event", timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        label = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(label))
+        with self.lock:
+            event = {"label": label,
+                     "timestamp": timestamp,
+                     "until": timestamp + self.post_event_secs,
+                     "frames": list(self.ring)}
+            if self.post_event_secs > 0:
+                self.events.append(event)
+            else:
+                self.write_queue.put(event)
+
+    def close(self):
+        """
+        Writes the events whose post-event interval is still open with the frames recorded so far, and waits for all
+        queued events to be written.
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            for event in self.events:
+                self.write_queue.put(event)
+            self.events = []
+        self.write_queue.put(None)
+        self.thread.join()
+
+    def write_events(self):
+        while True:
+            event = self.write_queue.get()
+            if event is None:
+                break
+            event_dir = os.path.join(self.recording_dir, f"{event['label']}_{event['timestamp']:.3f}")
+            try:
+                os.makedirs(event_dir, exist_ok=True)
+                for frame_idx, (timestamp, img) in enumerate(event["frames"]):
+                    img_path = os.path.join(event_dir, f"{frame_idx:06d}_{timestamp:.6f}.jpg")
+                    if _is_jpg(img):
+                        img.tofile(img_path)
+                    else:
+                        cv2.imwrite(img_path, img)
+                logging.info(f"event recording with {len(event['frames'])} frames written to {event_dir}")
+            except (OSError, cv2.error) as e:
+                logging.error(f"could not write event recording to {event_dir}: {e}")
+
+
 class _VideoCapture(cv2.VideoCapture):
     def __init__(self, *args, fps=None, **kwargs):
         super().__init__(*args, **kwargs)
@@ -50,12 +158,16 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
     CAP_PROP_FRAME_HEIGHT = 240
     CAP_FEED_PORT = "/video_reader/video_feed"
     CAP_FEED_CARRIER = ""
+    EVENT_TRIGGER_PORT = "/video_reader/event_trigger"
     SHOULD_WAIT = False
     JPG = False
 
     def __init__(self, cap_source=False, cap_feed_port=CAP_FEED_PORT, cap_feed_carrier=CAP_FEED_CARRIER,
                  headless=False, should_wait=False, multithreading=True, queue_size=10, force_resize=False, flip_vertical=False, flip_horizontal=False,
-                 jpg=JPG, img_width=CAP_PROP_FRAME_WIDTH, img_height=CAP_PROP_FRAME_HEIGHT, fps=30, mware=MWARE, **kwargs):
+                 jpg=JPG, img_width=CAP_PROP_FRAME_WIDTH, img_height=CAP_PROP_FRAME_HEIGHT, fps=30,
+                 pre_event_secs=0.0, post_event_secs=0.0, event_jpg=False, event_recording_dir="video_events",
+                 event_trigger_port=EVENT_TRIGGER_PORT, mjpeg_passthrough=False, timestamped=False, mware=MWARE,
+                 **kwargs):
         """
         :param cap_source: str: The source of the video stream. Can be a file path, a camera index, or a URL
         :param cap_feed_port: str: The port to publish the video stream to
@@ -71,6 +183,17 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
         :param img_width: int: Width of the video stream image
         :param img_height: int: Height of the video stream image
         :param fps: int: Frames per second of the video stream
+        :param pre_event_secs: float: Duration (in seconds) of the frames kept in memory preceding an event trigger.
+                                      Setting pre_event_secs or post_event_secs enables event recording
+        :param post_event_secs: float: Duration (in seconds) of the frames recorded following an event trigger
+        :param event_jpg: bool: Whether to JPEG compress the frames kept in memory for event recording
+        :param event_recording_dir: str: Directory in which the event recordings are stored
+        :param event_trigger_port: str: The port to receive event triggers from
+        :param mjpeg_passthrough: bool: Whether to request MJPEG frames from the camera and publish the compressed
+                                        frames untouched as native objects. Frames are only decoded when resizing,
+                                        flipping, or displaying them
+        :param timestamped: bool: Whether to publish the frames as native object image messages carrying the capture
+                                  timestamp of each frame. Implied by mjpeg_passthrough
         :param mware: str: Middleware to use for publishing the video stream
         """
 
@@ -81,11 +204,14 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
         self.CAP_FEED_CARRIER = cap_feed_carrier
         self.SHOULD_WAIT = should_wait
         self.JPG = jpg
+        self.EVENT_TRIGGER_PORT = event_trigger_port
 
         self.multithreading = multithreading
         self.force_resize = force_resize
         self.flip_vertical = flip_vertical
         self.flip_horizontal = flip_horizontal
+        self.mjpeg_passthrough = mjpeg_passthrough
+        self.timestamped = timestamped or mjpeg_passthrough
 
         if cap_source:
             cap_source = str_or_int(cap_source)
@@ -94,6 +220,13 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
         else:
             _VideoCapture.__init__(self, **kwargs)
 
+        if cap_source and mjpeg_passthrough:
+            self.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+            # video files (FFmpeg) return the raw packets when the format is set to -1, whereas cameras (V4L2) return
+            # the compressed frames when conversion is disabled. The format must be set first for FFmpeg
+            self.set(cv2.CAP_PROP_FORMAT, -1)
+            self.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
         if img_width:
             self.img_width = img_width
             self.set(cv2.CAP_PROP_FRAME_WIDTH, img_width)
@@ -116,9 +249,23 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
         self.cap_source = cap_source
 
         if cap_feed_port:
-            self.activate_communication(self.acquire_image, "publish")
+            if self.timestamped:
+                self.activate_communication(self.acquire_image_message, "publish")
+            else:
+                self.activate_communication(self.acquire_image, "publish")
+
+        if pre_event_secs or post_event_secs:
+            self.event_recorder = _EventRecorder(pre_event_secs, post_event_secs, self.fps,
+                                                 jpg=event_jpg, recording_dir=event_recording_dir)
+        else:
+            self.event_recorder = None
+        if self.event_recorder is not None and event_trigger_port:
+            self.activate_communication(self.receive_event_trigger, "listen")
+        else:
+            self.activate_communication(self.receive_event_trigger, "disable")
 
         self.last_img = None
+        self.last_timestamp = None
 
         if multithreading:
             self.queue = Queue(maxsize=queue_size)
@@ -136,6 +283,10 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
         VideoCapture.acquire_image.__defaults__ = (self.CAP_FEED_PORT, self.CAP_FEED_CARRIER,
                                                    self.CAP_PROP_FRAME_WIDTH, self.CAP_PROP_FRAME_HEIGHT,
                                                    self.JPG, self.SHOULD_WAIT, self.MWARE)
+        VideoCapture.acquire_image_message.__defaults__ = (self.CAP_FEED_PORT, self.CAP_FEED_CARRIER,
+                                                           self.CAP_PROP_FRAME_WIDTH, self.CAP_PROP_FRAME_HEIGHT,
+                                                           self.JPG, self.SHOULD_WAIT, self.MWARE)
+        VideoCapture.receive_event_trigger.__defaults__ = (self.EVENT_TRIGGER_PORT, self.MWARE)
 
     def update(self, **kwargs):
         while True:
@@ -148,7 +299,7 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
                 if not grabbed:
                     self.release(force=False)
 
-                self.queue.put(img)
+                self.queue.put((time.time(), img))
             else:
                 time.sleep(0.1)
 
@@ -171,13 +322,47 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
         :param _mware: str: Middleware to use for publishing the video stream
         """
 
+        img = self._acquire(img_width, img_height, **kwargs)
+        if _is_jpg(img):
+            img = self.decode(img)
+        return img,
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "VideoCapture", "$cap_feed_port",
+                                     carrier="$cap_feed_carrier", should_wait="$_should_wait")
+    def acquire_image_message(self, cap_feed_port=CAP_FEED_PORT, cap_feed_carrier=CAP_FEED_CARRIER,
+                              img_width=CAP_PROP_FRAME_WIDTH, img_height=CAP_PROP_FRAME_HEIGHT,
+                              _jpg=JPG, _should_wait=SHOULD_WAIT, _mware=MWARE, **kwargs):
+        """
+        Acquires an image from the video stream and publishes it as a native object to the specified port.
+        JPEG compressed frames (e.g., MJPEG cameras) are forwarded untouched unless resizing or flipping is needed.
+        :param cap_feed_port: str: The port to publish the video stream to
+        :param cap_feed_carrier: str: The mware-specific carrier to publish the video stream to (tcp, udp, mcast, ...)
+        :param img_width: int: Width of the video stream image
+        :param img_height: int: Height of the video stream image
+        :param _jpg: bool: Whether to JPEG compress uncompressed images before publishing them
+        :param _should_wait: bool: Whether to wait for a subscriber before publishing the video stream
+        :param _mware: str: Middleware to use for publishing the video stream
+        :return: dict: Image message with the JPEG compressed buffer or image (img) and the capture timestamp
+        """
+        img = self._acquire(img_width, img_height, **kwargs)
+        jpg = _is_jpg(img)
+        if _jpg and not jpg:
+            jpg, img = cv2.imencode(".jpg", img)
+        return {"topic": cap_feed_port.split("/")[-1],
+                "timestamp": self.last_timestamp if self.last_timestamp is not None else time.time(),
+                "img_width": img_width,
+                "img_height": img_height,
+                "jpg": bool(jpg),
+                "img": img},
+
+    def _acquire(self, img_width, img_height, **kwargs):
         if self.isOpened():
             if kwargs.get("_internal_call", False):
                 grabbed = kwargs.get("_grabbed", None)
                 img = kwargs.get("_img", None)
             else:
                 # capture the video stream from the camera/video
-                grabbed, img = self.read(_internal_call=True)
+                grabbed, img = self._read()
 
             if not grabbed:
                 logging.warning("video not grabbed")
@@ -185,40 +370,83 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
                     else self.last_img
             else:
                 if img is not None:
-                    if self.force_resize:
-                        img = cv2.resize(img, (img_width, img_height), interpolation=cv2.INTER_AREA)
-                    if self.flip_horizontal and self.flip_vertical:
-                        img = cv2.flip(img, -1)
-                    elif self.flip_horizontal:
-                        img = cv2.flip(img, 1)
-                    elif self.flip_vertical:
-                        img = cv2.flip(img, 0)
+                    if self.force_resize or self.flip_horizontal or self.flip_vertical:
+                        jpg = _is_jpg(img)
+                        if jpg:
+                            img = self.decode(img)
+                        if self.force_resize:
+                            img = cv2.resize(img, (img_width, img_height), interpolation=cv2.INTER_AREA)
+                        if self.flip_horizontal and self.flip_vertical:
+                            img = cv2.flip(img, -1)
+                        elif self.flip_horizontal:
+                            img = cv2.flip(img, 1)
+                        elif self.flip_vertical:
+                            img = cv2.flip(img, 0)
+                        if jpg:
+                            _, img = cv2.imencode(".jpg", img)
                     self.last_img = img
+                    if self.event_recorder is not None:
+                        self.event_recorder.append(self.last_timestamp, img)
                 else:
                     img = np.zeros((img_height, img_width, 3)) * 255
         else:
             logging.error("video capturer not opened")
             img = np.zeros((img_width, img_height, 3)) * 255
-        return img,
+        return img
+
+    @staticmethod
+    def decode(img):
+        """
+        Decodes JPEG compressed frames (e.g., MJPEG passthrough frames). Images are returned as is.
+        :param img: np.ndarray: JPEG compressed buffer or image
+        :return: np.ndarray: Decoded image
+        """
+        if _is_jpg(img):
+            return cv2.imdecode(img, cv2.IMREAD_COLOR)
+        return img
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "VideoCapture", "$event_trigger_port",
+                                     carrier="", should_wait=False)
+    def receive_event_trigger(self, event_trigger_port=EVENT_TRIGGER_PORT, _mware=MWARE, **kwargs):
+        """
+        Receives an event trigger for flushing the recorded frames surrounding the event to disk.
+        :param event_trigger_port: str: The port to receive event triggers from
+        :param _mware: str: Middleware to use for receiving the event triggers
+        :return: dict: Event trigger message e.g., a button press or an annotation
+        """
+        return None,
+
+    def trigger_event_recording(self, trigger=None):
+        """
+        Writes the frames kept in memory preceding the event, along with the frames following it, to disk.
+        The frames are written asynchronously once the post-event interval elapses.
+        :param trigger: dict: Event trigger message. The "label" (or "topic") key names the recording
+        """
+        if self.event_recorder is None:
+            logging.error("event recording disabled. Set pre_event_secs or post_event_secs to enable it")
+            return
+        trigger = trigger if isinstance(trigger, dict) else {"label": trigger}
+        self.event_recorder.trigger(label=trigger.get("label", None) or trigger.get("topic", None) or "event")
+
+    def _read(self, **kwargs):
+        if self.multithreading:
+            timestamp, img = self.queue.get()
+            grabbed = True
+        else:
+            grabbed, img = _VideoCapture.read(self, **kwargs)
+            timestamp = time.time()
+        self.last_timestamp = timestamp
+        return grabbed, img
 
     def read(self, **kwargs):
         if kwargs.get("_internal_call", False):
             del kwargs["_internal_call"]
-            if self.multithreading:
-                grabbed, img = True, self.queue.get()
-            else:
-                grabbed, img = super().read(**kwargs)
+            grabbed, img = self._read(**kwargs)
             return grabbed, img
         else:
-            if self.multithreading:
-                grabbed, img = True, self.queue.get()
-            else:
-                grabbed, img = super().read(**kwargs)
+            grabbed, img = self._read(**kwargs)
             if grabbed:
-                img, = self.acquire_image(cap_feed_port=self.CAP_FEED_PORT, cap_feed_carrier=self.CAP_FEED_CARRIER,
-                                          img_width=self.img_width, img_height=self.img_height,
-                                          _internal_call=True, _grabbed=grabbed, _img=img,
-                                          _jpg=self.JPG, _mware=self.MWARE, _should_wait=self.SHOULD_WAIT)
+                img = self._publish(grabbed, img)
             return grabbed, img
 
     def retrieve(self, **kwargs):
@@ -227,11 +455,23 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
             return grabbed, img
         else:
             grabbed, img = super().retrieve(**kwargs)
+            self.last_timestamp = time.time()
+            img = self._publish(grabbed, img)
+            return grabbed, img
+
+    def _publish(self, grabbed, img):
+        if self.timestamped:
+            img_msg, = self.acquire_image_message(cap_feed_port=self.CAP_FEED_PORT, cap_feed_carrier=self.CAP_FEED_CARRIER,
+                                                  img_width=self.img_width, img_height=self.img_height,
+                                                  _internal_call=True, _grabbed=grabbed, _img=img,
+                                                  _jpg=self.JPG, _mware=self.MWARE, _should_wait=self.SHOULD_WAIT)
+            return img_msg["img"]
+        else:
             img, = self.acquire_image(cap_feed_port=self.CAP_FEED_PORT, cap_feed_carrier=self.CAP_FEED_CARRIER,
                                       img_width=self.img_width, img_height=self.img_height,
                                       _internal_call=True, _grabbed=grabbed, _img=img,
                                       _jpg=self.JPG, _mware=self.MWARE, _should_wait=self.SHOULD_WAIT)
-            return grabbed, img
+            return img
 
     def getPeriod(self):
         """
@@ -244,12 +484,16 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
         _, img = self.read()
         if not self.headless:
             if img is not None:
-                cv2.imshow("VideoCapture", img)
+                cv2.imshow("VideoCapture", self.decode(img))
                 k = cv2.waitKey(int(self.getPeriod()*1000))
                 if k == 27:  # Esc key to exit
                     exit(0)
                 elif k == -1:  # normally -1 returned,so don"t print it
                     pass
+        if self.event_recorder is not None:
+            trigger, = self.receive_event_trigger(event_trigger_port=self.EVENT_TRIGGER_PORT, _mware=self.MWARE)
+            if trigger is not None:
+                self.trigger_event_recording(trigger)
 
         return True
 
@@ -281,6 +525,9 @@ class VideoCapture(MiddlewareCommunicator, _VideoCapture):
                     self.thread.join()
         else:
             super().release()
+        # the events still recording are written with the frames captured so far
+        if getattr(self, "event_recorder", None) is not None:
+            self.event_recorder.close()
 
 
 class VideoCaptureReceiver(VideoCapture):
@@ -294,7 +541,8 @@ class VideoCaptureReceiver(VideoCapture):
 
     def __init__(self, cap_feed_port=CAP_FEED_PORT, cap_feed_carrier=CAP_FEED_CARRIER,
                  headless=False, should_wait=SHOULD_WAIT, multithreading=False, jpg=JPG,
-                 img_width=CAP_PROP_FRAME_WIDTH, img_height=CAP_PROP_FRAME_HEIGHT, fps=30, mware=MWARE, **kwargs):
+                 img_width=CAP_PROP_FRAME_WIDTH, img_height=CAP_PROP_FRAME_HEIGHT, fps=30,
+                 mjpeg_passthrough=False, timestamped=False, mware=MWARE, **kwargs):
         """
         Receives a video stream from the specified port and displays it.
         :param cap_feed_port: str: The port to receive the video stream from
@@ -306,6 +554,10 @@ class VideoCaptureReceiver(VideoCapture):
         :param img_width: int: Width of the video stream image
         :param img_height: int: Height of the video stream image
         :param fps: int: Frames per second of the video stream
+        :param mjpeg_passthrough: bool: Whether to receive native object image messages (published with
+                                        mjpeg_passthrough) and decode the compressed frames on reception
+        :param timestamped: bool: Whether to receive native object image messages (published with timestamped) and
+                                  keep the capture timestamp of the last received frame (last_timestamp)
         :param mware: str: Middleware to use for receiving the video stream
         """
 
@@ -318,6 +570,8 @@ class VideoCaptureReceiver(VideoCapture):
         self.CAP_FEED_CARRIER = cap_feed_carrier
         self.SHOULD_WAIT = should_wait
         self.JPG = jpg
+        self.mjpeg_passthrough = mjpeg_passthrough
+        self.timestamped = timestamped or mjpeg_passthrough
 
         if img_width:
             self.img_width = img_width
@@ -352,7 +606,10 @@ class VideoCaptureReceiver(VideoCapture):
 
         # control the listening properties from within the app
         if cap_feed_port:
-            self.activate_communication(self.acquire_image, "listen")
+            if self.timestamped:
+                self.activate_communication(self.acquire_image_message, "listen")
+            else:
+                self.activate_communication(self.acquire_image, "listen")
 
         self.opened = True
 
@@ -362,11 +619,20 @@ class VideoCaptureReceiver(VideoCapture):
         VideoCaptureReceiver.acquire_image.__defaults__ = (self.CAP_FEED_PORT, self.CAP_FEED_CARRIER,
                                                            self.CAP_PROP_FRAME_WIDTH, self.CAP_PROP_FRAME_HEIGHT,
                                                            self.JPG, self.SHOULD_WAIT, self.MWARE)
+        VideoCaptureReceiver.acquire_image_message.__defaults__ = (self.CAP_FEED_PORT, self.CAP_FEED_CARRIER,
+                                                                   self.CAP_PROP_FRAME_WIDTH, self.CAP_PROP_FRAME_HEIGHT,
+                                                                   self.JPG, self.SHOULD_WAIT, self.MWARE)
 
     def retrieve(self, **kwargs):
         try:
             frame_index = self.cap_props["fpos"]
-            im, = self.acquire_image(**self.cap_props)
+            if self.timestamped:
+                im_msg, = self.acquire_image_message(**self.cap_props)
+                im = self.decode(im_msg["img"]) if im_msg is not None else None
+                if im_msg is not None:
+                    self.last_timestamp = im_msg["timestamp"]
+            else:
+                im, = self.acquire_image(**self.cap_props)
             self.opened = True
             self.cap_props["fpos"] = frame_index + 1
             self.cap_props["fpos_msec"] = self.cap_props["fpos_msec"] + (frame_index + 1) * self.cap_props["msec"]
@@ -394,7 +660,7 @@ class VideoCaptureReceiver(VideoCapture):
         return self.cap_props[self.properties[propId]]
 
 
-def parse_args():
+def get_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument("--headless", action="store_true", help="Disable CV2 GUI")
     parser.add_argument("--mware", type=str, default=CAMERA_DEFAULT_COMMUNICATOR,
@@ -405,6 +671,11 @@ def parse_args():
     parser.add_argument("--queue_size", type=int, default=10, help="Queue size for multithreading")
     parser.add_argument("--force_resize", action="store_true", help="Force resizing video width and height on publishing")
     parser.add_argument("--jpg", action="store_true", help="Listen for or publish image as JPEG for lossy image transfer")
+    parser.add_argument("--mjpeg_passthrough", action="store_true",
+                        help="Request MJPEG frames from the camera and publish (or listen for) the compressed frames "
+                             "without decoding and re-encoding them. Frames are transmitted as native objects")
+    parser.add_argument("--timestamped", action="store_true",
+                        help="Publish (or listen for) frames as native objects carrying their capture timestamps")
     parser.add_argument("--flip_vertical", action="store_true", help="Flip image vertically on publishing")
     parser.add_argument("--flip_horizontal", action="store_true", help="Flip image horizontally on publishing")
     parser.add_argument("--cap_feed_port", type=str, default="/video_reader/video_feed",
@@ -417,8 +688,23 @@ def parse_args():
     parser.add_argument("--img_width", type=int, default=1280, help="The image width")
     parser.add_argument("--img_height", type=int, default=720, help="The image height")
     parser.add_argument("--fps", type=int, default=30, help="The video frames per second")
+    parser.add_argument("--pre_event_secs", type=float, default=0.0,
+                        help="Duration (in seconds) of the frames kept in memory preceding an event trigger. "
+                             "Setting --pre_event_secs or --post_event_secs enables event recording on publishing")
+    parser.add_argument("--post_event_secs", type=float, default=0.0,
+                        help="Duration (in seconds) of the frames recorded following an event trigger")
+    parser.add_argument("--event_jpg", action="store_true",
+                        help="JPEG compress the frames kept in memory for event recording")
+    parser.add_argument("--event_recording_dir", type=str, default="video_events",
+                        help="The directory in which event recordings are stored")
+    parser.add_argument("--event_trigger_port", type=str, default=VideoCapture.EVENT_TRIGGER_PORT,
+                        help="The middleware port for receiving event triggers (e.g., button presses or annotations)")
 
-    return parser.parse_args()
+    return parser
+
+
+def parse_args():
+    return get_parser().parse_args()
 
 
 if __name__ == "__main__":
@@ -255,7 +255,7 @@ class ICub(MiddlewareCommunicator, yarp.RFModule):
             else:
                 self.activate_communication(self.acquire_eye_coordinates, "listen")
         if gaze_plane_coordinates_port:
-            self.activate_communication(self.control_gaze_at_plane, "listen")
+            self.activate_communication(self.receive_gaze_plane_coordinates, "listen")
 
         self.build()
 
@@ -859,10 +859,10 @@ class ICub(MiddlewareCommunicator, yarp.RFModule):
 
             if move_robot.get("reset_gaze", False):
                 self.reset_gaze()
-            self.control_gaze_plane_coordinates(x=move_robot.get("x", 0.0), y=move_robot.get("y", 0.0),
-                                                limit_x=move_robot.get("limit_x", 0.3), limit_y=move_robot.get("limit_y", 0.3),
-                                                control_head=move_robot.get("control_head", False if not self.ikingaze else True),
-                                                control_eyes=move_robot.get("control_eyes", True), _mware=self.MWARE),
+            self.control_gaze_at_plane(x=move_robot.get("x", 0.0), y=move_robot.get("y", 0.0),
+                                       limit_x=move_robot.get("limit_x", 0.3), limit_y=move_robot.get("limit_y", 0.3),
+                                       control_head=move_robot.get("control_head", False if not self.ikingaze else True),
+                                       control_eyes=move_robot.get("control_eyes", True), _mware=self.MWARE)
 
         return True
 
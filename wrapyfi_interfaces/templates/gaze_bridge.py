@@ -0,0 +1,225 @@
+import time
+import argparse
+import logging
+
+import numpy as np
+
+from wrapyfi.connect.wrapper import MiddlewareCommunicator, DEFAULT_COMMUNICATOR
+from wrapyfi_interfaces.utils.gaze import ConstantVelocityExtrapolator
+
+
+class GazeBridgeInterface(MiddlewareCommunicator):
+    """
+    Receive gaze coordinates (e.g. from the PupilCore interface) and broadcast them as gaze plane coordinates (e.g. to
+    the ICub interface) using middleware of choice.
+    This template acts as a bridge between different middleware and/or ports (topics), compensating for the latency of
+    the pipeline: the gaze is extrapolated with a constant-velocity model by the measured transport latency, the time
+    since the latest gaze was received, and a fixed latency offset (e.g. the eye tracking and robot actuation delays).
+    The gaze plane coordinates are published at most once per control period of the robot.
+    """
+
+    PORT_OUT = "/control_interface/gaze_plane_coordinates"
+    MWARE_OUT = DEFAULT_COMMUNICATOR
+    PORT_IN = "/control_interface/gaze_coordinates"
+    MWARE_IN = DEFAULT_COMMUNICATOR
+    SHOULD_WAIT = False
+
+    def __init__(self,
+                 gaze_plane_coordinates_port_out=PORT_OUT,
+                 mware_out=MWARE_OUT,
+                 gaze_coordinates_port_in=PORT_IN,
+                 mware_in=MWARE_IN, should_wait=SHOULD_WAIT,
+                 control_period=0.05, latency_offset=0.0, max_lookahead=0.3, velocity_time_constant=0.05,
+                 max_gap=0.25, latency_smoothing=0.1, limit_x=None, limit_y=None):
+        """
+        :param gaze_plane_coordinates_port_out: str: Port (topic) to publish the gaze plane coordinates to
+        :param mware_out: str: Middleware to publish the gaze plane coordinates
+        :param gaze_coordinates_port_in: str: Port (topic) to receive the gaze coordinates from
+        :param mware_in: str: Middleware to receive the gaze coordinates
+        :param should_wait: bool: Whether to wait for at least one listener before publishing or a publisher before
+                                  listening
+        :param control_period: float: Minimum time (in seconds) between the published gaze plane coordinates
+        :param latency_offset: float: Latency (in seconds) added to the measured transport latency
+        :param max_lookahead: float: Maximum time (in seconds) to extrapolate the gaze ahead of the latest sample
+        :param velocity_time_constant: float: Time constant (in seconds) of the gaze velocity smoothing
+        :param max_gap: float: Maximum time (in seconds) between gaze samples to estimate the velocity from. No gaze
+                               plane coordinates are published when no gaze was received for longer
+        :param latency_smoothing: float: Smoothing factor of the measured transport latency. 1 disables smoothing
+        :param limit_x: float->limit_x[0,1]: x coordinate limit in the plane passed to the robot. None for its default
+        :param limit_y: float->limit_y[0,1]: y coordinate limit in the plane passed to the robot. None for its default
+        """
+        super(GazeBridgeInterface, self).__init__()
+
+        self.SHOULD_WAIT = should_wait
+        if gaze_plane_coordinates_port_out and mware_out:
+            self.PORT_OUT = gaze_plane_coordinates_port_out
+            self.MWARE_OUT = mware_out
+            self.activate_communication("transmit_gaze_plane_coordinates", "publish")
+
+        if gaze_coordinates_port_in and mware_in:
+            self.PORT_IN = gaze_coordinates_port_in
+            self.MWARE_IN = mware_in
+            self.activate_communication("receive_gaze_coordinates", "listen")
+
+        self.control_period = control_period
+        self.latency_offset = latency_offset
+        self.max_gap = max_gap
+        self.latency_smoothing = latency_smoothing
+        self.limit_x = limit_x
+        self.limit_y = limit_y
+
+        self.extrapolator = ConstantVelocityExtrapolator(time_constant=velocity_time_constant, max_gap=max_gap,
+                                                         max_lookahead=max_lookahead)
+        self.latency = None
+        self.last_received = None
+        self.last_transmitted = None
+        self.build()
+
+    def build(self):
+        """
+        Updates the default method arguments according to constructor arguments. This method is called by the module constructor.
+        It is not necessary to call it manually.
+        """
+        GazeBridgeInterface.transmit_gaze_plane_coordinates.__defaults__ = (0.0, 0.0, self.PORT_OUT, self.SHOULD_WAIT, self.MWARE_OUT)
+        GazeBridgeInterface.receive_gaze_coordinates.__defaults__ = (self.PORT_IN, self.SHOULD_WAIT, self.MWARE_IN)
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "GazeBridgeInterface",
+                                     "$gaze_plane_coordinates_port", should_wait="$_should_wait")
+    def transmit_gaze_plane_coordinates(self, x=0.0, y=0.0, gaze_plane_coordinates_port=PORT_OUT,
+                                        _should_wait=SHOULD_WAIT, _mware=MWARE_OUT, **kwargs):
+        """
+        Publishes the gaze plane coordinates to the middleware.
+        :param x: float->x[-1,1]: x coordinate in the plane limited to the range of -1 (left) and 1 (right)
+        :param y: float->y[-1,1]: y coordinate in the plane limited to the range of -1 (bottom) and 1 (top)
+        :param gaze_plane_coordinates_port: str: Port to publish the gaze plane coordinates to
+        :param _should_wait: bool: Whether to wait for a response
+        :param _mware: str: Middleware to use
+        :kwargs: dict: Additional parameters specific to an application e.g. limit_x, limit_y, or the latency
+        :return: dict: Gaze plane coordinates for a given time step
+        """
+        return {"topic": gaze_plane_coordinates_port.split("/")[-1],
+                **kwargs,
+                "x": x,
+                "y": y,
+                "timestamp": kwargs.get("timestamp", time.time())},
+
+    @MiddlewareCommunicator.register("NativeObject", "$_mware", "GazeBridgeInterface",
+                                     "$gaze_coordinates_port", should_wait="$_should_wait")
+    def receive_gaze_coordinates(self, gaze_coordinates_port=PORT_IN, _should_wait=SHOULD_WAIT, _mware=MWARE_IN,
+                                 **kwargs):
+        """
+        Receives the gaze coordinates from the middleware of choice.
+        :param gaze_coordinates_port: str: Port to receive the gaze coordinates from
+        :param _should_wait: bool: Whether to wait for a response
+        :param _mware: str: Middleware to use
+        :return: dict: Gaze coordinates for a given time step
+        """
+        return None,
+
+    def update_gaze(self, gaze, received_time):
+        """
+        Adds a gaze sample to the gaze model. The yaw and pitch angles are projected onto a plane at unit distance,
+        which equals the normalized gaze position (scaled to [-1, 1]) for gaze from fixation messages.
+        :param gaze: dict: Gaze coordinates with the yaw and pitch angles (in degrees), the time (orig_timestamp) of the
+                           sample on the eye tracker clock, and the time (timestamp) it was published
+        :param received_time: float: Time the gaze coordinates were received
+        """
+        try:
+            position = np.tan(np.deg2rad((gaze["yaw"], gaze["pitch"])))
+            timestamp = gaze.get("orig_timestamp", gaze["timestamp"])
+        except (KeyError, TypeError):
+            return
+        self.extrapolator.update(timestamp, position)
+        # the transport latency assumes the clocks of the publishing and receiving machines to be synchronized
+        latency = max(received_time - gaze.get("timestamp", received_time), 0.0)
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.latency_smoothing * (latency - self.latency)
+        self.last_received = received_time
+
+    def getPeriod(self):
+        """
+        Get the period of the module.
+        :return: float: Period of the module
+        """
+        return 0.005
+
+    def updateModule(self):
+        gaze_in, = self.receive_gaze_coordinates(gaze_coordinates_port=self.PORT_IN,
+                                                 _should_wait=self.SHOULD_WAIT,
+                                                 _mware=self.MWARE_IN)
+        while gaze_in is not None:
+            received_time = time.time()
+            # batches of gaze samples list all samples of the batch
+            for gaze in gaze_in.get("samples", [gaze_in]) if isinstance(gaze_in, dict) else ():
+                self.update_gaze(gaze, received_time)
+            gaze_in, = self.receive_gaze_coordinates(gaze_coordinates_port=self.PORT_IN,
+                                                     _should_wait=False,
+                                                     _mware=self.MWARE_IN)
+
+        now = time.time()
+        if self.last_received is None or now - self.last_received > self.max_gap:
+            time.sleep(self.getPeriod())
+            return
+        if self.last_transmitted is not None and now - self.last_transmitted < self.control_period:
+            time.sleep(min(self.getPeriod(), self.control_period - (now - self.last_transmitted)))
+            return
+
+        lookahead = self.latency + (now - self.last_received) + self.latency_offset
+        x, y = np.clip(self.extrapolator.predict(lookahead), -1.0, 1.0)
+        limits = {key: value for key, value in (("limit_x", self.limit_x), ("limit_y", self.limit_y))
+                  if value is not None}
+        gaze_out, = self.transmit_gaze_plane_coordinates(x=float(x), y=float(y),
+                                                         latency=self.latency, lookahead=lookahead,
+                                                         orig_timestamp=self.extrapolator.timestamp, **limits,
+                                                         gaze_plane_coordinates_port=self.PORT_OUT,
+                                                         _should_wait=self.SHOULD_WAIT,
+                                                         _mware=self.MWARE_OUT)
+        self.last_transmitted = now
+        if gaze_out is not None:
+            logging.info(f"Sent gaze plane coordinates: {gaze_out}")
+
+    def runModule(self):
+        while True:
+            try:
+                self.updateModule()
+            except:
+                break
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gaze_plane_coordinates_port_out", type=str, default=GazeBridgeInterface.PORT_OUT,
+                        help="Port (topic) to publish gaze plane coordinates")
+    parser.add_argument("--mware_out", type=str, default=DEFAULT_COMMUNICATOR,
+                        help="Middleware to publish gaze plane coordinates",
+                        choices=MiddlewareCommunicator.get_communicators())
+    parser.add_argument("--gaze_coordinates_port_in", type=str, default=GazeBridgeInterface.PORT_IN,
+                        help="Port (topic) to listen to gaze coordinates")
+    parser.add_argument("--mware_in", type=str, default=DEFAULT_COMMUNICATOR,
+                        help="Middleware to listen to gaze coordinates",
+                        choices=MiddlewareCommunicator.get_communicators())
+    parser.add_argument("--should_wait", action="store_true", help="Wait for at least one listener before publishing "
+                                                                   "or a publisher before listening")
+    parser.add_argument("--control_period", type=float, default=0.05,
+                        help="Minimum time (in seconds) between the published gaze plane coordinates, i.e. the "
+                             "control period of the robot")
+    parser.add_argument("--latency_offset", type=float, default=0.0,
+                        help="Latency (in seconds) not covered by the measured transport latency, e.g. the eye "
+                             "tracking and robot actuation delays, by which the gaze is extrapolated additionally")
+    parser.add_argument("--max_lookahead", type=float, default=0.3,
+                        help="Maximum time (in seconds) to extrapolate the gaze ahead of the latest sample")
+    parser.add_argument("--velocity_time_constant", type=float, default=0.05,
+                        help="Time constant (in seconds) of the gaze velocity smoothing")
+    parser.add_argument("--max_gap", type=float, default=0.25,
+                        help="Maximum time (in seconds) between gaze samples to estimate the velocity from")
+    parser.add_argument("--limit_x", type=float, default=None, help="x coordinate limit in the plane of the robot")
+    parser.add_argument("--limit_y", type=float, default=None, help="y coordinate limit in the plane of the robot")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    gaze_bridge = GazeBridgeInterface(**vars(args))
+    gaze_bridge.runModule()
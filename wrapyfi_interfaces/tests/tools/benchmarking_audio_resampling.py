@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+import scipy.signal
+
+from wrapyfi_interfaces.utils.audio import PolyphaseResampler
+
+"""
+Benchmark of the streaming polyphase resampler used for the audio interface output formats
+(wrapyfi_interfaces/io/audio/interface.py) against resampling each block independently with scipy.signal.resample
+(FFT-based) and scipy.signal.resample_poly. A multi-tone test signal is resampled block by block, and the processing
+time per second of audio along with the signal-to-noise ratio against the analytically resampled signal are reported.
+Blockwise resampling without state introduces discontinuities at block boundaries which lower the SNR.
+Run:
+    python3 benchmarking_audio_resampling.py
+    python3 benchmarking_audio_resampling.py --conversions 44100:16000 --chunks 256 1024 --channels 2 --secs 30
+"""
+
+TONES = (220.0, 440.0, 1000.0, 3000.0)
+
+
+def generate_signal(rate, channels, secs, delay=0.0):
+    t = np.arange(int(rate * secs)) / rate - delay
+    mono = sum(np.sin(2 * np.pi * freq * t + idx) for idx, freq in enumerate(TONES)) / (2 * len(TONES))
+    return np.repeat(mono[:, None], channels, axis=1).astype(np.float32)
+
+
+def snr_db(output, reference, margin):
+    length = min(len(output), len(reference)) - margin
+    error = output[margin:length, 0] - reference[margin:length, 0]
+    return float(10 * np.log10(np.mean(reference[margin:length, 0] ** 2) / np.mean(error ** 2)))
+
+
+def run_blockwise(method, aud, in_rate, out_rate, channels, chunk):
+    gcd = np.gcd(in_rate, out_rate)
+    up, down = out_rate // gcd, in_rate // gcd
+    if method == "polyphase":
+        resampler = PolyphaseResampler(in_rate, out_rate, channels, 1, max_chunk=chunk)
+    outputs = []
+    produced = 0
+    start_time = time.perf_counter()
+    for start in range(0, len(aud), chunk):
+        block = aud[start:start + chunk]
+        if method == "polyphase":
+            outputs.append(resampler.process(block).copy())
+        else:
+            # the number of output samples follows the rate ratio without accumulating rounding errors
+            frames = (start + len(block)) * up // down - produced
+            mono = block.mean(axis=1)
+            if method == "scipy_resample":
+                outputs.append(scipy.signal.resample(mono, frames)[:, None])
+            else:
+                outputs.append(scipy.signal.resample_poly(mono, up, down)[:frames, None])
+            produced += frames
+    elapsed = time.perf_counter() - start_time
+    delay = resampler.delay / in_rate if method == "polyphase" else 0.0
+    return np.concatenate(outputs), elapsed, delay
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversions", type=str, default=["44100:16000", "48000:16000", "16000:48000"], nargs="+",
+                        help="The sampling rate conversions formatted as <input rate>:<output rate>")
+    parser.add_argument("--chunks", type=int, default=[256, 1024, 4096], nargs="+",
+                        help="The numbers of frames per input block")
+    parser.add_argument("--channels", type=int, default=2, help="The number of input channels (mixed to mono)")
+    parser.add_argument("--secs", type=float, default=20.0, help="The duration (in seconds) of the test signal")
+    parser.add_argument("--methods", type=str, default=["polyphase", "scipy_resample", "scipy_resample_poly"],
+                        choices=["polyphase", "scipy_resample", "scipy_resample_poly"], nargs="+",
+                        help="The resampling methods to benchmark")
+    parser.add_argument("--results_dir", type=str, default="results", help="Directory to store the CSV and JSON results")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.makedirs(args.results_dir, exist_ok=True)
+
+    results = []
+    for conversion in args.conversions:
+        in_rate, out_rate = (int(rate) for rate in conversion.split(":"))
+        aud = generate_signal(in_rate, args.channels, args.secs)
+        for chunk in args.chunks:
+            for method in args.methods:
+                output, elapsed, delay = run_blockwise(method, aud, in_rate, out_rate, args.channels, chunk)
+                reference = generate_signal(out_rate, 1, args.secs, delay=delay)
+                result = {"method": method,
+                          "in_rate": in_rate,
+                          "out_rate": out_rate,
+                          "channels": args.channels,
+                          "chunk": chunk,
+                          "ms_per_audio_sec": elapsed / args.secs * 1000.0,
+                          "us_per_block": elapsed / int(np.ceil(len(aud) / chunk)) * 1e6,
+                          "realtime_factor": args.secs / elapsed,
+                          "snr_db": snr_db(output, reference, margin=out_rate // 10)}
+                print(json.dumps(result))
+                results.append(result)
+
+    results_name = os.path.join(args.results_dir, "benchmarking_audio_resampling")
+    pd.DataFrame(results).to_csv(f"{results_name}.csv", index=False)
+    with open(f"{results_name}.json", "w") as results_file:
+        json.dump(results, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import msgpack as serializer
+
+from wrapyfi_interfaces.tests.tools.pupil_capture_mock import PupilCaptureMock, FRAME_FORMATS
+
+"""
+Offline latency and throughput benchmark for the PupilCore interface (wrapyfi_interfaces/eye_trackers/pupil_core/interface.py)
+against the local Pupil Capture mock (pupil_capture_mock.py), so no Pupil hardware or software is needed. The mock
+and the interface run in separate processes. The latency of each stream is measured from the Pupil timestamp of a
+message to the end of its parsing (gaze) or decoding (frames) by the interface, with the mock running on the local
+monotonic clock. The update duration of the interface's main loop is reported as well, along with the decoding time
+and bandwidth of each camera stream. The mock publishes JPEG frames until the interface selects the benchmarked frame
+format through the Frame Publisher, except for the raw format (bgr world and gray eye frames) which the mock publishes
+from the start. The frame_formats mode compares the decoding cost against the bandwidth of each frame format, decoding
+every frame on the decoding threads.
+Run:
+    # Benchmark the default configurations
+    python3 benchmarking_pupil_core.py
+    # Benchmark the gaze consumption modes of fixation messages without the eye cameras
+    python3 benchmarking_pupil_core.py --gaze_message_types fixation --frame_formats jpeg --streams world
+    # Compare the decoding cost against the bandwidth of the frame formats
+    python3 benchmarking_pupil_core.py --mode frame_formats
+"""
+
+STREAMS = ("gaze", "world", "right", "left")
+
+
+def run_mock(mock_kwargs, ready, stop, result_queue):
+    mock = PupilCaptureMock(**mock_kwargs).start()
+    ready.set()
+    stop.wait()
+    result_queue.put(mock.stats())
+    mock.stop()
+
+
+def run_interface(port, config, streams, duration, warmup, result_queue):
+    from wrapyfi_interfaces.eye_trackers.pupil_core.interface import PupilCore
+
+    pupil = PupilCore(tcp_ip="127.0.0.1", tcp_port=port, headless=True,
+                      get_cam_world_feed="world" in streams, get_cam_right_feed="right" in streams,
+                      get_cam_left_feed="left" in streams, cam_world_port="", cam_right_port="", cam_left_port="",
+                      gaze_message_type=config["gaze_message_type"], gaze_coordinates_port="", min_gaze_confidence=0.0,
+                      gaze_consumption=config["gaze_consumption"], frame_consumption=config["frame_consumption"],
+                      frame_decoding_threads=config["frame_decoding_threads"],
+                      frame_format=None if config["frame_format"] == "raw" else config["frame_format"],
+                      recording_message_port="", annotations_port="", annotation_keys=())
+
+    # the parsing and decoding of the interface are wrapped to timestamp each processed message
+    latencies = {stream: [] for stream in STREAMS}
+    decode_times = {stream: [] for stream in STREAMS}
+    frame_sizes = {stream: [] for stream in STREAMS}
+    parse_gaze, decode_frame = pupil._parse_gaze, pupil._decode_frame
+
+    def timed_parse_gaze(message):
+        gaze = parse_gaze(message)
+        if gaze is not None:
+            latencies["gaze"].append(time.monotonic() - gaze["orig_timestamp"])
+        return gaze
+
+    def timed_decode_frame(stream, message, *args, **kwargs):
+        decode_start_time = time.perf_counter()
+        img = decode_frame(stream, message, *args, **kwargs)
+        decode_times[stream].append(time.perf_counter() - decode_start_time)
+        latencies[stream].append(time.monotonic() - serializer.loads(message[1])["timestamp"])
+        frame_sizes[stream].append(len(message[2]))
+        return img
+
+    pupil._parse_gaze, pupil._decode_frame = timed_parse_gaze, timed_decode_frame
+
+    update_times = []
+    start_time = time.monotonic()
+    measuring = False
+    while time.monotonic() - start_time < warmup + duration:
+        if not measuring and time.monotonic() - start_time >= warmup:
+            measuring = True
+            for stream_measurements in itertools.chain(latencies.values(), decode_times.values(),
+                                                       frame_sizes.values()):
+                stream_measurements.clear()
+            skipped = dict(pupil.skipped)
+        update_start_time = time.perf_counter()
+        pupil.updateModule()
+        if measuring:
+            update_times.append(time.perf_counter() - update_start_time)
+
+    result = {"update_times": update_times,
+              "latencies": {stream: list(stream_latencies) for stream, stream_latencies in latencies.items()},
+              "decode_times": {stream: list(stream_times) for stream, stream_times in decode_times.items()},
+              "frame_sizes": {stream: list(stream_sizes) for stream, stream_sizes in frame_sizes.items()},
+              "skipped": {stream: pupil.skipped[stream] - skipped.get(stream, 0) for stream in pupil.skipped}}
+    result_queue.put(result)
+
+
+def run_configuration(ctx, port, config, streams, rates, duration, warmup, timeout):
+    mock_kwargs = dict(port=port, frame_format="raw" if config["frame_format"] == "raw" else "jpeg",
+                       gaze_rate=rates["gaze"] if config["gaze_message_type"] == "gaze.3d" else 0.0,
+                       fixation_rate=rates["gaze"] if config["gaze_message_type"] == "fixation" else 0.0,
+                       world_rate=rates["world"] if "world" in streams else 0.0,
+                       eye_rate=rates["eye"] if "right" in streams or "left" in streams else 0.0)
+    ready, stop = ctx.Event(), ctx.Event()
+    mock_queue, interface_queue = ctx.Queue(), ctx.Queue()
+    mock = ctx.Process(target=run_mock, args=(mock_kwargs, ready, stop, mock_queue))
+    mock.start()
+    ready.wait(timeout)
+    interface = ctx.Process(target=run_interface, args=(port, config, streams, duration, warmup, interface_queue))
+    interface.start()
+    try:
+        measurements = interface_queue.get(timeout=timeout)
+    finally:
+        stop.set()
+    mock_stats = mock_queue.get(timeout=timeout)
+    for proc in (interface, mock):
+        proc.join(5.0)
+        if proc.is_alive():
+            proc.terminate()
+
+    result = dict(config)
+    update_times = np.array(measurements["update_times"]) * 1000.0
+    result.update(updates=len(update_times),
+                  update_p50_ms=float(np.percentile(update_times, 50)) if len(update_times) else None,
+                  update_p99_ms=float(np.percentile(update_times, 99)) if len(update_times) else None,
+                  update_max_ms=float(np.max(update_times)) if len(update_times) else None)
+    for stream in STREAMS:
+        if stream != "gaze" and stream not in streams:
+            continue
+        stream_latencies = np.array(measurements["latencies"][stream]) * 1000.0
+        sent_rate = rates["gaze"] if stream == "gaze" else rates["world" if stream == "world" else "eye"]
+        result[f"{stream}_sent_hz"] = sent_rate
+        result[f"{stream}_processed_hz"] = len(stream_latencies) / duration
+        result[f"{stream}_skipped"] = measurements["skipped"].get(stream, 0)
+        for name, value in zip(("latency_mean_ms", "latency_p50_ms", "latency_p99_ms", "latency_max_ms"),
+                               (np.mean, lambda l: np.percentile(l, 50), lambda l: np.percentile(l, 99), np.max)):
+            result[f"{stream}_{name}"] = float(value(stream_latencies)) if len(stream_latencies) else None
+        if stream == "gaze":
+            continue
+        decode_times = np.array(measurements["decode_times"][stream]) * 1000.0
+        frame_sizes = np.array(measurements["frame_sizes"][stream], dtype=np.float64)
+        result[f"{stream}_decode_mean_ms"] = float(np.mean(decode_times)) if len(decode_times) else None
+        result[f"{stream}_decode_p99_ms"] = float(np.percentile(decode_times, 99)) if len(decode_times) else None
+        result[f"{stream}_frame_kb"] = float(np.mean(frame_sizes)) / 1024.0 if len(frame_sizes) else None
+        # the bandwidth of all frames sent, including the frames skipped by the interface
+        result[f"{stream}_bandwidth_mbps"] = float(np.mean(frame_sizes)) * 8.0 * sent_rate / 1e6 \
+            if len(frame_sizes) else None
+    result["mock_sent"] = mock_stats["sent"]
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", type=str, default="latency", choices=("latency", "frame_formats"),
+                        help="Benchmark all combinations of the given configurations (latency), or compare the frame "
+                             "formats only, consuming the newest gaze sample and every frame on the decoding threads "
+                             "(frame_formats)")
+    parser.add_argument("--port", type=int, default=50320,
+                        help="The first Pupil Remote port of the mock. Each configuration uses the next three ports")
+    parser.add_argument("--gaze_message_types", type=str, default=["gaze.3d"], choices=("fixation", "gaze.3d"),
+                        nargs="+", help="The gaze message types to benchmark")
+    parser.add_argument("--gaze_consumptions", type=str, default=["all", "latest", "batch"], nargs="+",
+                        choices=("all", "latest", "batch"), help="The gaze consumption modes to benchmark")
+    parser.add_argument("--frame_consumptions", type=str, default=["latest"], nargs="+", choices=("all", "latest"),
+                        help="The frame consumption modes to benchmark")
+    parser.add_argument("--frame_formats", type=str, default=list(FRAME_FORMATS), nargs="+", choices=FRAME_FORMATS,
+                        help="The frame formats selected by the interface. The raw format is published by the mock "
+                             "from the start instead")
+    parser.add_argument("--frame_decoding_threads", type=int, default=[0, 1], choices=[0, 1], nargs="+",
+                        help="Decode frames on the main loop (0) and/or the frame decoding threads (1)")
+    parser.add_argument("--streams", type=str, default=["world", "right", "left"], nargs="*",
+                        choices=("world", "right", "left"), help="The camera streams received besides the gaze")
+    parser.add_argument("--gaze_rate", type=float, default=200.0, help="Rate (in Hz) of the gaze messages")
+    parser.add_argument("--world_rate", type=float, default=30.0, help="Rate (in Hz) of the world camera frames")
+    parser.add_argument("--eye_rate", type=float, default=120.0, help="Rate (in Hz) of the eye camera frames")
+    parser.add_argument("--duration", type=float, default=5.0, help="Measurement duration (in seconds) per configuration")
+    parser.add_argument("--warmup", type=float, default=1.0,
+                        help="Duration (in seconds) to run before measuring, excluding the connection setup")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout (in seconds) per configuration")
+    parser.add_argument("--results_dir", type=str, default="results", help="Directory to store the CSV and JSON results")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # the mock and the interface each create their own zmq context, so the processes are forked before either exists
+    ctx = multiprocessing.get_context("fork")
+    os.makedirs(args.results_dir, exist_ok=True)
+    rates = {"gaze": args.gaze_rate, "world": args.world_rate, "eye": args.eye_rate}
+    if args.mode == "frame_formats":
+        args.gaze_consumptions, args.frame_consumptions, args.frame_decoding_threads = ["latest"], ["all"], [1]
+
+    results = []
+    for config_idx, (gaze_message_type, gaze_consumption, frame_consumption, frame_format,
+                     frame_decoding_threads) in enumerate(itertools.product(
+            args.gaze_message_types, args.gaze_consumptions, args.frame_consumptions, args.frame_formats,
+            args.frame_decoding_threads)):
+        config = {"gaze_message_type": gaze_message_type,
+                  "gaze_consumption": gaze_consumption,
+                  "frame_consumption": frame_consumption,
+                  "frame_format": frame_format,
+                  "frame_decoding_threads": bool(frame_decoding_threads)}
+        result = run_configuration(ctx, args.port + 3 * config_idx, config, args.streams, rates,
+                                   args.duration, args.warmup, args.timeout)
+        print(json.dumps(result))
+        results.append(result)
+
+    results_name = os.path.join(args.results_dir, "benchmarking_pupil_core" +
+                                ("_frame_formats" if args.mode == "frame_formats" else ""))
+    pd.DataFrame(results).to_csv(f"{results_name}.csv", index=False)
+    with open(f"{results_name}.json", "w") as results_file:
+        json.dump(results, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import tempfile
+import threading
+import multiprocessing
+
+import cv2
+import numpy as np
+import pandas as pd
+try:
+    import psutil
+except ImportError:
+    raise ImportError("psutil is required for monitoring the CPU and memory usage of the benchmark: pip install psutil")
+
+from wrapyfi.connect.wrapper import MiddlewareCommunicator
+
+"""
+Offline throughput benchmark for the video interface (wrapyfi_interfaces/io/video/interface.py). Synthetic videos are
+generated for each resolution and published with VideoCapture, while VideoCaptureReceiver listens in a separate
+process. Each frame carries its index encoded as black/white blocks (robust to JPEG compression) in the top row,
+allowing the latency to be matched per frame. No camera or display is needed.
+Run:
+    # Benchmark all locally available middleware with the default configurations
+    python3 benchmarking_video_interfaces.py
+    # Benchmark ZeroMQ only at a single resolution
+    python3 benchmarking_video_interfaces.py --mwares zeromq --resolutions 640x480 --trials 200
+"""
+
+INDEX_BITS = 20
+INDEX_BLOCK_SIZE = 8
+
+
+def encode_frame_index(img, index):
+    for bit in range(INDEX_BITS):
+        value = 255 if (index >> bit) & 1 else 0
+        img[:INDEX_BLOCK_SIZE, bit * INDEX_BLOCK_SIZE:(bit + 1) * INDEX_BLOCK_SIZE] = value
+    return img
+
+
+def decode_frame_index(img):
+    centers = img[INDEX_BLOCK_SIZE // 2, INDEX_BLOCK_SIZE // 2:INDEX_BITS * INDEX_BLOCK_SIZE:INDEX_BLOCK_SIZE]
+    if centers.ndim > 1:
+        centers = centers.mean(axis=1)
+    return int(np.dot(centers > 127, 1 << np.arange(INDEX_BITS)))
+
+
+def generate_video(path, img_width, img_height, num_frames, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (img_width, img_height))
+    x = np.linspace(0, 255, img_width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 255, img_height, dtype=np.float32)[:, None]
+    for index in range(num_frames):
+        img = np.empty((img_height, img_width, 3), dtype=np.uint8)
+        img[..., 0] = (x + index) % 256
+        img[..., 1] = (y + 2 * index) % 256
+        img[..., 2] = (x + y + 3 * index) % 256
+        cv2.circle(img, (int(img_width / 2 + img_width / 4 * np.cos(index / 10)), img_height // 2),
+                   img_height // 8, (255, 255, 255), -1)
+        writer.write(encode_frame_index(img, index))
+    writer.release()
+
+
+def run_publisher(video_path, port, config, num_frames, fps, capture_times):
+    from wrapyfi_interfaces.io.video.interface import VideoCapture
+
+    cap = VideoCapture(cap_source=video_path, cap_feed_port=port, headless=True, should_wait=True,
+                       multithreading=config["multithreading"], queue_size=config["queue_size"] or 1,
+                       jpg=config["jpg"], img_width=config["img_width"], img_height=config["img_height"],
+                       fps=fps if fps else 30, mware=config["middleware"])
+    for index in range(num_frames):
+        start_time = time.time()
+        grabbed, _ = cap.read()
+        if not grabbed:
+            break
+        capture_times[index] = cap.last_timestamp
+        if fps:
+            time.sleep(max(0.0, 1.0 / fps - (time.time() - start_time)))
+
+
+def run_receiver(port, config, num_frames, receive_times, publisher_done, timeout):
+    from wrapyfi_interfaces.io.video.interface import VideoCaptureReceiver
+
+    rx = VideoCaptureReceiver(cap_feed_port=port, headless=True, should_wait=False, jpg=config["jpg"],
+                              img_width=config["img_width"], img_height=config["img_height"],
+                              mware=config["middleware"])
+    received = 0
+    deadline = None
+    start_time = time.time()
+    while received < num_frames and time.time() - start_time < timeout:
+        _, img = rx.read()
+        if img is None:
+            if publisher_done.is_set():
+                deadline = deadline or time.time() + 2.0
+                if time.time() > deadline:
+                    break
+            time.sleep(0.0005)
+            continue
+        receive_time = time.time()
+        index = decode_frame_index(img)
+        if index < num_frames and receive_times[index] == 0:
+            receive_times[index] = receive_time
+            received += 1
+
+
+def monitor(processes, stop_event, interval=0.2):
+    stats = {name: {"cpu": [], "rss": []} for name in processes}
+    handles = {}
+    for name, proc in processes.items():
+        try:
+            handles[name] = psutil.Process(proc.pid)
+            handles[name].cpu_percent(None)
+        except psutil.Error:
+            pass
+    while not stop_event.is_set() and any(proc.is_alive() for proc in processes.values()):
+        time.sleep(interval)
+        for name, handle in handles.items():
+            try:
+                stats[name]["cpu"].append(handle.cpu_percent(None))
+                stats[name]["rss"].append(handle.memory_info().rss)
+            except psutil.Error:
+                pass
+    return stats
+
+
+def run_configuration(ctx, video_path, port, config, num_frames, fps, skip_frames, timeout):
+    capture_times = ctx.Array("d", num_frames, lock=False)
+    receive_times = ctx.Array("d", num_frames, lock=False)
+    publisher_done = ctx.Event()
+    stop_event = ctx.Event()
+
+    receiver = ctx.Process(target=run_receiver,
+                           args=(port, config, num_frames, receive_times, publisher_done, timeout))
+    publisher = ctx.Process(target=run_publisher,
+                            args=(video_path, port, config, num_frames, fps, capture_times))
+    receiver.start()
+    time.sleep(1.0)
+    publisher.start()
+
+    # resource usage is sampled from the main process while both processes are running
+    usage = {}
+    monitor_thread = threading.Thread(target=lambda: usage.update(
+        monitor({"publisher": publisher, "receiver": receiver}, stop_event)))
+    monitor_thread.start()
+
+    publisher.join(timeout)
+    publisher_done.set()
+    receiver.join(timeout)
+    stop_event.set()
+    monitor_thread.join()
+    for proc in (publisher, receiver):
+        if proc.is_alive():
+            proc.terminate()
+
+    capture_times = np.frombuffer(capture_times, dtype=np.float64)
+    receive_times = np.frombuffer(receive_times, dtype=np.float64)
+    published = capture_times > 0
+    received = published & (receive_times > 0)
+    received[:skip_frames] = False
+    latencies = (receive_times[received] - capture_times[received]) * 1000.0
+
+    def rate(timestamps):
+        return (len(timestamps) - 1) / (timestamps.max() - timestamps.min()) if len(timestamps) > 1 else 0.0
+
+    result = dict(config)
+    result.update(frames_published=int(published.sum()),
+                  frames_received=int((receive_times > 0).sum()),
+                  drop_rate=float(1.0 - (receive_times[published] > 0).mean()) if published.any() else 1.0,
+                  publish_fps=rate(capture_times[published]),
+                  receive_fps=rate(receive_times[receive_times > 0]))
+    for name, value in zip(("latency_mean_ms", "latency_p50_ms", "latency_p90_ms", "latency_p99_ms",
+                            "latency_max_ms"),
+                           (np.mean, lambda l: np.percentile(l, 50), lambda l: np.percentile(l, 90),
+                            lambda l: np.percentile(l, 99), np.max)):
+        result[name] = float(value(latencies)) if len(latencies) else None
+    for proc_name in ("publisher", "receiver"):
+        proc_usage = usage.get(proc_name, {"cpu": [], "rss": []})
+        result[f"{proc_name}_cpu_percent"] = float(np.mean(proc_usage["cpu"])) if proc_usage["cpu"] else None
+        result[f"{proc_name}_rss_mb"] = float(np.max(proc_usage["rss"])) / 2 ** 20 if proc_usage["rss"] else None
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mwares", type=str, default=sorted(MiddlewareCommunicator.get_communicators()), nargs="+",
+                        choices=MiddlewareCommunicator.get_communicators(),
+                        help="The middleware to benchmark. Defaults to all locally available middleware")
+    parser.add_argument("--resolutions", type=str, default=["320x240", "640x480", "1280x720"], nargs="+",
+                        help="The synthetic frame resolutions formatted as WIDTHxHEIGHT")
+    parser.add_argument("--jpg", type=int, default=[0, 1], choices=[0, 1], nargs="+",
+                        help="Publish images as raw (0) and/or JPEG (1)")
+    parser.add_argument("--multithreading", type=int, default=[0, 1], choices=[0, 1], nargs="+",
+                        help="Capture frames on the calling thread (0) and/or the capturing thread (1)")
+    parser.add_argument("--queue_sizes", type=int, default=[1, 10], nargs="+",
+                        help="Queue sizes of the capturing thread (only applies with multithreading)")
+    parser.add_argument("--trials", type=int, default=300, help="Number of frames published per configuration")
+    parser.add_argument("--skip_trials", type=int, default=10,
+                        help="Number of frames to skip before measuring latency to avoid logging warmup time")
+    parser.add_argument("--fps", type=int, default=0, help="Publishing rate. 0 publishes as fast as possible")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout (in seconds) per configuration")
+    parser.add_argument("--results_dir", type=str, default="results", help="Directory to store the CSV and JSON results")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # the ZeroMQ middleware spawns its own monitoring process, which requires forking (the zmq context is not picklable)
+    ctx = multiprocessing.get_context("fork")
+    os.makedirs(args.results_dir, exist_ok=True)
+
+    results = []
+    with tempfile.TemporaryDirectory() as video_dir:
+        for resolution in args.resolutions:
+            img_width, img_height = (int(dim) for dim in resolution.lower().split("x"))
+            video_path = os.path.join(video_dir, f"synthetic_{img_width}x{img_height}.avi")
+            generate_video(video_path, img_width, img_height, args.trials)
+
+            for config_idx, (mware, jpg, multithreading, queue_size) in enumerate(itertools.product(
+                    args.mwares, args.jpg, args.multithreading, args.queue_sizes)):
+                if not multithreading and queue_size != args.queue_sizes[0]:
+                    continue
+                config = {"middleware": mware,
+                          "img_width": img_width,
+                          "img_height": img_height,
+                          "jpg": bool(jpg),
+                          "multithreading": bool(multithreading),
+                          "queue_size": queue_size if multithreading else None}
+                port = f"/benchmark/video_feed_{img_width}x{img_height}_{config_idx}"
+                result = run_configuration(ctx, video_path, port, config, args.trials, args.fps,
+                                           args.skip_trials, args.timeout)
+                print(json.dumps(result))
+                results.append(result)
+
+    results_name = os.path.join(args.results_dir, f"benchmarking_video_interfaces__{','.join(args.mwares)}")
+    pd.DataFrame(results).to_csv(f"{results_name}.csv", index=False)
+    with open(f"{results_name}.json", "w") as results_file:
+        json.dump(results, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import time
+import argparse
+import logging
+import threading
+
+import cv2
+import numpy as np
+import zmq
+import msgpack as serializer
+
+"""
+Local stand-in for Pupil Capture, used to run and benchmark the PupilCore interface
+(wrapyfi_interfaces/eye_trackers/pupil_core/interface.py) without the Pupil hardware and software. Pupil Remote answers
+the SUB_PORT, PUB_PORT, t, R/r, C/c and notification requests, while synthetic gaze.3d, fixation and frame
+(frame.world, frame.eye.0, frame.eye.1) messages are published at the configured rates and sizes. Starting the
+Frame_Publisher plugin through a notification switches the frame format. Annotations sent to the PUB port are collected. The Pupil clock can be given an offset and a skew relative to the local monotonic clock.
+Run:
+    # Serve on the default Pupil Remote port until interrupted
+    python3 pupil_capture_mock.py
+    # Serve raw frames with a faster world camera and a drifting clock
+    python3 pupil_capture_mock.py --frame_format raw --world_rate 60 --clock_skew_ppm 50
+"""
+
+FRAME_FORMATS = ("jpeg", "raw", "bgr", "gray")
+
+
+class PupilCaptureMock(object):
+    """
+    Serves Pupil Remote and publishes synthetic Pupil messages on a background thread. All sockets are handled by a
+    single thread, which sleeps until the next message is due or a request arrives.
+
+    :param ip: str: The IP to bind to
+    :param port: int: The Pupil Remote port. The SUB and PUB ports follow it
+    :param gaze_rate: float: Rate (in Hz) of the gaze.3d messages. 0 disables them
+    :param fixation_rate: float: Rate (in Hz) of the fixation messages. 0 disables them
+    :param world_rate: float: Rate (in Hz) of the world camera frames. 0 disables them
+    :param eye_rate: float: Rate (in Hz) of the eye camera frames. 0 disables them
+    :param world_size: tuple: Width and height of the world camera frames
+    :param eye_size: tuple: Width and height of the eye camera frames
+    :param frame_format: str: Format of the frames: JPEG encoded (jpeg), raw bgr for the world and gray for the eyes
+                              (raw), or raw bgr (bgr) or gray (gray) for all cameras
+    :param min_confidence: float: Lower bound of the random sample confidence. Samples spread uniformly up to 1
+    :param clock_offset: float: Offset (in seconds) of the Pupil clock from the local monotonic clock
+    :param clock_skew_ppm: float: Skew of the Pupil clock in parts per million
+    :param reply_delay: float: Delay (in seconds) before replying to a Pupil Remote request
+    :param seed: int: Seed of the synthetic samples
+    """
+    def __init__(self, ip="127.0.0.1", port=50020, gaze_rate=200.0, fixation_rate=30.0, world_rate=30.0,
+                 eye_rate=120.0, world_size=(1280, 720), eye_size=(192, 192), frame_format="jpeg",
+                 min_confidence=0.0, clock_offset=0.0, clock_skew_ppm=0.0, reply_delay=0.0, seed=0):
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"frame format must be one of {FRAME_FORMATS}, got {frame_format}")
+        self.ip = ip
+        self.port = port
+        self.rates = {"gaze": gaze_rate, "fixation": fixation_rate, "world": world_rate,
+                      "right": eye_rate, "left": eye_rate}
+        self.world_size = world_size
+        self.eye_size = eye_size
+        self.frame_format = frame_format
+        self.min_confidence = min_confidence
+        self.clock_offset = clock_offset
+        self.clock_skew = clock_skew_ppm * 1e-6
+        self.reply_delay = reply_delay
+        self.rng = np.random.default_rng(seed)
+
+        self.sent = {stream: 0 for stream in self.rates}
+        self.annotations = []
+        self.notifications = []
+        self.recording = False
+        self.calibrating = False
+        self.session_name = ""
+
+        self.context = None
+        self.stopped = threading.Event()
+        self.ready = threading.Event()
+        self.thread = None
+
+        self.frames = {}
+        self._set_frame_format(frame_format)
+
+    def pupil_time(self, local_time=None):
+        """
+        Gets the time of the mocked Pupil clock.
+
+        :param local_time: float: The local monotonic time. Defaults to the current time
+        :return: float: The Pupil time
+        """
+        if local_time is None:
+            local_time = time.monotonic()
+        return local_time * (1.0 + self.clock_skew) + self.clock_offset
+
+    def start(self, timeout=5.0):
+        """
+        Starts serving on a background thread.
+
+        :param timeout: float: Maximum time (in seconds) to wait for the sockets to be bound
+        :return: PupilCaptureMock: The started mock
+        """
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="PupilCaptureMock", daemon=True)
+        self.thread.start()
+        if not self.ready.wait(timeout):
+            raise RuntimeError("Pupil Capture mock did not start")
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stats(self):
+        """
+        Gets the number of messages sent per stream along with the received annotations and notifications.
+
+        :return: dict: The mock statistics
+        """
+        return {"sent": dict(self.sent),
+                "frame_format": self.frame_format,
+                "annotations": len(self.annotations),
+                "notifications": [notification.get("subject", "") for notification in self.notifications],
+                "recording": self.recording,
+                "calibrating": self.calibrating}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def run(self):
+        """
+        Serves until stopped, blocking the calling thread.
+        """
+        self.context = zmq.Context()
+        remote = self.context.socket(zmq.REP)
+        pub = self.context.socket(zmq.PUB)
+        sub = self.context.socket(zmq.SUB)
+        try:
+            remote.bind(f"tcp://{self.ip}:{self.port}")
+            pub.bind(f"tcp://{self.ip}:{self.port + 1}")
+            sub.bind(f"tcp://{self.ip}:{self.port + 2}")
+            sub.subscribe("")
+            poller = zmq.Poller()
+            poller.register(remote, zmq.POLLIN)
+            poller.register(sub, zmq.POLLIN)
+            self.ready.set()
+
+            start_time = time.monotonic()
+            due = {stream: start_time for stream, rate in self.rates.items() if rate > 0}
+            while not self.stopped.is_set():
+                now = time.monotonic()
+                for stream, due_time in due.items():
+                    # the messages are published on schedule without catching up on missed messages
+                    if due_time <= now:
+                        self._publish(pub, stream, now)
+                        due[stream] = max(due_time + 1.0 / self.rates[stream], now)
+                timeout = (min(due.values()) - time.monotonic()) if due else 0.1
+                for sock, _ in poller.poll(max(0.0, min(timeout, 0.1)) * 1000):
+                    if sock is remote:
+                        self._reply(remote)
+                    else:
+                        self._collect(sub)
+        finally:
+            for sock in (remote, pub, sub):
+                sock.close(linger=0)
+            self.context.term()
+            self.ready.clear()
+
+    def _stream_format(self, stream):
+        if self.frame_format == "raw":
+            return "bgr" if stream == "world" else "gray"
+        return self.frame_format
+
+    def _set_frame_format(self, frame_format):
+        # a few frames are encoded up front, the frames are told apart by the index in their header
+        self.frame_format = frame_format
+        self.frames = {"world": self._generate_frames(*self.world_size, frame_format=self._stream_format("world")),
+                       "right": self._generate_frames(*self.eye_size, frame_format=self._stream_format("right"),
+                                                      rgb=False),
+                       "left": self._generate_frames(*self.eye_size, frame_format=self._stream_format("left"),
+                                                     rgb=False)}
+
+    def _generate_frames(self, width, height, frame_format, rgb=True, num_frames=8):
+        frames = []
+        x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        for index in range(num_frames):
+            img = ((x + y + 16 * index) % 256).astype(np.uint8)
+            cv2.circle(img, (int(width / 2 + width / 4 * np.cos(index)), height // 2), height // 8, 255, -1)
+            if frame_format == "bgr" or (rgb and frame_format == "jpeg"):
+                img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+            if frame_format == "jpeg":
+                frames.append(cv2.imencode(".jpg", img)[1].tobytes())
+            else:
+                frames.append(img.tobytes())
+        return frames
+
+    def _gaze_sample(self, now):
+        index = self.sent["gaze"] + self.sent["fixation"]
+        # the gaze follows a Lissajous curve over the field of view
+        norm_pos = [0.5 + 0.4 * np.sin(2 * np.pi * 0.2 * now), 0.5 + 0.3 * np.sin(2 * np.pi * 0.3 * now + 1.0)]
+        confidence = float(self.rng.uniform(self.min_confidence, 1.0))
+        return {"norm_pos": norm_pos, "confidence": confidence, "timestamp": self.pupil_time(now), "id": index}
+
+    def _publish(self, pub, stream, now):
+        if stream == "gaze":
+            sample = self._gaze_sample(now)
+            sample.update(topic="gaze.3d.01.", base_data=[{
+                "topic": "pupil.0.3d", "theta": (sample["norm_pos"][1] - 0.5) * np.pi / 2,
+                "phi": (sample["norm_pos"][0] - 0.5) * np.pi / 2, "timestamp": sample["timestamp"],
+                "confidence": sample["confidence"]}])
+            pub.send_multipart([b"gaze.3d.01.", serializer.dumps(sample, use_bin_type=True)])
+        elif stream == "fixation":
+            sample = self._gaze_sample(now)
+            sample.update(topic="fixation", duration=100.0, dispersion=1.0, method="3d gaze")
+            pub.send_multipart([b"fixation", serializer.dumps(sample, use_bin_type=True)])
+        else:
+            topic = {"world": "frame.world", "right": "frame.eye.0", "left": "frame.eye.1"}[stream]
+            width, height = self.world_size if stream == "world" else self.eye_size
+            frames = self.frames[stream]
+            header = {"topic": topic, "width": width, "height": height, "index": self.sent[stream],
+                      "timestamp": self.pupil_time(now), "format": self._stream_format(stream)}
+            pub.send_multipart([topic.encode(), serializer.dumps(header, use_bin_type=True),
+                                frames[self.sent[stream] % len(frames)]], copy=False)
+        self.sent[stream] += 1
+
+    def _reply(self, remote):
+        parts = remote.recv_multipart()
+        request = parts[0].decode()
+        if self.reply_delay:
+            time.sleep(self.reply_delay)
+        if request == "SUB_PORT":
+            reply = str(self.port + 1)
+        elif request == "PUB_PORT":
+            reply = str(self.port + 2)
+        elif request == "t":
+            reply = repr(self.pupil_time())
+        elif request.startswith("R"):
+            self.recording, self.session_name = True, request[1:].strip()
+            reply = "OK"
+        elif request == "r":
+            self.recording = False
+            reply = "OK"
+        elif request == "C":
+            self.calibrating = True
+            reply = "OK"
+        elif request == "c":
+            self.calibrating = False
+            reply = "OK"
+        elif request.startswith("notify.") and len(parts) > 1:
+            notification = serializer.loads(parts[1])
+            self.notifications.append(notification)
+            if notification.get("subject") == "start_plugin" and notification.get("name") == "Frame_Publisher":
+                frame_format = notification.get("args", {}).get("format", "jpeg")
+                if frame_format in FRAME_FORMATS:
+                    self._set_frame_format(frame_format)
+            reply = "Notification received"
+        else:
+            reply = "Unknown command."
+        remote.send_string(reply)
+
+    def _collect(self, sub):
+        while True:
+            try:
+                parts = sub.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            if len(parts) > 1 and parts[0].startswith(b"annotation"):
+                self.annotations.append(serializer.loads(parts[1]))
+
+
+def frame_size(size):
+    width, height = (int(dim) for dim in size.lower().split("x"))
+    return width, height
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ip", type=str, default="127.0.0.1", help="The IP to bind to")
+    parser.add_argument("--port", type=int, default=50020, help="The Pupil Remote port")
+    parser.add_argument("--gaze_rate", type=float, default=200.0, help="Rate (in Hz) of the gaze.3d messages")
+    parser.add_argument("--fixation_rate", type=float, default=30.0, help="Rate (in Hz) of the fixation messages")
+    parser.add_argument("--world_rate", type=float, default=30.0, help="Rate (in Hz) of the world camera frames")
+    parser.add_argument("--eye_rate", type=float, default=120.0, help="Rate (in Hz) of the eye camera frames")
+    parser.add_argument("--world_size", type=frame_size, default=(1280, 720),
+                        help="The world camera frame size formatted as WIDTHxHEIGHT")
+    parser.add_argument("--eye_size", type=frame_size, default=(192, 192),
+                        help="The eye camera frame size formatted as WIDTHxHEIGHT")
+    parser.add_argument("--frame_format", type=str, default="jpeg", choices=FRAME_FORMATS,
+                        help="Publish JPEG encoded, raw (bgr world and gray eye), or raw bgr or gray frames for all "
+                             "cameras. The format can be changed by starting the Frame_Publisher plugin")
+    parser.add_argument("--min_confidence", type=float, default=0.0,
+                        help="Lower bound of the random sample confidence")
+    parser.add_argument("--clock_offset", type=float, default=0.0,
+                        help="Offset (in seconds) of the Pupil clock from the local monotonic clock")
+    parser.add_argument("--clock_skew_ppm", type=float, default=0.0,
+                        help="Skew of the Pupil clock in parts per million")
+    parser.add_argument("--reply_delay", type=float, default=0.0,
+                        help="Delay (in seconds) before replying to a Pupil Remote request")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    mock = PupilCaptureMock(**vars(parse_args()))
+    mock.start()
+    logging.info(f"Serving Pupil Remote on {mock.ip}:{mock.port}")
+    try:
+        while True:
+            time.sleep(5.0)
+            logging.info(mock.stats())
+    except KeyboardInterrupt:
+        mock.stop()
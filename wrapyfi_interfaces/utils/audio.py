@@ -0,0 +1,636 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class VoiceActivityDetector(object):
+    """
+    Energy and zero-crossing rate voice activity detector operating on streamed audio blocks.
+    Each block is split into short frames whose log-energy and zero-crossing rate are computed at once. A frame is
+    considered speech when its energy exceeds the adaptive noise floor by the start threshold (or the lower stop
+    threshold while speech is active, providing hysteresis) and its zero-crossing rate is below that of broadband
+    noise. Speech remains active for the hangover duration following the last speech frame. While speech is active, the
+    noise floor keeps rising slowly towards the (bias-compensated) minimum frame energy within the noise window, so
+    that stationary background noise louder than the initial floor does not sustain speech indefinitely.
+    """
+
+    def __init__(self, rate, frame_secs=0.01, start_threshold_db=9.0, stop_threshold_db=4.0, max_zcr=0.3,
+                 onset_frames=2, hangover_secs=0.3, noise_adaptation=0.02, initial_noise_db=-60.0,
+                 min_noise_db=-90.0, noise_window_secs=2.0, noise_bias_db=3.0):
+        """
+        :param rate: int: Sampling rate of the audio blocks
+        :param frame_secs: float: Duration (in seconds) of the frames within each block
+        :param start_threshold_db: float: Energy (in dB) above the noise floor needed to start speech
+        :param stop_threshold_db: float: Energy (in dB) above the noise floor needed to sustain speech
+        :param max_zcr: float: Maximum zero-crossing rate (crossings per sample) of speech frames
+        :param onset_frames: int: Number of consecutive speech frames needed to start speech
+        :param hangover_secs: float: Duration (in seconds) speech remains active after the last speech frame
+        :param noise_adaptation: float: Adaptation rate of the noise floor to non-speech frames (0 disables adaptation)
+        :param initial_noise_db: float: Initial noise floor energy (in dB)
+        :param min_noise_db: float: Minimum noise floor energy (in dB) avoiding triggers on near-digital silence
+        :param noise_window_secs: float: Duration (in seconds) over which the minimum frame energy is tracked while
+                                         speech is active
+        :param noise_bias_db: float: Energy (in dB) added to the minimum frame energy, compensating for the minimum
+                                     underestimating the mean noise energy
+        """
+        self.rate = rate
+        self.frame_length = max(1, int(round(frame_secs * rate)))
+        self.start_threshold_db = start_threshold_db
+        self.stop_threshold_db = stop_threshold_db
+        self.max_zcr = max_zcr
+        self.onset_frames = onset_frames
+        self.hangover_frames = int(round(hangover_secs / frame_secs))
+        self.noise_adaptation = noise_adaptation
+        self.min_noise_db = min_noise_db
+
+        self.noise_db = initial_noise_db
+        self.noise_bias_db = noise_bias_db
+        self.recent_energy_db = deque(maxlen=max(1, int(round(noise_window_secs / frame_secs))))
+        self.active = False
+        self.onset_count = 0
+        self.hangover_count = 0
+        self.speech_blocks = 0
+        self.silent_blocks = 0
+        self.last_energy_db = None
+        self.last_zcr = None
+
+    def features(self, aud):
+        """
+        Computes the log-energy and zero-crossing rate of the frames in an audio block. Trailing samples which do not
+        fill a frame are ignored.
+        :param aud: np.ndarray: Audio block of shape (chunk, channels) or (chunk,)
+        :return: tuple: Energy (in dB) and zero-crossing rate of each frame
+        """
+        mono = aud.mean(axis=1) if aud.ndim > 1 else aud
+        num_frames = max(1, len(mono) // self.frame_length)
+        frames = mono[:num_frames * self.frame_length].reshape(num_frames, -1)
+        energy_db = 10.0 * np.log10(np.einsum("ij,ij->i", frames, frames) / frames.shape[1] + 1e-12)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frames.shape[1]
+        return energy_db, zcr
+
+    def process(self, aud):
+        """
+        Updates the detector with an audio block.
+        :param aud: np.ndarray: Audio block of shape (chunk, channels) or (chunk,)
+        :return: bool: Whether the block contains speech (including hangover)
+        """
+        energy_db, zcr = self.features(aud)
+        self.last_energy_db, self.last_zcr = energy_db, zcr
+        zcr_ok = zcr <= self.max_zcr
+        start_ok = zcr_ok & (energy_db > self.noise_db + self.start_threshold_db)
+        stop_ok = zcr_ok & (energy_db > self.noise_db + self.stop_threshold_db)
+
+        speech = False
+        for frame_idx in range(len(energy_db)):
+            self.recent_energy_db.append(energy_db[frame_idx])
+            if self.active:
+                if stop_ok[frame_idx]:
+                    self.hangover_count = self.hangover_frames
+                elif self.hangover_count > 0:
+                    self.hangover_count -= 1
+                else:
+                    self.active = False
+            else:
+                self.onset_count = self.onset_count + 1 if start_ok[frame_idx] else 0
+                if self.onset_count >= self.onset_frames:
+                    self.active = True
+                    self.onset_count = 0
+                    self.hangover_count = self.hangover_frames
+            if self.active:
+                speech = True
+                # minimum statistics: pauses within speech fall to the noise floor, whereas stationary noise does not
+                min_noise_db = min(self.recent_energy_db) + self.noise_bias_db
+                if min_noise_db > self.noise_db:
+                    self.noise_db += self.noise_adaptation * (min_noise_db - self.noise_db)
+            elif not start_ok[frame_idx]:
+                # the noise floor drops immediately to quieter frames and rises slowly with louder ones
+                if energy_db[frame_idx] < self.noise_db:
+                    self.noise_db = max(energy_db[frame_idx], self.min_noise_db)
+                else:
+                    self.noise_db += self.noise_adaptation * (energy_db[frame_idx] - self.noise_db)
+
+        if speech:
+            self.speech_blocks += 1
+        else:
+            self.silent_blocks += 1
+        return speech
+
+
+def mixing_matrix(in_channels, out_channels):
+    """
+    Creates a matrix mixing input channels into output channels. Downmixing averages the input channels assigned to
+    each output channel (input channel i is assigned to output channel i % out_channels), whereas upmixing repeats them.
+    :param in_channels: int: Number of input channels
+    :param out_channels: int: Number of output channels
+    :return: np.ndarray: float32 mixing matrix of shape (in_channels, out_channels)
+    """
+    mix = np.zeros((in_channels, out_channels), dtype=np.float32)
+    if in_channels >= out_channels:
+        mix[np.arange(in_channels), np.arange(in_channels) % out_channels] = 1.0
+        mix /= mix.sum(axis=0, keepdims=True)
+    else:
+        mix[np.arange(out_channels) % in_channels, np.arange(out_channels)] = 1.0
+    return mix
+
+
+class PolyphaseResampler(object):
+    """
+    Streaming rational resampler and channel mixer. The rates are related by the ratio up/down (reduced by their
+    greatest common divisor), and a windowed-sinc lowpass filter is split into up polyphase branches so that each
+    output sample only evaluates the taps of its own branch on the original input samples. The last input samples
+    are retained between blocks, producing the same output as resampling the concatenated stream.
+    All buffers are preallocated for blocks of up to max_chunk frames, and the returned output is a view into the
+    output buffer which remains valid until the following process() call.
+    """
+
+    def __init__(self, in_rate, out_rate, in_channels=1, out_channels=1, max_chunk=4096, taps_per_phase=32,
+                 cutoff=0.95, kaiser_beta=8.0):
+        """
+        :param in_rate: int: Sampling rate of the input blocks
+        :param out_rate: int: Sampling rate of the output blocks
+        :param in_channels: int: Number of channels of the input blocks
+        :param out_channels: int: Number of channels of the output blocks
+        :param max_chunk: int: Maximum number of frames per input block
+        :param taps_per_phase: int: Number of filter taps per polyphase branch. More taps sharpen the filter transition
+                                    at the cost of computation and a filter delay of taps_per_phase / 2 input samples
+        :param cutoff: float: Filter cutoff relative to the Nyquist frequency of the lower rate
+        :param kaiser_beta: float: Kaiser window shape parameter trading stopband attenuation against transition width
+        """
+        gcd = np.gcd(int(in_rate), int(out_rate))
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = int(out_rate) // gcd
+        self.down = int(in_rate) // gcd
+        self.in_channels = in_channels
+        self.out_channels = out_channels
+        self.max_chunk = max_chunk
+        self.mix = None if in_channels == out_channels else mixing_matrix(in_channels, out_channels)
+        self.bypass = self.up == self.down
+
+        self.taps = 1 if self.bypass else taps_per_phase
+        if not self.bypass:
+            num_taps = self.up * self.taps
+            fc = cutoff * 0.5 / max(self.up, self.down)
+            t = np.arange(num_taps) - (num_taps - 1) / 2.0
+            prototype = 2 * fc * np.sinc(2 * fc * t) * np.kaiser(num_taps, kaiser_beta) * self.up
+            # branch p holds the taps p, p + up, p + 2 * up, ... reversed to align with the input windows
+            self.bank = np.ascontiguousarray(prototype.reshape(self.taps, self.up).T[:, ::-1], dtype=np.float32)
+            self.delay = (num_taps - 1) / 2.0 / self.up
+        else:
+            self.delay = 0.0
+
+        self.history = self.taps - 1
+        self.buffer = np.zeros((self.history + max_chunk, out_channels), dtype=np.float32)
+        max_outputs = (max_chunk * self.up) // self.down + 2
+        self.output = np.zeros((max_outputs, out_channels), dtype=np.float32)
+        if not self.bypass:
+            self.positions = np.zeros(max_outputs, dtype=np.int64)
+            self.starts = np.zeros(max_outputs, dtype=np.int64)
+            self.phases = np.zeros(max_outputs, dtype=np.int64)
+            self.steps = np.arange(max_outputs, dtype=np.int64) * self.down
+            self.windows = np.zeros((max_outputs, self.taps, out_channels), dtype=np.float32)
+            self.coefficients = np.zeros((max_outputs, self.taps), dtype=np.float32)
+        # position of the next output sample in the (up times) upsampled buffer
+        self.position = self.history * self.up
+        self.output_index = 0
+        self.last_offset = 0.0
+
+    def reset(self):
+        self.buffer[:self.history] = 0
+        self.position = self.history * self.up
+        self.output_index = 0
+
+    def process(self, aud):
+        """
+        Resamples and mixes an audio block.
+        :param aud: np.ndarray: float32 audio block of shape (chunk, in_channels) with chunk <= max_chunk
+        :return: np.ndarray: Output block of shape (frames, out_channels). The number of frames varies between blocks
+                             when the rates are not divisible
+        """
+        frames = len(aud)
+        if frames > self.max_chunk:
+            raise ValueError(f"block of {frames} frames exceeds the maximum of {self.max_chunk} frames")
+        block = self.buffer[self.history:self.history + frames]
+        if self.mix is None:
+            block[:] = aud
+        else:
+            np.matmul(aud, self.mix, out=block)
+
+        # time (in input samples) of the first output sample relative to the first input sample of the block
+        self.last_offset = self.position / self.up - self.history - self.delay
+
+        if self.bypass:
+            output = self.output[:frames]
+            output[:] = block
+        else:
+            length = self.history + frames
+            count = max(0, (length * self.up - 1 - self.position) // self.down + 1)
+            positions, starts, phases = self.positions[:count], self.starts[:count], self.phases[:count]
+            np.add(self.steps[:count], self.position, out=positions)
+            np.floor_divide(positions, self.up, out=starts)
+            np.remainder(positions, self.up, out=phases)
+            starts -= self.history
+            windows = np.lib.stride_tricks.sliding_window_view(self.buffer[:length], self.taps, axis=0)
+            # the sliding windows are of shape (windows, channels, taps)
+            np.take(windows.transpose(0, 2, 1), starts, axis=0, out=self.windows[:count])
+            np.take(self.bank, phases, axis=0, out=self.coefficients[:count])
+            output = self.output[:count]
+            np.einsum("nk,nkc->nc", self.coefficients[:count], self.windows[:count], out=output)
+            self.position += count * self.down - frames * self.up
+
+        # retain the last input samples for the following block
+        if self.history:
+            self.buffer[:self.history] = self.buffer[frames:frames + self.history]
+        self.output_index += len(output)
+        return output
+
+
+def hz_to_mel(freq):
+    return 2595.0 * np.log10(1.0 + np.asarray(freq, dtype=np.float64) / 700.0)
+
+
+def mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel, dtype=np.float64) / 2595.0) - 1.0)
+
+
+def mel_filterbank(rate, n_fft, n_mels=64, fmin=0.0, fmax=None):
+    """
+    Creates a matrix of triangular mel filters (HTK mel scale) mapping power spectra to mel bands.
+    :param rate: int: Sampling rate of the audio
+    :param n_fft: int: FFT size of the power spectra
+    :param n_mels: int: Number of mel bands
+    :param fmin: float: Lowest frequency (in Hz) of the filters
+    :param fmax: float: Highest frequency (in Hz) of the filters. Defaults to the Nyquist frequency
+    :return: np.ndarray: float32 filterbank of shape (n_fft // 2 + 1, n_mels)
+    """
+    fmax = rate / 2.0 if fmax is None else min(fmax, rate / 2.0)
+    fft_freqs = np.fft.rfftfreq(n_fft, 1.0 / rate)
+    edges = mel_to_hz(np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2))
+    lower = (fft_freqs[:, None] - edges[None, :-2]) / (edges[1:-1] - edges[:-2])
+    upper = (edges[None, 2:] - fft_freqs[:, None]) / (edges[2:] - edges[1:-1])
+    return np.maximum(0.0, np.minimum(lower, upper)).astype(np.float32)
+
+
+class LogMelExtractor(object):
+    """
+    Streaming log-mel spectrogram extractor. The trailing samples of each block which do not complete a frame are
+    retained (overlap-save), so that frames spanning block boundaries are computed once and the output equals that of
+    the concatenated stream. All frames of a block are windowed, transformed and projected onto the precomputed mel
+    filterbank at once.
+    """
+
+    def __init__(self, rate, max_chunk=4096, window_secs=0.025, hop_secs=0.01, n_mels=64, fmin=0.0, fmax=None,
+                 log_floor=1e-10, dtype=np.float16):
+        """
+        :param rate: int: Sampling rate of the audio blocks
+        :param max_chunk: int: Maximum number of frames per audio block
+        :param window_secs: float: Duration (in seconds) of the analysis window (FFT size)
+        :param hop_secs: float: Duration (in seconds) between consecutive frames
+        :param n_mels: int: Number of mel bands
+        :param fmin: float: Lowest frequency (in Hz) of the mel filters
+        :param fmax: float: Highest frequency (in Hz) of the mel filters. Defaults to the Nyquist frequency
+        :param log_floor: float: Minimum mel power before taking the logarithm
+        :param dtype: np.dtype: Data type of the returned log-mel frames
+        """
+        self.rate = rate
+        self.n_fft = int(round(window_secs * rate))
+        self.hop = int(round(hop_secs * rate))
+        self.n_mels = n_mels
+        self.log_floor = log_floor
+        self.dtype = dtype
+        self.window = np.hanning(self.n_fft + 1)[:-1].astype(np.float32)
+        self.filterbank = mel_filterbank(rate, self.n_fft, n_mels=n_mels, fmin=fmin, fmax=fmax)
+
+        self.buffer = np.zeros(self.n_fft + max_chunk, dtype=np.float32)
+        max_frames = (self.n_fft + max_chunk) // self.hop + 1
+        self.frames = np.zeros((max_frames, self.n_fft), dtype=np.float32)
+        self.power = np.zeros((max_frames, self.n_fft // 2 + 1), dtype=np.float32)
+        self.mel = np.zeros((max_frames, n_mels), dtype=np.float32)
+        self.max_chunk = max_chunk
+        # number of samples retained in the buffer, of which the first starts the next frame
+        self.pending = 0
+        self.frame_index = 0
+        self.last_offset = 0
+
+    def reset(self):
+        self.pending = 0
+        self.frame_index = 0
+
+    def process(self, aud):
+        """
+        Extracts the log-mel frames completed by an audio block. Multi-channel blocks are averaged to mono.
+        :param aud: np.ndarray: float32 audio block of shape (chunk, channels) or (chunk,) with chunk <= max_chunk
+        :return: np.ndarray: Log-mel frames of shape (frames, n_mels). The number of frames varies between blocks
+        """
+        frames = len(aud)
+        if frames > self.max_chunk:
+            raise ValueError(f"block of {frames} frames exceeds the maximum of {self.max_chunk} frames")
+        available = self.pending + frames
+        block = self.buffer[self.pending:available]
+        if aud.ndim > 1:
+            np.mean(aud, axis=1, out=block)
+        else:
+            block[:] = aud
+        # start of the first frame (in samples) relative to the first sample of the block
+        self.last_offset = -self.pending
+
+        count = 0 if available < self.n_fft else (available - self.n_fft) // self.hop + 1
+        if count:
+            windows = np.lib.stride_tricks.sliding_window_view(self.buffer[:available], self.n_fft)[::self.hop]
+            np.multiply(windows[:count], self.window, out=self.frames[:count])
+            spectrum = np.fft.rfft(self.frames[:count], axis=1)
+            power = self.power[:count]
+            np.abs(spectrum, out=power, casting="unsafe")
+            np.square(power, out=power)
+            mel = self.mel[:count]
+            np.matmul(power, self.filterbank, out=mel)
+            np.maximum(mel, self.log_floor, out=mel)
+            np.log10(mel, out=mel)
+            mel *= 10.0
+
+        consumed = count * self.hop
+        self.pending = available - consumed
+        self.buffer[:self.pending] = self.buffer[consumed:available]
+        self.frame_index += count
+        return self.mel[:count].astype(self.dtype)
+
+
+def direction_vector(yaw, pitch):
+    """
+    Computes the unit vector pointing towards a direction (x forward, y left, z up).
+    :param yaw: float: Yaw angle in degrees (positive to the left)
+    :param pitch: float: Pitch angle in degrees (positive upwards)
+    :return: np.ndarray: Unit vector of shape (3,)
+    """
+    yaw, pitch = np.deg2rad(yaw), np.deg2rad(pitch)
+    return np.array([np.cos(pitch) * np.cos(yaw), np.cos(pitch) * np.sin(yaw), np.sin(pitch)])
+
+
+class DelayAndSumBeamformer(object):
+    """
+    Streaming frequency-domain delay-and-sum beamformer combining the channels of a microphone array into a single
+    channel enhanced towards a steering direction (far-field). The channels of each frame are phase-shifted to align
+    the arrival times of a plane wave from the steering direction and averaged. Frames are analysed and synthesized
+    with square-root Hann windows at 50% overlap and overlap-added, such that the output equals the input when all
+    channels are aligned. All frames of a block are transformed and combined at once.
+    """
+
+    def __init__(self, rate, mic_positions, max_chunk=4096, n_fft=512, speed_of_sound=343.0):
+        """
+        :param rate: int: Sampling rate of the audio blocks
+        :param mic_positions: np.ndarray: Microphone positions (in metres) of shape (channels, 3) in the array frame
+                                          (x forward, y left, z up), ordered as the channels of the audio blocks
+        :param max_chunk: int: Maximum number of frames per audio block
+        :param n_fft: int: Number of samples per analysis frame (even)
+        :param speed_of_sound: float: Speed of sound (in m/s)
+        """
+        self.mic_positions = np.asarray(mic_positions, dtype=np.float64)
+        if self.mic_positions.ndim != 2 or self.mic_positions.shape[1] != 3:
+            raise ValueError(f"microphone positions must be of shape (channels, 3), got {self.mic_positions.shape}")
+        self.rate = rate
+        self.channels = len(self.mic_positions)
+        self.n_fft = n_fft + n_fft % 2
+        self.hop = self.n_fft // 2
+        self.speed_of_sound = speed_of_sound
+        self.window = np.sqrt(np.hanning(self.n_fft + 1)[:-1]).astype(np.float32)
+        self.freqs = np.fft.rfftfreq(self.n_fft, 1.0 / rate)
+
+        self.buffer = np.zeros((self.n_fft + max_chunk, self.channels), dtype=np.float32)
+        max_frames = (self.n_fft + max_chunk) // self.hop + 1
+        self.frames = np.zeros((max_frames, self.channels, self.n_fft), dtype=np.float32)
+        self.output = np.zeros((max_frames * self.hop, 1), dtype=np.float32)
+        # second half of the last synthesized frame, overlapping the first half of the next frame
+        self.tail = np.zeros(self.hop, dtype=np.float32)
+        self.max_chunk = max_chunk
+        self.pending = 0
+        self.input_index = 0
+        self.output_index = 0
+        self.last_offset = 0
+        self.steer(0.0, 0.0)
+
+    def steer(self, yaw, pitch):
+        """
+        Steers the beamformer towards a direction.
+        :param yaw: float: Yaw angle in degrees (positive to the left)
+        :param pitch: float: Pitch angle in degrees (positive upwards)
+        """
+        # a plane wave from the steering direction arrives earlier at microphones further along the direction
+        advances = self.mic_positions @ direction_vector(yaw, pitch) / self.speed_of_sound
+        self.weights = (np.exp(-2j * np.pi * np.outer(self.freqs, advances)) / self.channels).astype(np.complex64)
+        self.yaw, self.pitch = float(yaw), float(pitch)
+
+    def process(self, aud):
+        """
+        Beamforms the frames completed by an audio block.
+        :param aud: np.ndarray: float32 audio block of shape (chunk, channels) with chunk <= max_chunk
+        :return: np.ndarray: float32 single-channel output of shape (frames, 1). The number of frames is a multiple of
+                             half the analysis frame and varies between blocks. The output is valid until the next call
+        """
+        frames = len(aud)
+        if frames > self.max_chunk:
+            raise ValueError(f"block of {frames} frames exceeds the maximum of {self.max_chunk} frames")
+        if aud.shape[1] != self.channels:
+            raise ValueError(f"block of {aud.shape[1]} channels does not match the {self.channels} microphones")
+        available = self.pending + frames
+        self.buffer[self.pending:available] = aud
+        # first output sample relative to the first sample of the block
+        self.last_offset = self.output_index - self.input_index
+
+        count = 0 if available < self.n_fft else (available - self.n_fft) // self.hop + 1
+        output = self.output[:count * self.hop, 0]
+        if count:
+            windows = np.lib.stride_tricks.sliding_window_view(self.buffer[:available], self.n_fft, axis=0)[::self.hop]
+            np.multiply(windows[:count], self.window, out=self.frames[:count])
+            spectrum = np.fft.rfft(self.frames[:count], axis=2)
+            beam = np.fft.irfft(np.einsum("fcb,bc->fb", spectrum, self.weights), n=self.n_fft, axis=1)
+            beam *= self.window
+            frames_out = output.reshape(count, self.hop)
+            frames_out[:] = beam[:, :self.hop]
+            frames_out[0] += self.tail
+            frames_out[1:] += beam[:-1, self.hop:]
+            self.tail[:] = beam[-1, self.hop:]
+
+        consumed = count * self.hop
+        self.pending = available - consumed
+        self.buffer[:self.pending] = self.buffer[consumed:available]
+        self.input_index += frames
+        self.output_index += consumed
+        return self.output[:consumed]
+
+
+class JitterBuffer(object):
+    """
+    Adaptive jitter buffer ordering received audio blocks by their sequence numbers and releasing them at their
+    playout time: the capture timestamp plus the minimum observed transit time (including the clock offset between
+    hosts) plus a target delay. The interarrival jitter is estimated as in RFC 3550 (J += (|D| - J) / 16), and the
+    target delay follows it within the given bounds. Blocks missing at their playout time are concealed by repeating
+    the last block with decaying amplitude, whereas blocks arriving after their playout time are discarded.
+    Blocks omitted by voice activity gating (following a keep-alive message) are played out as silence. When no blocks
+    arrive for max_outage blocks, the buffer stops releasing blocks until the stream resumes.
+    """
+
+    def __init__(self, block_secs, min_delay=0.02, max_delay=0.5, jitter_factor=3.0, fade=0.5, max_concealed=4,
+                 max_outage=50, transit_window=500, restart_gap=1000):
+        """
+        :param block_secs: float: Duration (in seconds) of each block
+        :param min_delay: float: Minimum target delay (in seconds) added to the minimum transit time
+        :param max_delay: float: Maximum target delay (in seconds)
+        :param jitter_factor: float: Multiple of the jitter estimate added to the minimum target delay
+        :param fade: float: Amplitude factor applied for each consecutive concealed block
+        :param max_concealed: int: Number of consecutive concealed blocks repeating the last block before silence
+        :param max_outage: int: Number of consecutive missing blocks after which the stream is considered stalled
+        :param transit_window: int: Number of recent blocks over which the minimum transit time is tracked
+        :param restart_gap: int: Sequence number decrease considered a publisher restart (resets the buffer)
+        """
+        self.block_secs = block_secs
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.jitter_factor = jitter_factor
+        self.fade = fade
+        self.max_concealed = max_concealed
+        self.max_outage = max_outage
+        self.restart_gap = restart_gap
+
+        self.blocks = {}
+        self.transits = deque(maxlen=transit_window)
+        self.jitter = 0.0
+        self.last_transit = None
+        self.next_seq = None
+        self.last_timestamp = None
+        self.last_block = None
+        self.last_info = None
+        self.concealed_run = 0
+        self.gated = False
+        self.stalled = False
+        self.latencies = deque(maxlen=transit_window)
+        self.counts = {"received": 0, "played": 0, "concealed": 0, "silence": 0, "late": 0, "duplicate": 0}
+
+    @property
+    def target_delay(self):
+        return min(self.max_delay, self.min_delay + self.jitter_factor * self.jitter)
+
+    def reset(self):
+        self.blocks.clear()
+        self.transits.clear()
+        self.last_transit = None
+        self.next_seq = None
+        self.last_timestamp = None
+        self.last_block = None
+        self.concealed_run = 0
+        self.stalled = False
+
+    def push(self, seq, timestamp, block, info=None, arrival=None):
+        """
+        Adds a received block to the buffer.
+        :param seq: int: Sequence number of the block
+        :param timestamp: float: Capture timestamp of the first sample of the block
+        :param block: np.ndarray: Audio block. None for keep-alive messages published during silence
+        :param info: dict: Additional information of the block, available as last_info once the block is released
+        :param arrival: float: Arrival time of the block. Defaults to the current time
+        :return: bool: Whether the block was buffered (False for late and duplicate blocks)
+        """
+        arrival = time.time() if arrival is None else arrival
+        transit = arrival - timestamp
+        if self.last_transit is not None:
+            self.jitter += (abs(transit - self.last_transit) - self.jitter) / 16.0
+        self.last_transit = transit
+        self.transits.append(transit)
+
+        if self.next_seq is not None and seq < self.next_seq:
+            if self.next_seq - seq < self.restart_gap:
+                self.counts["late"] += 1
+                return False
+            self.reset()
+            self.transits.append(transit)
+        if self.next_seq is None:
+            self.next_seq = seq
+        if seq in self.blocks:
+            self.counts["duplicate"] += 1
+            return False
+        self.blocks[seq] = (timestamp, block, info)
+        self.counts["received"] += 1
+        return True
+
+    def playout_time(self):
+        """
+        Gets the playout time of the next block.
+        :return: float: Time at which the next block (or its concealment) is due. None if no block was received
+        """
+        if self.next_seq is None:
+            return None
+        if self.stalled:
+            if not self.blocks:
+                return None
+            # the stream resumes from the earliest buffered block
+            self.next_seq = min(self.blocks)
+            self.last_timestamp = None
+            self.stalled = False
+        if self.next_seq in self.blocks:
+            timestamp = self.blocks[self.next_seq][0]
+        elif self.last_timestamp is not None:
+            timestamp = self.last_timestamp + self.block_secs
+        elif self.blocks:
+            first_seq = min(self.blocks)
+            timestamp = self.blocks[first_seq][0] - (first_seq - self.next_seq) * self.block_secs
+        else:
+            return None
+        return timestamp + min(self.transits) + self.target_delay
+
+    def pop(self, now=None):
+        """
+        Releases the next block when its playout time is due.
+        :param now: float: Current time. Defaults to the current time
+        :return: tuple: Status ("played", "concealed", "silence", or None when no block is due), sequence number, and
+                        block (None when silence precedes the first block)
+        """
+        now = time.time() if now is None else now
+        due = self.playout_time()
+        if due is None or now < due:
+            return None, None, None
+        seq = self.next_seq
+        if seq not in self.blocks and not self.blocks and self.concealed_run >= self.max_outage:
+            self.stalled = True
+            return None, None, None
+        self.next_seq += 1
+        timestamp, block, self.last_info = self.blocks.pop(seq, (None, None, None))
+        self.last_timestamp = timestamp if timestamp is not None else self.last_timestamp + self.block_secs
+
+        if block is not None:
+            status = "played"
+            self.gated = False
+            self.concealed_run = 0
+            self.last_block = block
+            self.latencies.append(now - self.last_timestamp)
+        elif timestamp is not None or self.gated:
+            # keep-alive messages and the blocks omitted following them are silent
+            status = "silence"
+            self.gated = True
+            self.concealed_run = 0 if timestamp is not None else self.concealed_run + 1
+            block = None if self.last_block is None else np.zeros_like(self.last_block)
+        else:
+            status = "concealed"
+            self.concealed_run += 1
+            if self.last_block is None:
+                block = None
+            elif self.concealed_run <= self.max_concealed:
+                block = self.last_block * (self.fade ** self.concealed_run)
+            else:
+                block = np.zeros_like(self.last_block)
+        self.counts[status] += 1
+        return status, seq, block
+
+    def stats(self):
+        """
+        Gets the jitter buffer statistics.
+        :return: dict: Block counts, jitter and target delay (in seconds), number of buffered blocks, mean playout
+                       latency (in seconds) from capture, and the underrun (concealment) ratio
+        """
+        played = self.counts["played"] + self.counts["concealed"]
+        return dict(self.counts,
+                    jitter=self.jitter,
+                    target_delay=self.target_delay,
+                    buffered=len(self.blocks),
+                    latency=float(np.mean(self.latencies)) if self.latencies else None,
+                    underrun_ratio=self.counts["concealed"] / played if played else 0.0)
@@ -0,0 +1,261 @@
+from collections import deque
+
+import numpy as np
+
+
+class DispersionFixationDetector(object):
+    """
+    Incremental dispersion-threshold (I-DT) fixation detector operating on streamed gaze samples.
+    The samples since the start of the candidate fixation form a window whose dispersion is the sum of its horizontal
+    and vertical extents. The extents are tracked with monotonic deques of the running minima and maxima, and the
+    centroid with running sums, such that each sample is added and removed at most once (amortized O(1) per sample).
+    While no fixation is active, the oldest samples are dropped until the window disperses less than the threshold. A
+    fixation starts (onset) as soon as such a window spans the minimum duration, and ends (offset) at the first sample
+    exceeding the threshold or following a gap in the samples. The onset is therefore reported the minimum duration
+    after the fixation started, and the offset with the next sample.
+    """
+
+    def __init__(self, max_dispersion=1.5, min_duration=0.08, max_gap=0.1):
+        """
+        :param max_dispersion: float: Maximum dispersion (in degrees) of the samples within a fixation
+        :param min_duration: float: Minimum duration (in seconds) of a fixation
+        :param max_gap: float: Maximum time (in seconds) between consecutive samples within a fixation. Longer gaps
+                               (e.g. blinks or low confidence samples) end the fixation
+        """
+        self.max_dispersion = max_dispersion
+        self.min_duration = min_duration
+        self.max_gap = max_gap
+
+        self.window = deque()
+        self.min_x, self.max_x = deque(), deque()
+        self.min_y, self.max_y = deque(), deque()
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.count = 0
+        self.active = False
+        self.fixation_id = 0
+        self.last_timestamp = None
+
+    @property
+    def dispersion(self):
+        if not self.window:
+            return 0.0
+        return (self.max_x[0][1] - self.min_x[0][1]) + (self.max_y[0][1] - self.min_y[0][1])
+
+    def reset(self):
+        """
+        Discards the samples of the current window without reporting the active fixation.
+        """
+        self._clear()
+        self.active = False
+        self.last_timestamp = None
+
+    def update(self, timestamp, x, y):
+        """
+        Adds a gaze sample and reports the fixation events it causes.
+        :param timestamp: float: Time (in seconds) of the sample. Timestamps must not decrease
+        :param x: float: Horizontal gaze angle (e.g. yaw) in degrees
+        :param y: float: Vertical gaze angle (e.g. pitch) in degrees
+        :return: list: Fixation events (dicts) with the event type (onset or offset), fixation id, start timestamp,
+                       duration, centroid, dispersion and number of samples. Offsets also carry the end timestamp
+        """
+        events = []
+        if self.last_timestamp is not None and timestamp - self.last_timestamp > self.max_gap:
+            events.extend(self.flush())
+        self.last_timestamp = timestamp
+
+        if self.active and self._dispersion_with(x, y) > self.max_dispersion:
+            # the new sample does not belong to the fixation, which ends with the previous sample
+            events.append(self._event("offset"))
+            self.active = False
+            self.fixation_id += 1
+            self._clear()
+        self._push(timestamp, x, y)
+        while not self.active and self.dispersion > self.max_dispersion:
+            self._pop_oldest()
+        if not self.active and self.window[-1][0] - self.window[0][0] >= self.min_duration:
+            self.active = True
+            events.append(self._event("onset"))
+        return events
+
+    def flush(self):
+        """
+        Ends the active fixation, e.g. when the gaze stream stops.
+        :return: list: The offset event of the active fixation, if any
+        """
+        events = []
+        if self.active:
+            events.append(self._event("offset"))
+            self.fixation_id += 1
+        self.reset()
+        return events
+
+    def _dispersion_with(self, x, y):
+        if not self.window:
+            return 0.0
+        return ((max(self.max_x[0][1], x) - min(self.min_x[0][1], x)) +
+                (max(self.max_y[0][1], y) - min(self.min_y[0][1], y)))
+
+    def _event(self, event_type):
+        start_timestamp, end_timestamp = self.window[0][0], self.window[-1][0]
+        event = {"event": event_type,
+                 "id": self.fixation_id,
+                 "start_timestamp": start_timestamp,
+                 "duration": end_timestamp - start_timestamp,
+                 "x": self.sum_x / len(self.window),
+                 "y": self.sum_y / len(self.window),
+                 "dispersion": self.dispersion,
+                 "samples": len(self.window)}
+        if event_type == "offset":
+            event["end_timestamp"] = end_timestamp
+        return event
+
+    def _clear(self):
+        for samples in (self.window, self.min_x, self.max_x, self.min_y, self.max_y):
+            samples.clear()
+        self.sum_x = self.sum_y = 0.0
+
+    def _push(self, timestamp, x, y):
+        index = self.count
+        self.count += 1
+        self.window.append((timestamp, x, y, index))
+        self.sum_x += x
+        self.sum_y += y
+        for extrema, value, is_min in ((self.min_x, x, True), (self.max_x, x, False),
+                                       (self.min_y, y, True), (self.max_y, y, False)):
+            while extrema and (extrema[-1][1] >= value if is_min else extrema[-1][1] <= value):
+                extrema.pop()
+            extrema.append((index, value))
+
+    def _pop_oldest(self):
+        _, x, y, index = self.window.popleft()
+        self.sum_x -= x
+        self.sum_y -= y
+        for extrema in (self.min_x, self.max_x, self.min_y, self.max_y):
+            if extrema[0][0] == index:
+                extrema.popleft()
+
+
+class GazeHeatmap(object):
+    """
+    Exponentially decaying 2D histogram of gaze samples over a downsampled grid of the world camera frame.
+    Each batch of samples is accumulated at once with np.add.at, weighted by the sample confidences and decayed to the
+    newest sample timestamp, such that the heatmap equals the sum of all samples decayed individually. The heatmap is
+    only decayed as samples arrive, i.e. it is retained while the gaze stream stops.
+    """
+
+    def __init__(self, width=64, height=48, half_life=10.0):
+        """
+        :param width: int: Number of horizontal bins
+        :param height: int: Number of vertical bins
+        :param half_life: float: Time (in seconds) after which the weight of a sample is halved
+        """
+        self.width = width
+        self.height = height
+        self.half_life = half_life
+
+        self.histogram = np.zeros((height, width), dtype=np.float64)
+        self.last_timestamp = None
+
+    def reset(self):
+        """
+        Discards all accumulated samples.
+        """
+        self.histogram[:] = 0.0
+        self.last_timestamp = None
+
+    def update(self, timestamps, x, y, weights=None):
+        """
+        Adds a batch of gaze samples.
+        :param timestamps: np.ndarray: Time (in seconds) of the samples
+        :param x: np.ndarray: Normalized horizontal gaze positions (0 is the left and 1 the right edge of the frame)
+        :param y: np.ndarray: Normalized vertical gaze positions (0 is the bottom and 1 the top edge of the frame)
+        :param weights: np.ndarray: Weights (e.g. confidences) of the samples. Samples are weighed equally when None
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if not timestamps.size:
+            return
+        newest_timestamp = timestamps.max()
+        if self.last_timestamp is not None:
+            newest_timestamp = max(newest_timestamp, self.last_timestamp)
+            self.histogram *= 0.5 ** ((newest_timestamp - self.last_timestamp) / self.half_life)
+        self.last_timestamp = newest_timestamp
+
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        weights = np.ones_like(timestamps) if weights is None else np.asarray(weights, dtype=np.float64)
+        # samples outside the frame are discarded. The rows are flipped since the image origin is at the top
+        inside = (x >= 0.0) & (x <= 1.0) & (y >= 0.0) & (y <= 1.0)
+        cols = np.minimum((x[inside] * self.width).astype(np.intp), self.width - 1)
+        rows = np.minimum(((1.0 - y[inside]) * self.height).astype(np.intp), self.height - 1)
+        decay = 0.5 ** ((newest_timestamp - timestamps[inside]) / self.half_life)
+        np.add.at(self.histogram, (rows, cols), weights[inside] * decay)
+
+    def image(self):
+        """
+        Renders the heatmap normalized to its maximum.
+        :return: np.ndarray: The heatmap as a grayscale image (uint8) of the grid size
+        """
+        peak = self.histogram.max()
+        if peak <= 0.0:
+            return np.zeros((self.height, self.width), dtype=np.uint8)
+        return (self.histogram * (255.0 / peak)).astype(np.uint8)
+
+
+class ConstantVelocityExtrapolator(object):
+    """
+    Constant-velocity predictor of a streamed position (e.g. gaze coordinates), compensating for the latency between
+    the measurement of a position and its use. The velocity is estimated from consecutive samples and smoothed
+    exponentially with the given time constant, such that single noisy samples do not overshoot the prediction. Gaps
+    in the samples (e.g. blinks) reset the velocity, since the position before the gap says little about the motion
+    after it.
+    """
+
+    def __init__(self, time_constant=0.05, max_gap=0.25, max_lookahead=0.3):
+        """
+        :param time_constant: float: Time constant (in seconds) of the exponential velocity smoothing
+        :param max_gap: float: Maximum time (in seconds) between consecutive samples to estimate the velocity from
+        :param max_lookahead: float: Maximum time (in seconds) to extrapolate ahead of the latest sample
+        """
+        self.time_constant = time_constant
+        self.max_gap = max_gap
+        self.max_lookahead = max_lookahead
+
+        self.timestamp = None
+        self.position = None
+        self.velocity = None
+
+    def reset(self):
+        """
+        Discards the latest sample and the velocity estimate.
+        """
+        self.timestamp = None
+        self.position = None
+        self.velocity = None
+
+    def update(self, timestamp, position):
+        """
+        Adds a sample.
+        :param timestamp: float: Time (in seconds) of the sample. Samples older than the latest sample are ignored
+        :param position: np.ndarray: The position
+        """
+        position = np.asarray(position, dtype=np.float64)
+        if self.timestamp is not None and timestamp <= self.timestamp:
+            return
+        if self.timestamp is None or timestamp - self.timestamp > self.max_gap:
+            self.velocity = np.zeros_like(position)
+        else:
+            dt = timestamp - self.timestamp
+            alpha = 1.0 - np.exp(-dt / self.time_constant) if self.time_constant > 0 else 1.0
+            self.velocity += alpha * ((position - self.position) / dt - self.velocity)
+        self.timestamp = timestamp
+        self.position = position
+
+    def predict(self, lookahead):
+        """
+        Extrapolates the latest sample along the estimated velocity.
+        :param lookahead: float: Time (in seconds) ahead of the latest sample, limited to the maximum lookahead
+        :return: np.ndarray: The predicted position. None before the first sample
+        """
+        if self.position is None:
+            return None
+        return self.position + self.velocity * min(max(lookahead, 0.0), self.max_lookahead)